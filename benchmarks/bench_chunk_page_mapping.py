@@ -0,0 +1,102 @@
+# #####################################################################
+# Benchmarks the chunk -> page mapping of process_and_expand_json_data
+# on the bundled ServiceNow 10-K.
+# Pages are built the way chunk.py does (sentences packed into pages of
+# about 2000 words), with a regex sentence splitter standing in for spaCy.
+# Compares the original substring scan over every page, the single-pass
+# fallback for old files, and the explicit chunkPages written by chunk.py.
+# 
+# Usage:
+# > python3 benchmarks/bench_chunk_page_mapping.py [filing.json]
+# #####################################################################
+
+import copy
+import json
+import os
+import pathlib
+import re
+import sys
+import time
+
+root = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(1, os.path.join(root, "src"))
+sys.path.insert(1, os.path.join(root, "src", "database"))
+
+from weaviate_utils import map_chunks_to_pages, process_and_expand_json_data
+
+DEFAULT_FILING = os.path.join(root, "data", "fortune100_10K_2023", "NOW_2023-01-30T17:43:36-05:00_10-K.json")
+
+
+def segment(text, max_words=2000):
+    # Same page packing as chunk.segment_text
+    pages = [[]]
+    page_total_words = 0
+    for sentence in re.split(r"(?<=[.!?])\s+", text.strip()):
+        page_total_words += len(sentence.split(" "))
+        if page_total_words > max_words:
+            pages.append([])
+            page_total_words = len(sentence.split(" "))
+        pages[-1].append(sentence)
+    return pages
+
+
+def chunk_filing(filing):
+    # Same fields as chunk.process (chunk.py loads spaCy at import, so it is not imported here)
+    for section in filing["sections"]:
+        pages = segment(section["raw"])
+        section["chunks"] = [chunk for page in pages for chunk in page]
+        section["chunkPages"] = [index for index, page in enumerate(pages) for _ in page]
+        section["pages"] = [" ".join(page) for page in pages]
+    return filing
+
+
+def original_mapping(chunks, pages):
+    matches = []
+    for chunk in chunks:
+        matching_page = next((page for page in pages if chunk in page), None)
+        matches.append(matching_page)
+    return matches
+
+
+def timed(fn, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(filing_path):
+    with open(filing_path) as f:
+        filing = chunk_filing(json.load(f)[0])
+    sections = filing["sections"]
+    total_chunks = sum(len(s["chunks"]) for s in sections)
+    print(f"{os.path.basename(filing_path)}: {len(sections)} sections, {total_chunks} chunks, "
+          f"{sum(len(s['pages']) for s in sections)} pages")
+
+    original_time, original = timed(lambda: [original_mapping(s["chunks"], s["pages"]) for s in sections])
+    walk_time, walk = timed(lambda: [map_chunks_to_pages(s["chunks"], s["pages"]) for s in sections])
+    explicit_time, explicit = timed(lambda: [map_chunks_to_pages(s["chunks"], s["pages"], s["chunkPages"]) for s in sections])
+
+    # The forward walk and the explicit indexes must agree; the original scan picks the
+    # first page containing a chunk, which differs only for sentences repeated across pages
+    agree = sum(a == b for x, y in zip(walk, explicit) for a, b in zip(x, y))
+    same_page = sum(page == (s["pages"][i] if i is not None else None)
+                    for s, o, e in zip(sections, original, explicit) for page, i in zip(o, e))
+    print(f"walk/explicit agreement: {agree}/{total_chunks}, original/explicit agreement: {same_page}/{total_chunks}")
+
+    print(f"original scan:     {original_time * 1000:8.1f}ms")
+    print(f"single-pass walk:  {walk_time * 1000:8.1f}ms ({original_time / walk_time:.0f}x faster)")
+    print(f"explicit offsets:  {explicit_time * 1000:8.1f}ms ({original_time / explicit_time:.0f}x faster)")
+
+    legacy = copy.deepcopy(filing)
+    for section in legacy["sections"]:
+        del section["chunkPages"]
+    legacy_time, _ = timed(lambda: process_and_expand_json_data(legacy))
+    expand_time, _ = timed(lambda: process_and_expand_json_data(filing))
+    print(f"process_and_expand_json_data: old file {legacy_time * 1000:.1f}ms, with chunkPages {expand_time * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FILING)
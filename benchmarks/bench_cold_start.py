@@ -0,0 +1,93 @@
+# #####################################################################
+# Cold start of the Streamlit app.
+# Measures, each in a fresh interpreter:
+#   import streamlit: the floor every worker pays
+#   import main:      the RAG pipeline module imported by app.py
+#   first render:     a full first run of app.py through streamlit.testing
+# Fake secrets are provided and weaviate.Client is replaced by a mock, so
+# versions that connect at import time run without a cluster (the real
+# connection would only add to their numbers).
+# Pass --src to measure another checkout, e.g. the commit before a change:
+# > git worktree add /tmp/before HEAD~1
+#
+# Usage:
+# > python3 benchmarks/bench_cold_start.py [--runs N] [--src path_to_checkout]
+# #####################################################################
+
+import argparse
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+
+root = pathlib.Path(__file__).parent.parent.resolve()
+
+SECRETS = {"api_key_cohere": "fake_api_key_cohere", "api_key_weaviate": "fake_api_key_weaviate", "url_weaviate": "fake_url_weaviate"}
+
+# Replaces weaviate.Client when (and only if) the measured code imports weaviate
+PRELUDE = """
+import time
+start = time.perf_counter()
+import importlib.abc, importlib.util, sys
+from unittest.mock import patch, MagicMock
+
+class MockWeaviateClient(importlib.abc.MetaPathFinder):
+    def find_spec(self, name, path, target=None):
+        if name != "weaviate":
+            return None
+        sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(name)
+        exec_module = spec.loader.exec_module
+        def patched(module):
+            exec_module(module)
+            module.Client = MagicMock()
+        spec.loader.exec_module = patched
+        return spec
+
+sys.meta_path.insert(0, MockWeaviateClient())
+"""
+
+SCRIPTS = {
+    "import streamlit": """
+import streamlit
+""",
+    "import main": f"""
+import streamlit
+patch('streamlit.secrets', {SECRETS!r}).start()
+import main
+""",
+    "first render": f"""
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file('src/app.py', default_timeout=120)
+app.secrets.update({SECRETS!r})
+app.run()
+assert not app.exception, app.exception
+""",
+}
+
+
+def measure(tree: pathlib.Path, script: str) -> float:
+    code = PRELUDE + script + "\nprint(time.perf_counter() - start)\n"
+    env = dict(os.environ, PYTHONPATH=str(tree / "src"))
+    result = subprocess.run([sys.executable, "-c", code], cwd=tree, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cold start of the Streamlit app.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--src", default=str(root), help="Checkout to measure (default: this one)")
+    args = parser.parse_args()
+
+    tree = pathlib.Path(args.src).resolve()
+    print(f"{tree} ({args.runs} runs, median)")
+    for name, script in SCRIPTS.items():
+        times = [measure(tree, script) for _ in range(args.runs)]
+        print(f"{name:<17} {statistics.median(times):6.2f}s  (min {min(times):.2f}s, max {max(times):.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
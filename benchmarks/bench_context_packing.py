@@ -0,0 +1,91 @@
+# #####################################################################
+# Prompt size of the final generation as top_n grows, with every relevant
+# document stuffed into the prompt (as before) vs packed into the prompt
+# token budget (pack_context). Retrieves top_n pages of the bundled
+# ServiceNow 10-K for the canned questions from a local index (BM25 only,
+# no embeddings needed) and treats them all as relevant. With --live,
+# also times the answer of the light chat model on the first question
+# (needs .streamlit/secrets.toml).
+#
+# Usage:
+# > python3 benchmarks/bench_context_packing.py
+# > python3 benchmarks/bench_context_packing.py --top-n 5 15 30 --budget 3000 --live
+# #####################################################################
+
+import argparse
+import contextlib
+import io
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+root = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(1, os.path.join(root, "src"))
+sys.path.insert(1, os.path.join(root, "src", "database"))
+sys.path.insert(1, os.path.join(root, "benchmarks"))
+
+import constants
+from context_packing import estimate_tokens
+from main import clients, create_stuff_documents_chain, generate_rag_prompt_template, pack_context, parse_retrieved_documents
+from retrieval_backends import LocalVectorIndex, build_local_index
+
+
+def prompt_tokens(rag_prompt, documents):
+    return estimate_tokens(rag_prompt.format(context="\n\n".join(document.page_content for document in documents)))
+
+
+def time_answer(rag_prompt, documents):
+    chain = create_stuff_documents_chain(llm=clients.chat_model_light, prompt=rag_prompt)
+    start = time.perf_counter()
+    chain.invoke({"context": documents})
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the prompt size of the final generation against top_n.")
+    parser.add_argument("--top-n", type=int, nargs="+", default=[5, 10, 15, 30, 60])
+    parser.add_argument("--budget", type=int, default=3000, help="Prompt token budget")
+    parser.add_argument("--live", action="store_true", help="Also time the light chat model")
+    args = parser.parse_args(argv)
+
+    import weaviate_utils
+    from bench_streaming_import import make_filing
+    questions = constants.investor_questions + constants.fin_questions + constants.sales_questions
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "filing.json")
+        make_filing(path, 1)
+        index_dir = os.path.join(tmp_dir, "index")
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_local_index(weaviate_utils.iter_expanded_records(path), lambda texts: [[1.0]] * len(texts), index_dir)
+        index = LocalVectorIndex(index_dir)
+        company = next(iter(index.company_ranges))
+
+        print(f"{len(questions)} canned questions, prompt budget {args.budget} tokens")
+        for top_n in args.top_n:
+            stuffed, packed, pack_seconds = 0, 0, 0.0
+            for question in questions:
+                documents = parse_retrieved_documents(index.search(question, [company], top_n=top_n, alpha=0, group_by_page=True))
+                rag_prompt = generate_rag_prompt_template("Investor", question, [company])
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    packed_documents = pack_context(documents, rag_prompt, args.budget)
+                pack_seconds += time.perf_counter() - start
+                stuffed += prompt_tokens(rag_prompt, documents)
+                packed += prompt_tokens(rag_prompt, packed_documents)
+            count = len(questions)
+            print(f"top {top_n:>3}: stuffed {stuffed / count:7.0f} tokens, packed {packed / count:5.0f} tokens, "
+                  f"packing {pack_seconds / count * 1000:.2f}ms per prompt")
+
+            if args.live:
+                documents = parse_retrieved_documents(index.search(questions[0], [company], top_n=top_n, alpha=0, group_by_page=True))
+                rag_prompt = generate_rag_prompt_template("Investor", questions[0], [company])
+                with contextlib.redirect_stdout(io.StringIO()):
+                    packed_documents = pack_context(documents, rag_prompt, args.budget)
+                print(f"          answer: stuffed {time_answer(rag_prompt, documents):.1f}s, "
+                      f"packed {time_answer(rag_prompt, packed_documents):.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# #####################################################################
+# Input tokens per relevance filter call, with the whole page vs the
+# sentences around the retrieval hit (document_snippet). Retrieves the
+# top_n hits of the bundled ServiceNow 10-K for the canned questions from
+# a local index (BM25 only, no embeddings needed) and sizes the document
+# part of every filter prompt for a range of snippet windows.
+#
+# Usage:
+# > python3 benchmarks/bench_hit_snippets.py [top_n]
+# #####################################################################
+
+import contextlib
+import io
+import os
+import pathlib
+import sys
+import tempfile
+
+root = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(1, os.path.join(root, "src"))
+sys.path.insert(1, os.path.join(root, "src", "database"))
+sys.path.insert(1, os.path.join(root, "benchmarks"))
+
+import constants
+from context_packing import estimate_tokens
+from main import document_snippet, parse_retrieved_documents
+from retrieval_backends import LocalVectorIndex, build_local_index
+
+
+def main(top_n=15):
+    import weaviate_utils
+    from bench_streaming_import import make_filing
+    questions = constants.investor_questions + constants.fin_questions + constants.sales_questions + constants.summary_sections
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "filing.json")
+        make_filing(path, 1)
+        index_dir = os.path.join(tmp_dir, "index")
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_local_index(weaviate_utils.iter_expanded_records(path), lambda texts: [[1.0]] * len(texts), index_dir)
+        index = LocalVectorIndex(index_dir)
+        company = next(iter(index.company_ranges))
+
+        documents = []
+        for question in questions:
+            documents += parse_retrieved_documents(index.search(question, [company], top_n=top_n, alpha=0))
+        with_hit = sum(1 for document in documents if "chunk_offset" in document.metadata)
+        pages = sum(estimate_tokens(document.page_content) for document in documents)
+        print(f"{len(questions)} canned questions, top {top_n}: {len(documents)} filter calls, "
+              f"{with_hit} with the hit in the page (the others are page summary or key point hits)")
+        print(f"whole page         : {pages / len(documents):7.0f} tokens per call")
+        for sentences in [0, 1, 2, 3, 5, 8]:
+            tokens = sum(estimate_tokens(document_snippet(document, sentences)) for document in documents)
+            print(f"{sentences} sentences a side: {tokens / len(documents):7.0f} tokens per call ({pages / tokens:.1f}x fewer)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 15)
@@ -0,0 +1,91 @@
+# ##################################################################### 
+# Benchmarks LocalVectorIndex retrieval latency at Fortune-100 scale.
+# Builds a synthetic index (random unit vectors, random chunk words) with
+# the same layout as build_local_index and times single-company and
+# Compare-mode searches, vector only and hybrid (BM25 + vector).
+# 
+# Usage:
+# > python3 benchmarks/bench_local_index.py [companies] [chunks_per_company] [dims]
+# #####################################################################
+
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+src = os.path.join(pathlib.Path(__file__).parent.parent.resolve(), "src")
+sys.path.insert(1, src)
+
+from retrieval_backends import LocalVectorIndex, build_keyword_index
+
+VOCABULARY_SIZE = 20000
+
+
+def build_synthetic_index(index_dir, companies, chunks_per_company, dims):
+    rng = np.random.default_rng(0)
+    rows = companies * chunks_per_company
+    matrix = rng.standard_normal((rows, dims), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.save(os.path.join(index_dir, "embeddings.npy"), matrix)
+
+    # Chunks of 60 words drawn from a Zipf-like vocabulary of 20,000 words
+    vocabulary = np.asarray([f"w{i}" for i in range(VOCABULARY_SIZE)])
+    weights = 1.0 / np.arange(1, VOCABULARY_SIZE + 1)
+    words = rng.choice(vocabulary, size=(rows, 60), p=weights / weights.sum())
+
+    offsets = []
+    chunks = []
+    with open(os.path.join(index_dir, "records.jsonl"), "wb") as f:
+        for row in range(rows):
+            offsets.append(f.tell())
+            chunks.append(" ".join(words[row]))
+            record = {"companyName": f"Company {row // chunks_per_company}", "filingUrl": "http://example.com",
+                      "sectionSummary": "", "sectionPage": f"Page {row // 20}", "chunk": chunks[-1]}
+            f.write(json.dumps(record).encode("utf-8") + b"\n")
+    np.save(os.path.join(index_dir, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+    build_keyword_index(chunks, index_dir)
+
+    ranges = {f"Company {c}": [c * chunks_per_company, (c + 1) * chunks_per_company] for c in range(companies)}
+    with open(os.path.join(index_dir, "companies.json"), "w") as f:
+        json.dump(ranges, f)
+
+
+def time_searches(index, company_sets, dims, repeats=50, alpha=None):
+    rng = np.random.default_rng(1)
+    timings = []
+    for i in range(repeats):
+        vector = rng.standard_normal(dims).astype(np.float32)
+        # Query terms from across the vocabulary, common and rare
+        query = " ".join(f"w{word}" for word in rng.integers(0, VOCABULARY_SIZE // 10, size=6))
+        start = time.perf_counter()
+        if alpha is None:
+            index.search_vector(vector, company_sets[i % len(company_sets)], top_n=15)
+        else:
+            index.search_hybrid(query, vector, company_sets[i % len(company_sets)], top_n=15, alpha=alpha)
+        timings.append(time.perf_counter() - start)
+    timings = np.asarray(timings) * 1000
+    return np.median(timings), np.percentile(timings, 95)
+
+
+def run(companies=100, chunks_per_company=5000, dims=1024):
+    with tempfile.TemporaryDirectory() as index_dir:
+        build_synthetic_index(index_dir, companies, chunks_per_company, dims)
+        index = LocalVectorIndex(index_dir)
+        print(f"rows: {companies * chunks_per_company}, dims: {dims}")
+
+        single = [[f"Company {c}"] for c in range(companies)]
+        compare = [[f"Company {c}", f"Company {(c + 1) % companies}", f"Company {(c + 2) % companies}"] for c in range(companies)]
+        for label, alpha in [("vector", None), ("hybrid", 0.5), ("bm25", 0.0)]:
+            median, p95 = time_searches(index, single, dims, alpha=alpha)
+            print(f"{label} single company: median {median:.2f}ms, p95 {p95:.2f}ms")
+            median, p95 = time_searches(index, compare, dims, alpha=alpha)
+            print(f"{label} three companies: median {median:.2f}ms, p95 {p95:.2f}ms")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(*args)
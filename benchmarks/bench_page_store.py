@@ -0,0 +1,134 @@
+# #####################################################################
+# Import volume and retrieval payload size, with every object carrying
+# its page (legacy layout) vs pages stored once (page store layout).
+# Imports the bundled ServiceNow 10-K (chunked as in
+# bench_chunk_page_mapping.py, with page summaries and key points as in
+# bench_streaming_import.py) into a stand-in client that sums the JSON
+# size of the objects sent, then runs the canned questions against a
+# local index of the filing (BM25 only, no embeddings needed) and sizes
+# the hits as each layout returns them, and as searches grouped by page
+# (group_by_page) return them.
+#
+# Usage:
+# > python3 benchmarks/bench_page_store.py [filing_json] [top_n]
+# #####################################################################
+
+import json
+import os
+import pathlib
+import sys
+import tempfile
+
+root = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(1, os.path.join(root, "src"))
+sys.path.insert(1, os.path.join(root, "src", "database"))
+sys.path.insert(1, os.path.join(root, "benchmarks"))
+
+import constants
+from retrieval_backends import PAGE_PROPERTIES, PAGE_REFERENCE_PROPERTIES, RETRIEVAL_PROPERTIES, LocalVectorIndex, build_local_index
+
+
+class SizingSchema:
+    """
+    Schema of the stand-in client: both classes exist with every property.
+    """
+    def exists(self, class_name):
+        return True
+
+    def get(self, class_name):
+        return {"properties": [{"name": "contentHash"}, {"name": "pageId"}]}
+
+
+class SizingClient:
+    """
+    Stand-in for the Weaviate client of an empty class: sums the JSON size of the objects sent.
+    """
+    def __init__(self):
+        self.batch = self
+        self.schema = SizingSchema()
+        self.query = self
+        self.objects = {}
+        self.bytes = {}
+
+    def configure(self, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def flush(self):
+        pass
+
+    def add_data_object(self, data_object, class_name, uuid=None, tenant=None):
+        self.objects[class_name] = self.objects.get(class_name, 0) + 1
+        self.bytes[class_name] = self.bytes.get(class_name, 0) + len(json.dumps(data_object).encode("utf-8"))
+
+    def get(self, class_name, properties=None):
+        return self
+
+    def __getattr__(self, name):
+        # Query builder methods (with_where, with_limit, ...)
+        return lambda *args, **kwargs: self
+
+    def do(self):
+        return {"data": {"Get": {}}}
+
+
+def json_size(objects):
+    return sum(len(json.dumps(obj).encode("utf-8")) for obj in objects)
+
+
+def measure_import(path):
+    import weaviate_utils
+    for label, page_class in [("legacy", None), ("page store", "SECSavvyNOWPages")]:
+        client = SizingClient()
+        weaviate_utils.import_data_to_WEAVIATE(client, os.path.dirname(path), [os.path.basename(path)], "SECSavvyNOW",
+                                               record_versions=False, page_class=page_class)
+        detail = ", ".join(f"{count} {name}" for name, count in client.objects.items())
+        print(f"import {label:<10}: {sum(client.bytes.values()) / 1e6:7.2f} MB sent ({detail})")
+
+
+def measure_retrieval(path, top_n):
+    import weaviate_utils
+    questions = constants.investor_questions + constants.fin_questions + constants.sales_questions + constants.summary_sections
+    with tempfile.TemporaryDirectory() as index_dir:
+        build_local_index(weaviate_utils.iter_expanded_records(path), lambda texts: [[1.0]] * len(texts), index_dir)
+        index = LocalVectorIndex(index_dir)
+        company = next(iter(index.company_ranges))
+        legacy, page_store, grouped, hits_total, pages_total, grouped_total = 0, 0, 0, 0, 0, 0
+        for question in questions:
+            hits = index.search(question, [company], top_n=top_n, alpha=0)
+            pages = {hit["pageId"]: {name: hit[name] for name in PAGE_PROPERTIES} for hit in hits}
+            # Legacy: every hit carries its page; page store: references, then each distinct page once
+            legacy += json_size({name: hit[name] for name in RETRIEVAL_PROPERTIES} for hit in hits)
+            page_store += json_size({name: hit[name] for name in PAGE_REFERENCE_PROPERTIES} for hit in hits) + json_size(pages.values())
+            hits_total += len(hits)
+            pages_total += len(pages)
+            # Grouped: top_n distinct pages, with only the page properties
+            page_hits = index.search(question, [company], top_n=top_n, alpha=0, group_by_page=True)
+            grouped += json_size(page_hits)
+            grouped_total += len(page_hits)
+    count = len(questions)
+    print(f"retrieval top {top_n}, {count} canned questions: {hits_total / count:.1f} hits on {pages_total / count:.1f} distinct pages per query")
+    print(f"retrieval legacy    : {legacy / count / 1e3:7.1f} KB per query")
+    print(f"retrieval page store: {page_store / count / 1e3:7.1f} KB per query")
+    print(f"retrieval grouped   : {grouped / count / 1e3:7.1f} KB per query, {grouped_total / count:.1f} distinct pages per query")
+
+
+def main(filing_path=None, top_n=15):
+    from bench_streaming_import import make_filing
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "filing.json")
+        if filing_path:
+            path = filing_path
+        else:
+            make_filing(path, 1)
+        measure_import(path)
+        measure_retrieval(path, top_n)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None, int(sys.argv[2]) if len(sys.argv) > 2 else 15)
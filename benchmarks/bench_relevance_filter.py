@@ -0,0 +1,57 @@
+# ##################################################################### 
+# Benchmarks the relevance filtering stage of the RAG pipeline.
+# Compares the serial per-document loop against filter_relevant_documents
+# using a fake chat model with a fixed artificial latency.
+# 
+# Usage:
+# > python3 benchmarks/bench_relevance_filter.py [num_docs] [latency_seconds]
+# #####################################################################
+
+import os
+import pathlib
+import sys
+import time
+from unittest.mock import MagicMock
+
+src = os.path.join(pathlib.Path(__file__).parent.parent.resolve(), "src")
+sys.path.insert(1, src)
+
+# Clients are created on first use, and every call below passes its own chat model
+from main import Document, is_document_relevant_extractive_summary, filter_relevant_documents
+
+
+class FakeChatModel:
+    """
+    Stand-in for ChatCohere that sleeps for a fixed latency and echoes a summary.
+    """
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def __call__(self, messages):
+        time.sleep(self.latency)
+        return MagicMock(content=f"Summary of: {messages[0].content[-40:]}")
+
+
+def run(num_docs: int = 15, latency: float = 0.2) -> None:
+    model = FakeChatModel(latency)
+    docs = [Document(page_content=f"Page {i}", metadata={"source": f"http://example.com/{i}"}) for i in range(num_docs)]
+    query = "What is the company's revenue trend?"
+
+    start = time.perf_counter()
+    serial = [is_document_relevant_extractive_summary(doc, query, model) for doc in docs]
+    serial_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    concurrent = filter_relevant_documents(docs, query, cohere_model=model)
+    concurrent_time = time.perf_counter() - start
+
+    assert [d.page_content for d in serial] == [d.page_content for d in concurrent]
+    print(f"documents: {num_docs}, model latency: {latency:.2f}s")
+    print(f"serial:     {serial_time:.2f}s")
+    print(f"concurrent: {concurrent_time:.2f}s ({serial_time / concurrent_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    num_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    run(num_docs, latency)
@@ -0,0 +1,93 @@
+# #####################################################################
+# Sentences/sec and page-boundary agreement of the segmentation backends
+# on the bundled ServiceNow 10-K and 10-Q filings.
+# The reference is the most accurate backend installed (full, then senter,
+# then sentencizer); both need en_core_web_sm. A page boundary agrees when
+# the reference has one within `tolerance` characters of it.
+#
+# Usage:
+# > python3 benchmarks/bench_segmentation.py [n_process] [tolerance]
+# #####################################################################
+
+import glob
+import json
+import os
+import pathlib
+import sys
+import time
+
+root = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(1, os.path.join(root, "src", "text_processing"))
+
+import spacy
+from segmentation import SEGMENTATION_BACKENDS, get_segmenter, pack_pages
+
+FILINGS = sorted(glob.glob(os.path.join(root, "data", "fortune100_10*_2023", "NOW_*.json")))
+
+
+def page_starts(text, pages):
+    # Character offset of the first sentence of every page after the first
+    starts = []
+    cursor = 0
+    for page in pages:
+        for index, sentence in enumerate(page):
+            position = text.find(sentence, cursor)
+            if position == -1:
+                continue
+            if index == 0 and page is not pages[0]:
+                starts.append(position)
+            cursor = position + len(sentence)
+    return starts
+
+
+def agreement(reference, candidate, tolerance):
+    matched = total = 0
+    for ref_starts, starts in zip(reference, candidate):
+        total += max(len(ref_starts), len(starts))
+        matched += sum(any(abs(start - ref) <= tolerance for ref in ref_starts) for start in starts)
+    return matched / total if total else 1.0
+
+
+def sentence_agreement(reference, candidate):
+    # Share of reference sentences reproduced exactly, ignoring surrounding whitespace
+    matched = total = 0
+    for ref_sentences, sentences in zip(reference, candidate):
+        found = {sentence.strip() for sentence in sentences}
+        matched += sum(sentence.strip() in found for sentence in ref_sentences)
+        total += len(ref_sentences)
+    return matched / total if total else 1.0
+
+
+def main(n_process, tolerance):
+    texts = []
+    for path in FILINGS:
+        with open(path) as f:
+            texts += [section["raw"] for filing in json.load(f) for section in filing["sections"]]
+    print(f"{len(FILINGS)} filings, {len(texts)} sections, {sum(len(text) for text in texts) / 1e6:.1f}M characters")
+
+    model_installed = spacy.util.is_package("en_core_web_sm")
+    runs = []
+    for backend in SEGMENTATION_BACKENDS:
+        if backend in ("full", "senter") and not model_installed:
+            print(f"{backend:<12} skipped: en_core_web_sm is not installed")
+            continue
+        for processes in sorted({1, n_process}) if backend != "regex" else [1]:
+            segmenter = get_segmenter(backend, n_process=processes)
+            segmenter.split(texts[0][:1000])  # Load the pipeline outside the timing
+            start = time.perf_counter()
+            sentences = segmenter.split_many(texts)
+            elapsed = time.perf_counter() - start
+            pages = [pack_pages(section) for section in sentences]
+            runs.append((backend, processes, elapsed, sentences, [page_starts(text, p) for text, p in zip(texts, pages)]))
+
+    reference = runs[0]
+    print(f"reference: {reference[0]}")
+    for backend, processes, elapsed, sentences, starts in runs:
+        count = sum(len(section) for section in sentences)
+        print(f"{backend:<12} n_process={processes}  {count:>6} sentences  {count / elapsed:>9.0f} sentences/sec  "
+              f"sentence agreement {sentence_agreement(reference[3], sentences):.0%}  "
+              f"{sum(len(s) for s in starts):>3} page breaks, agreement {agreement(reference[4], starts, tolerance):.0%}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2, int(sys.argv[2]) if len(sys.argv) > 2 else 500)
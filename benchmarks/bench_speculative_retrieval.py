@@ -0,0 +1,53 @@
+# #####################################################################
+# Latency of a follow-up question before the relevance filter starts:
+# query rewrite then retrieval (serial) vs retrieval of the raw query
+# during the rewrite (speculative), when the speculation is kept and when
+# it is discarded. The rewrite, the comparison query generation and the
+# retrieval are stand-ins with fixed artificial latencies.
+#
+# Usage:
+# > python3 benchmarks/bench_speculative_retrieval.py [rewrite_seconds] [retrieval_seconds] [compare_queries_seconds]
+# #####################################################################
+
+import os
+import pathlib
+import sys
+import time
+from unittest.mock import patch
+
+src = os.path.join(pathlib.Path(__file__).parent.parent.resolve(), "src")
+sys.path.insert(1, src)
+
+import main
+from embedding_cache import EmbeddingCache
+
+
+def run(rewrite_latency: float = 0.8, retrieval_latency: float = 0.4, compare_latency: float = 0.8) -> None:
+    def rewrite(history):
+        time.sleep(rewrite_latency)
+        return rewritten_query[0]
+
+    def retrieve(query, company_names, cancelled=None):
+        # Compare mode generates the per-company queries first
+        time.sleep(retrieval_latency + (compare_latency if len(company_names) > 1 else 0))
+        return [main.Document(page_content=query, metadata={"source": "http://example.com"})]
+
+    # Queries embed to their counts of 'revenue' and 'debt'
+    cache = EmbeddingCache(lambda text: [text.count("revenue"), text.count("debt"), 1.0])
+    rewritten_query = [""]
+    print(f"rewrite: {rewrite_latency:.2f}s, retrieval: {retrieval_latency:.2f}s, comparison queries: {compare_latency:.2f}s")
+    with patch("main.generate_user_query", side_effect=rewrite), patch("main.retrieve_input_documents", side_effect=retrieve), \
+            main.clients.override(query_embedding_cache=cache):
+        for label, company_names in [("single company", ["A Inc"]), ("compare", ["A Inc", "B Inc"])]:
+            for mode, speculative, rewrite_to in [("serial", False, "What is the revenue?"),
+                                                  ("speculative, kept", True, "What is the revenue?"),
+                                                  ("speculative, discarded", True, "What is the debt?")]:
+                rewritten_query[0] = rewrite_to
+                start = time.perf_counter()
+                main.rewrite_and_retrieve("and revenue?", "User: debt?", company_names, speculative=speculative)
+                print(f"{label:<14} {mode:<22}: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    args = [float(arg) for arg in sys.argv[1:4]]
+    run(*args)
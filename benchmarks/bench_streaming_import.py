@@ -0,0 +1,126 @@
+# #####################################################################
+# Peak memory and throughput of the Weaviate import, whole-file vs streaming.
+# Builds synthetic filings of increasing size by repeating the sections of
+# the bundled ServiceNow 10-K (chunked as in bench_chunk_page_mapping.py),
+# then imports each one in a fresh process into a counting stand-in for
+# client.batch and reports the peak RSS of that process.
+#
+# Usage:
+# > python3 benchmarks/bench_streaming_import.py [copies ...]
+# #####################################################################
+
+import json
+import os
+import pathlib
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+root = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(1, os.path.join(root, "src"))
+sys.path.insert(1, os.path.join(root, "src", "database"))
+
+
+class CountingBatch:
+    """
+    Stand-in for client.batch that counts objects instead of sending them.
+    """
+    def __init__(self):
+        self.objects = 0
+
+    def configure(self, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def add_data_object(self, data_object, class_name, uuid=None, tenant=None):
+        self.objects += 1
+
+    def flush(self):
+        pass
+
+
+class EmptyClass:
+    """
+    Stand-in for client.schema and client.query of an empty class with the contentHash property.
+    """
+    def get(self, class_name, properties=None):
+        return {"properties": [{"name": "contentHash"}]} if properties is None else self
+
+    def __getattr__(self, name):
+        # Query builder methods (with_where, with_limit, ...)
+        return lambda *args, **kwargs: self
+
+    def do(self):
+        return {"data": {"Get": {"SECSavvyNOW": []}}}
+
+
+class CountingClient:
+    def __init__(self):
+        self.batch = CountingBatch()
+        self.schema = EmptyClass()
+        self.query = EmptyClass()
+
+
+def make_filing(path, copies):
+    from bench_chunk_page_mapping import DEFAULT_FILING, chunk_filing
+    with open(DEFAULT_FILING) as f:
+        filing = chunk_filing(json.load(f)[0])
+    for section in filing["sections"]:
+        # Page summaries and key points, as written by chunk.py
+        section["pageSummaries"] = [page[:1000] for page in section["pages"]]
+        section["keyPoints"] = [page.split(". ")[:5] for page in section["pages"]]
+    # Distinct section types keep the copies distinct objects (object UUIDs include the section type)
+    filing["sections"] = [dict(section, SectionType=f"{section['SectionType']}.{copy}")
+                          for copy in range(copies) for section in filing["sections"]]
+    with open(path, "w") as f:
+        json.dump([filing], f, indent=2)
+
+
+def run_import(mode, path):
+    import weaviate_utils
+    client = CountingClient()
+    start = time.perf_counter()
+    if mode == "stream":
+        weaviate_utils.FilingVersions = lambda: type("NoVersions", (), {"record": lambda self, name: None})()
+        weaviate_utils.import_data_to_WEAVIATE(client, os.path.dirname(path), [os.path.basename(path)], "SECSavvyNOW")
+    else:
+        # The previous import: whole file, expanded list and a copy split into batches
+        with open(path, "rb") as fp:
+            data = json.load(fp)[0]
+        expanded_data = weaviate_utils.process_and_expand_json_data(data)
+        batches = [expanded_data[i:i+50] for i in range(0, len(expanded_data), 50)]
+        with client.batch as batch:
+            for d in expanded_data:
+                if len(d["chunk"]) >= 20:
+                    batch.add_data_object(weaviate_utils.to_weaviate_properties(d), "SECSavvyNOW")
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"objects": client.batch.objects, "seconds": elapsed,
+                      "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def main(copies_list):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for copies in copies_list:
+            path = os.path.join(tmp_dir, f"filing_{copies}.json")
+            make_filing(path, copies)
+            size_mb = os.path.getsize(path) / 1e6
+            for mode in ["load", "stream"]:
+                output = subprocess.run([sys.executable, __file__, "--child", mode, path],
+                                        capture_output=True, text=True, check=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"{size_mb:7.1f} MB  {mode:<6}  {result['objects']:>8} objects  "
+                      f"{result['objects'] / result['seconds']:>9.0f} objects/sec  peak RSS {result['peak_rss_mb']:6.0f} MB")
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        run_import(sys.argv[2], sys.argv[3])
+    else:
+        main([int(arg) for arg in sys.argv[1:]] or [1, 10, 50])
@@ -0,0 +1,86 @@
+# #####################################################################
+# Pages/minute of the summarisation stage against a local fake completion
+# server with a fixed per-request latency.
+# Pages come from the bundled ServiceNow 10-K (segmented as in
+# bench_chunk_page_mapping.py). Each page needs a summary and key points
+# and each section a summary of its page summaries, as in chunk.process.
+# Compares the previous serial calls (a new AzureOpenAI client per call)
+# with the shared, rate-limited client and thread-pooled stages.
+#
+# Usage:
+# > python3 benchmarks/bench_summarisation.py [latency_seconds] [max_concurrency]
+# #####################################################################
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import pathlib
+import sys
+import time
+
+root = pathlib.Path(__file__).parent.parent.resolve()
+sys.path.insert(1, os.path.join(root, "src", "text_processing"))
+sys.path.insert(1, os.path.join(root, "test"))
+
+from openai import AzureOpenAI
+from bench_chunk_page_mapping import DEFAULT_FILING, segment
+from fake_completion_server import FakeCompletionServer
+from llm_pool import CompletionClient, RateLimiter, map_ordered
+
+SUMMARY_PROMPT = "Summarize the following 10-K report section in no more than 250 words:"
+KEY_POINTS_PROMPT = "Extract the 5 most important segments from this financal report. Limit each segment to 100 words. "
+
+
+def messages(prompt, text):
+    return [{"role": "system", "content": prompt}, {"role": "user", "content": text}]
+
+
+def serial(url, sections):
+    def call(prompt, text):
+        # As call_chatGpt did: a new client for every request
+        client = AzureOpenAI(api_key="fake", api_version="2023-03-15-preview", azure_endpoint=url)
+        return client.chat.completions.create(model="deployment", messages=messages(prompt, text)).choices[0].message.content
+
+    for pages in sections:
+        summaries = [call(SUMMARY_PROMPT, page) for page in pages]
+        call(SUMMARY_PROMPT, " ".join(summaries))
+        [call(KEY_POINTS_PROMPT, page) for page in pages]
+
+
+def concurrent(url, sections, max_concurrency):
+    client = CompletionClient(
+        lambda: AzureOpenAI(api_key="fake", api_version="2023-03-15-preview", azure_endpoint=url, max_retries=0),
+        limiter=RateLimiter(max_concurrency=max_concurrency, tokens_per_minute=None))
+
+    def call(prompt, text):
+        return client.create(model="deployment", messages=messages(prompt, text)).choices[0].message.content
+
+    def process(pages):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            key_points = executor.submit(map_ordered, lambda page: call(KEY_POINTS_PROMPT, page), pages)
+            summaries = map_ordered(lambda page: call(SUMMARY_PROMPT, page), pages)
+            call(SUMMARY_PROMPT, " ".join(summaries))
+            key_points.result()
+
+    map_ordered(process, sections, 4)
+
+
+def main(latency, max_concurrency):
+    with open(DEFAULT_FILING) as f:
+        filing = json.load(f)[0]
+    sections = [[" ".join(page) for page in segment(section["raw"])] for section in filing["sections"]]
+    page_count = sum(len(pages) for pages in sections)
+    print(f"{page_count} pages in {len(sections)} sections, {latency:.2f}s per request")
+
+    for name, run in [("serial", lambda url: serial(url, sections)),
+                      (f"concurrent ({max_concurrency})", lambda url: concurrent(url, sections, max_concurrency))]:
+        with FakeCompletionServer(latency=latency) as server:
+            start = time.perf_counter()
+            run(server.url)
+            elapsed = time.perf_counter() - start
+        print(f"{name:<16} {elapsed:6.1f}s  {page_count / elapsed * 60:7.1f} pages/minute  "
+              f"{server.requests} requests, {server.connections} connections, peak concurrency {server.peak_active}")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 0.25, int(sys.argv[2]) if len(sys.argv) > 2 else 8)
@@ -0,0 +1,161 @@
+# #####################################################################
+# Retrieval latency of the two Weaviate layouts: one shared class filtered
+# on companyName, and one tenant per company (weaviate_layout = "tenants").
+# With --url, runs against a local Weaviate: imports random vectors into a
+# shared class and a multi-tenant class, times the app's WeaviateBackend
+# on both, then deletes the classes. Without it, uses the in-process
+# stand-in: brute-force search over the whole corpus with a companyName
+# mask (shared) vs over the company's own rows (tenants).
+#
+# Usage:
+# > docker run -p 8080:8080 semitechnologies/weaviate:1.23.7
+# > python3 benchmarks/bench_tenant_layout.py --url http://localhost:8080
+# > python3 benchmarks/bench_tenant_layout.py --companies 100 --chunks 1000 --dims 1024
+# #####################################################################
+
+import argparse
+import os
+import pathlib
+import sys
+import time
+
+import numpy as np
+
+src = os.path.join(pathlib.Path(__file__).parent.parent.resolve(), "src")
+sys.path.insert(1, src)
+
+from retrieval_backends import RETRIEVAL_PROPERTIES, WeaviateBackend, tenant_name
+
+
+class FixedVectors:
+    """
+    Stand-in for the query embedding cache: query text -> precomputed vector.
+    """
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_queries(self, queries):
+        return [self.vectors[query] for query in queries]
+
+
+def random_unit_vectors(rng, rows, dims):
+    vectors = rng.standard_normal((rows, dims), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def summarise(timings):
+    timings = np.asarray(timings) * 1000
+    return f"median {np.median(timings):.2f}ms, p95 {np.percentile(timings, 95):.2f}ms"
+
+
+def time_searches(search, company_sets, queries):
+    timings = []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        search(query, company_sets[i % len(company_sets)])
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_in_process(companies, chunks, dims, repeats, top_n=15):
+    rng = np.random.default_rng(0)
+    # Shared layout: all companies' objects interleaved in one index
+    company_ids = rng.permutation(np.repeat(np.arange(companies), chunks))
+    matrix = random_unit_vectors(rng, companies * chunks, dims)
+    # Tenant layout: every company's objects in their own index
+    order = np.argsort(company_ids, kind="stable")
+    tenant_matrix = matrix[order]
+
+    def shared(vector, company_set):
+        distances = 1.0 - matrix @ vector
+        rows = np.flatnonzero(np.isin(company_ids, company_set))
+        best = rows[np.argpartition(distances[rows], top_n)[:top_n]]
+        return best[np.argsort(distances[best])]
+
+    def tenants(vector, company_set):
+        hits = []
+        for company in company_set:
+            distances = 1.0 - tenant_matrix[company * chunks:(company + 1) * chunks] @ vector
+            best = np.argpartition(distances, top_n)[:top_n]
+            hits += [(distances[row], company * chunks + row) for row in best]
+        return [row for _, row in sorted(hits)[:top_n]]
+
+    query_vectors = random_unit_vectors(rng, repeats, dims)
+    print(f"in-process stand-in, rows: {companies * chunks}, dims: {dims}")
+    report(shared, tenants, companies, query_vectors)
+
+
+def run_weaviate(url, companies, chunks, dims, repeats):
+    import weaviate
+    from weaviate.schema import Tenant
+
+    client = weaviate.Client(url)
+    rng = np.random.default_rng(0)
+    names = [f"Company {company}" for company in range(companies)]
+    properties = [{"name": name, "dataType": ["text"]} for name in RETRIEVAL_PROPERTIES]
+    classes = {"BenchShared": False, "BenchTenants": True}
+    for class_name, multi_tenant in classes.items():
+        if client.schema.exists(class_name):
+            client.schema.delete_class(class_name)
+        client.schema.create_class({"class": class_name, "vectorizer": "none", "properties": properties,
+                                    "multiTenancyConfig": {"enabled": multi_tenant}})
+    client.schema.add_class_tenants("BenchTenants", [Tenant(name=tenant_name(name)) for name in names])
+
+    try:
+        start = time.perf_counter()
+        client.batch.configure(batch_size=200, dynamic=True)
+        with client.batch as batch:
+            for company, name in enumerate(names):
+                vectors = random_unit_vectors(rng, chunks, dims)
+                for row, vector in enumerate(vectors):
+                    data_object = {"companyName": name, "filingUrl": "http://example.com", "sectionSummary": "",
+                                   "sectionPage": f"Page {row // 20}", "chunk": f"Chunk {row}"}
+                    batch.add_data_object(data_object, "BenchShared", vector=vector.tolist())
+                    batch.add_data_object(data_object, "BenchTenants", vector=vector.tolist(), tenant=tenant_name(name))
+        print(f"local Weaviate {url}, objects: {companies * chunks} per class, dims: {dims}, "
+              f"imported in {time.perf_counter() - start:.0f}s")
+
+        # Queries are sent as text, embedded by the FixedVectors stand-in
+        queries = [str(i) for i in range(repeats)]
+        embedding_cache = FixedVectors(dict(zip(queries, random_unit_vectors(rng, repeats, dims).tolist())))
+        backends = {
+            "BenchShared": WeaviateBackend(client, embedding_cache),
+            "BenchTenants": WeaviateBackend(client, embedding_cache, tenants=True),
+        }
+
+        def searcher(class_name):
+            def search(query, company_set):
+                return backends[class_name].search(query, [names[c] for c in company_set], top_n=15, class_name=class_name)
+            return search
+
+        report(searcher("BenchShared"), searcher("BenchTenants"), companies, queries)
+    finally:
+        for class_name in classes:
+            client.schema.delete_class(class_name)
+
+
+def report(shared, tenants, companies, queries):
+    single = [[company] for company in range(companies)]
+    compare = [[company, (company + 1) % companies, (company + 2) % companies] for company in range(companies)]
+    for label, company_sets in [("single company", single), ("three companies", compare)]:
+        for layout, search in [("shared", shared), ("tenants", tenants)]:
+            print(f"{layout:<8} {label}: {summarise(time_searches(search, company_sets, queries))}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the shared and per-company tenant Weaviate layouts.")
+    parser.add_argument("--url", help="URL of a local Weaviate (default: in-process stand-in)")
+    parser.add_argument("--companies", type=int, default=100)
+    parser.add_argument("--chunks", type=int, default=1000, help="Chunks per company")
+    parser.add_argument("--dims", type=int, default=1024)
+    parser.add_argument("--repeats", type=int, default=50, help="Searches per measurement")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        run_weaviate(args.url, args.companies, args.chunks, args.dims, args.repeats)
+    else:
+        run_in_process(args.companies, args.chunks, args.dims, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
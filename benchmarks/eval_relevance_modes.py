@@ -0,0 +1,133 @@
+# #####################################################################
+# Offline evaluation of the relevance filtering modes ("llm" vs "rerank").
+# Replays a recorded fixture of queries, candidate pages, light-model
+# responses, rerank scores and call latencies, and reports the latency
+# and the precision/recall of the kept documents against the labels.
+#
+# Usage:
+# > python3 benchmarks/eval_relevance_modes.py [fixture.json]
+# Re-record the model responses, scores and latencies (needs API keys):
+# > python3 benchmarks/eval_relevance_modes.py [fixture.json] --record
+# #####################################################################
+
+import json
+import os
+import pathlib
+import sys
+import time
+from unittest.mock import MagicMock
+
+src = os.path.join(pathlib.Path(__file__).parent.parent.resolve(), "src")
+sys.path.insert(1, src)
+
+DEFAULT_FIXTURE = os.path.join(pathlib.Path(__file__).parent.resolve(), "fixtures", "relevance_eval.json")
+
+
+class ReplayChatModel:
+    """
+    Stand-in for ChatCohere that replays the recorded light-model response for each page.
+    """
+    def __init__(self, documents):
+        self.responses = {doc["page_content"]: doc for doc in documents}
+
+    def __call__(self, messages):
+        prompt = messages[0].content
+        doc = next(d for content, d in self.responses.items() if content in prompt)
+        time.sleep(doc["llm_latency"])
+        return MagicMock(content=doc["llm_response"])
+
+
+def replay_rerank(query_fixture):
+    """
+    Build a stand-in for client_cohere.rerank that replays the recorded scores.
+    """
+    def rerank(model, query, documents, top_n):
+        time.sleep(query_fixture["rerank_latency"])
+        scores = [doc["rerank_score"] for doc in query_fixture["documents"]]
+        order = sorted(range(len(documents)), key=lambda i: -scores[i])[:top_n]
+        return [MagicMock(index=i, relevance_score=scores[i]) for i in order]
+    return rerank
+
+
+def score(kept_ids, relevant_ids):
+    true_positives = len(kept_ids & relevant_ids)
+    precision = true_positives / len(kept_ids) if kept_ids else 1.0
+    recall = true_positives / len(relevant_ids) if relevant_ids else 1.0
+    return precision, recall
+
+
+def evaluate(fixture):
+    import main
+
+    totals = {"llm": [0.0, 0.0, 0.0, 0], "rerank": [0.0, 0.0, 0.0, 0]}
+    for query_fixture in fixture["queries"]:
+        query = query_fixture["query"]
+        docs = query_fixture["documents"]
+        documents = [main.Document(page_content=d["page_content"], metadata={"source": d["source"], "id": d["id"]}) for d in docs]
+        relevant_ids = {d["id"] for d in docs if d["relevant"]}
+        print(f"\n{query}")
+
+        for mode in ["llm", "rerank"]:
+            model = ReplayChatModel(docs)
+            with main.clients.override(cohere=MagicMock(rerank=MagicMock(side_effect=replay_rerank(query_fixture)))):
+                start = time.perf_counter()
+                kept = main.select_relevant_documents(documents, query, mode=mode, cohere_model=model)
+                elapsed = time.perf_counter() - start
+
+            if mode == "llm":
+                # Extractive summaries replace the page text: map them back to the recorded documents
+                by_response = {d["llm_response"]: d["id"] for d in docs}
+                kept_ids = {by_response[doc.page_content] for doc in kept}
+            else:
+                kept_ids = {doc.metadata["id"] for doc in kept}
+            precision, recall = score(kept_ids, relevant_ids)
+            print(f"  {mode:<7} latency {elapsed:5.2f}s  kept {len(kept_ids)}  precision {precision:.2f}  recall {recall:.2f}")
+
+            total = totals[mode]
+            total[0] += elapsed
+            total[1] += precision
+            total[2] += recall
+            total[3] += 1
+
+    print("\nAverages")
+    for mode, (elapsed, precision, recall, count) in totals.items():
+        print(f"  {mode:<7} latency {elapsed / count:5.2f}s  precision {precision / count:.2f}  recall {recall / count:.2f}")
+
+
+def record(fixture, fixture_path):
+    import main
+
+    for query_fixture in fixture["queries"]:
+        query = query_fixture["query"]
+        for doc in query_fixture["documents"]:
+            document = main.Document(page_content=doc["page_content"], metadata={"source": doc["source"]})
+            start = time.perf_counter()
+            summary = main.is_document_relevant_extractive_summary(document, query)
+            doc["llm_latency"] = round(time.perf_counter() - start, 3)
+            doc["llm_response"] = summary.page_content if summary else "irrelevant"
+
+        start = time.perf_counter()
+        results = main.client_cohere.rerank(model=main.RERANK_MODEL,
+                                            query=query,
+                                            documents=[d["page_content"] for d in query_fixture["documents"]],
+                                            top_n=len(query_fixture["documents"]))
+        query_fixture["rerank_latency"] = round(time.perf_counter() - start, 3)
+        for result in results:
+            query_fixture["documents"][result.index]["rerank_score"] = result.relevance_score
+
+    with open(fixture_path, "w") as f:
+        json.dump(fixture, f, indent=4)
+    print(f"Recorded {len(fixture['queries'])} queries to {fixture_path}")
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    fixture_path = args[0] if args else DEFAULT_FIXTURE
+    with open(fixture_path) as f:
+        fixture = json.load(f)
+
+    if "--record" in sys.argv:
+        record(fixture, fixture_path)
+    else:
+        # Clients are created on first use: the replay injects a fake Cohere client and needs no secrets
+        evaluate(fixture)
@@ -0,0 +1,285 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+# Default on-disk locations, relative to the repository root
+CACHE_DIR = os.path.join(pathlib.Path(__file__).parent.parent.resolve(), "cache")
+DEFAULT_SQLITE_PATH = os.path.join(CACHE_DIR, "answer_cache.sqlite")
+DEFAULT_VERSIONS_PATH = os.path.join(CACHE_DIR, "filing_versions.json")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for exact-match lookups (case, surrounding and repeated whitespace).
+    """
+    return " ".join(query.lower().split())
+
+
+def make_scope(company_names: List[str], user_persona: str) -> str:
+    """
+    Build the cache scope shared by all entries for the same companies and persona.
+    """
+    return json.dumps([sorted(company_names), user_persona])
+
+
+def make_key(query: str, company_names: List[str], user_persona: str) -> str:
+    """
+    Build the exact-match cache key for a (query, companies, persona) triple.
+    """
+    raw = json.dumps([normalize_query(query), sorted(company_names), user_persona])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class FilingVersions:
+    """
+    Registry of the last time each company's filings were imported.
+
+    The importer records an import with record(); cached answers created before
+    a company's last import are treated as stale. The registry is a small JSON
+    file so the import scripts and the app can share it across processes.
+    """
+    def __init__(self, path: str = DEFAULT_VERSIONS_PATH):
+        self.path = path
+        self._mtime = None
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, float]:
+        """
+        Return the company -> last import timestamp mapping, re-reading the file only when it changed.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            if mtime != self._mtime:
+                with open(self.path) as f:
+                    self._versions = json.load(f)
+                self._mtime = mtime
+            return self._versions
+
+    def record(self, company_name: str, timestamp: Optional[float] = None) -> None:
+        """
+        Record that a company's filings were (re-)imported.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        versions = dict(self.load())
+        versions[company_name] = time.time() if timestamp is None else timestamp
+        # Unique per process, so concurrent importers never share a temporary file
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(versions, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def is_stale(self, company_names: Iterable[str], created_at: float) -> bool:
+        """
+        Check whether any of the companies was imported after `created_at`.
+        """
+        versions = self.load()
+        return any(versions.get(company, 0) > created_at for company in company_names)
+
+
+class MemoryCacheBackend:
+    """
+    In-process cache backend with LRU eviction.
+    """
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def scope_entries(self, scope: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [entry for entry in self._entries.values() if entry["scope"] == scope]
+
+
+class SQLiteCacheBackend:
+    """
+    On-disk cache backend stored in SQLite, with LRU eviction on last access time.
+    """
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, scope TEXT, entry TEXT, last_access REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_scope ON answers (scope)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_last_access ON answers (last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT entry FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE answers SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return json.loads(row[0])
+
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, scope, entry, last_access) VALUES (?, ?, ?, ?)",
+                (key, entry["scope"], json.dumps(entry), time.time())
+            )
+            self._conn.execute(
+                "DELETE FROM answers WHERE key IN ("
+                "SELECT key FROM answers ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def scope_entries(self, scope: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT entry FROM answers WHERE scope = ?", (scope,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+
+class AnswerCache:
+    """
+    Answer cache for the RAG pipeline, keyed on (query, companies, persona).
+
+    Lookups try an exact match on the normalized query first, then fall back to the
+    most similar cached query for the same companies and persona, using the query
+    embeddings. Entries expire after `ttl` seconds and are dropped when one of their
+    companies has been re-imported since they were created.
+    """
+    def __init__(self,
+                 backend=None,
+                 embed_fn: Optional[Callable[[str], List[float]]] = None,
+                 ttl: float = 24 * 3600,
+                 similarity_threshold: float = 0.95,
+                 versions: Optional[FilingVersions] = None):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.embed_fn = embed_fn
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.versions = versions if versions is not None else FilingVersions()
+        # Query embeddings computed during a miss, reused by the following set()
+        self._embeddings = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _embed(self, query: str) -> Optional[List[float]]:
+        if self.embed_fn is None:
+            return None
+        normalized = normalize_query(query)
+        with self._lock:
+            if normalized in self._embeddings:
+                return self._embeddings[normalized]
+        try:
+            embedding = list(self.embed_fn(query))
+        except Exception as e:
+            # A failed embedding only disables the similarity lookup
+            print(f"An error occurred: {e}")
+            return None
+        with self._lock:
+            self._embeddings[normalized] = embedding
+            while len(self._embeddings) > 128:
+                self._embeddings.popitem(last=False)
+        return embedding
+
+    def _is_valid(self, entry: Dict[str, Any]) -> bool:
+        if time.time() - entry["created_at"] > self.ttl:
+            return False
+        return not self.versions.is_stale(entry["companies"], entry["created_at"])
+
+    def get(self, query: str, company_names: List[str], user_persona: str) -> Optional[Tuple[str, List[str], str]]:
+        """
+        Look up a cached answer.
+
+        Args:
+            query (str): The user query.
+            company_names (list of str): Company names being analyzed.
+            user_persona (str): The persona of the user.
+
+        Returns:
+            tuple or None: (answer, sources, search_type) on a hit, None on a miss.
+        """
+        # Exact match
+        key = make_key(query, company_names, user_persona)
+        entry = self.backend.get(key)
+        if entry is not None:
+            if self._is_valid(entry):
+                return entry["answer"], entry["sources"], entry["search_type"]
+            self.backend.delete(key)
+
+        # Embedding-similarity match within the same companies and persona
+        candidates = self.backend.scope_entries(make_scope(company_names, user_persona))
+        candidates = [c for c in candidates if c.get("embedding")]
+        if not candidates:
+            return None
+        embedding = self._embed(query)
+        if embedding is None:
+            return None
+
+        query_vector = np.asarray(embedding, dtype=np.float32)
+        matrix = np.asarray([c["embedding"] for c in candidates], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector)
+        similarities = matrix @ query_vector / np.where(norms == 0, 1, norms)
+
+        for index in np.argsort(-similarities):
+            if similarities[index] < self.similarity_threshold:
+                break
+            entry = candidates[index]
+            if self._is_valid(entry):
+                return entry["answer"], entry["sources"], entry["search_type"]
+            self.backend.delete(entry["key"])
+
+        return None
+
+    def set(self, query: str, company_names: List[str], user_persona: str,
+            answer: str, sources: Any, search_type: str) -> None:
+        """
+        Store an answer for a (query, companies, persona) triple.
+        """
+        key = make_key(query, company_names, user_persona)
+        self.backend.set(key, {
+            "key": key,
+            "scope": make_scope(company_names, user_persona),
+            "query": query,
+            "companies": sorted(company_names),
+            "persona": user_persona,
+            "embedding": self._embed(query),
+            "answer": answer,
+            "sources": sources,
+            "search_type": search_type,
+            "created_at": time.time()
+        })
@@ -1,22 +1,15 @@
-from langchain.retrievers import ContextualCompressionRetriever, CohereRagRetriever
-from langchain.retrievers.document_compressors import CohereRerank
-from langchain_community.embeddings import CohereEmbeddings
-from langchain_community.chat_models import ChatCohere
-from langchain.docstore.document import Document
-import cohere
-import weaviate
 import streamlit as st
 from streamlit_pills import pills
 
 from main import retrieve_top_documents
-from main import rag, rag_with_webSearch
+from main import rag, rag_with_webSearch, rag_with_webSearch_stream
+from pipeline_runs import PipelineRuns, request_key
+from prefilled_answers import DEFAULT_PREFILLED_PATH, PrefilledAnswerStore, is_canned, prefill_text
 import constants
 
 import requests
 import json
 import os
-import numpy as np
-import pandas as pd
 import random
 
 import warnings
@@ -27,21 +20,7 @@ def prefill_prompts(action, choice, company):
     if action == None:
         return
     
-    # list of companies
-    if type(choice) == list:
-        choice = ", ".join(choice)
-        
-    prompts = {
-        'Summarize': 'Summarize the following section',
-        'Questions': 'Answer the following question',
-        'Compare': 'Compare these companies',
-    }
-        
-    # grammar fix 
-    if action == 'Compare':
-        prefill = f'{prompts[action]} with {company}: {str(choice)}'
-    else:
-        prefill = f'{prompts[action]} for {company}: {str(choice)}'
+    prefill = prefill_text(action, choice, company)
 
     js = f"""
         <script>
@@ -57,12 +36,81 @@ def prefill_prompts(action, choice, company):
         """
     st.components.v1.html(js, height=0)
 
+
+@st.cache_resource(show_spinner=False)
+def get_pipeline_runs():
+    # Pipeline runs in flight, shared by every session of the process
+    return PipelineRuns()
+
+
+@st.cache_resource(show_spinner=False)
+def get_prefilled_answers(path=DEFAULT_PREFILLED_PATH):
+    # Answers of the canned prompts, precomputed by warm_up.py
+    return PrefilledAnswerStore(path)
+
+
+def button_grid(options):
+    # Two columns of buttons; returns the clicked option, if any
+    clicked = None
+    columns = st.columns(2)
+    for index, option in enumerate(options):
+        with columns[0 if index < len(options)//2 else 1]:
+            if st.button(option, use_container_width=True, type='primary'):
+                clicked = option
+    return clicked
+
+
+def render_answer(run, message_placeholder):
+    # Follow a pipeline run from its first event; a rerun re-attaches to the same run
+    events = run.follow()
+    with st.spinner(f'Generating the Answer: ...'):
+        # Show pipeline progress until the first answer token arrives
+        event = next(events)
+        while event["type"] == "status":
+            message_placeholder.markdown(f"{event['message']} ...")
+            event = next(events)
+    # Render the answer as it is generated
+    answer = ""
+    while event["type"] == "token":
+        answer += event["text"]
+        message_placeholder.markdown(f"Answer: {answer}▌")
+        event = next(events)
+    # The last event carries the final answer and its citations
+    return event
+
+
+def render_result(result, message_placeholder):
+    message_placeholder.markdown(f"Answer: {result['answer']}\n\r Citation:\n\r{result['search_type']}: {result['sources']}")
+
+
+def show_pending_run():
+    # Render the pending run to its end and keep its result for the session
+    run = st.session_state.pending_run
+    if run is None:
+        return
+    with st.chat_message("assistant"):
+        message_placeholder = st.empty()
+        try:
+            result = render_answer(run, message_placeholder)
+        finally:
+            # Only a rerun interrupting the rendering leaves the run pending
+            if run.done:
+                st.session_state.pending_run = None
+        st.session_state.pipeline_results[run.key] = result
+        st.session_state.messages.append({"role": "assistant", "content": result["answer"]})
+        render_result(result, message_placeholder)
+
 ## --- ##
 
 # Set Streamlit config
 st.set_page_config(layout="wide")
 if "messages" not in st.session_state:
     st.session_state.messages = []
+# Final pipeline events by request key, and the run whose answer is being shown
+if "pipeline_results" not in st.session_state:
+    st.session_state.pipeline_results = {}
+if "pending_run" not in st.session_state:
+    st.session_state.pending_run = None
 
 #368B28 theme primary color
 custom_css = """
@@ -121,47 +169,19 @@ with st.sidebar:
     clear_chat = st.button('➕ New Topic', type='primary', help='Restart the chat.')    
 if clear_chat:
     st.session_state.messages = []
+    st.session_state.pending_run = None
 
 if feature == 'Summarize':
     st.markdown("<h5 style='text-align: center; color: gray;'>Choose the section you want to summarize.</h5>", unsafe_allow_html=True)
-
-    buttons = []
-    columns = st.columns(2)
-    for index, i in enumerate(constants.summary_sections):
-        col_num = 0  if index < len(constants.summary_sections)//2 else 1
-        with columns[col_num]:
-            button = st.button(i, use_container_width=True, type='primary')
-            buttons.append(button)
-    choice = None if True not in buttons else constants.summary_sections[buttons.index(True)]
+    choice = button_grid(constants.summary_sections)
 elif feature == 'Questions':
     st.markdown("<h5 style='text-align: center; color: gray;'>Choose the question you want to explore.</h5>", unsafe_allow_html=True)
     if persona == 'Sales Representative':
-        buttons = []
-        columns = st.columns(2)
-        for index, i in enumerate(constants.sales_questions):
-            col_num = 0  if index < len(constants.sales_questions)//2 else 1
-            with columns[col_num]:
-                button = st.button(i, use_container_width=True, type='primary')
-                buttons.append(button)
-        choice = None if True not in buttons else constants.sales_questions[buttons.index(True)]
+        choice = button_grid(constants.sales_questions)
     elif persona == 'Investor':
-        buttons = []
-        columns = st.columns(2)
-        for index, i in enumerate(constants.investor_questions):
-            col_num = 0  if index < len(constants.investor_questions)//2 else 1
-            with columns[col_num]:
-                button = st.button(i, use_container_width=True, type='primary')
-                buttons.append(button)
-        choice = None if True not in buttons else constants.investor_questions[buttons.index(True)]
+        choice = button_grid(constants.investor_questions)
     else:
-        buttons = []
-        columns = st.columns(2)
-        for index, i in enumerate(constants.fin_questions):
-            col_num = 0  if index < len(constants.fin_questions)//2 else 1
-            with columns[col_num]:
-                button = st.button(i, use_container_width=True, type='primary')
-                buttons.append(button)
-        choice = None if True not in buttons else constants.fin_questions[buttons.index(True)]
+        choice = button_grid(constants.fin_questions)
 
 # Load history
 for message in st.session_state.messages:
@@ -171,21 +191,42 @@ for message in st.session_state.messages:
 if choice is not None:
     prefill_prompts(feature, choice, company)
 
+# An answer interrupted by a rerun (e.g. a widget change) continues where the pipeline is
+show_pending_run()
+
 # Chat interface
 if prompt_msg := st.chat_input("Ask a follow-up question..."):
     st.session_state.messages.append({"role": "user", "content": prompt_msg})
     with st.chat_message("user"):
         st.markdown(prompt_msg)
 
-    with st.chat_message("assistant"):
-        message_placeholder = st.empty()
-        with st.spinner(f'Generating the Answer: ...'):
-            if feature == 'Compare':
-                company_list = choice + [company]
-            else:
-                company_list = [company]
-            answer, citations, search_type = rag_with_webSearch(user_query=prompt_msg, 
-                                                                user_persona=persona, 
-                                                                company_names=company_list)
-        st.session_state.messages.append({"role": "assistant", "content": answer})
-        message_placeholder.markdown(f"Answer: {answer}\n\r Citation:\n\r{search_type}: {citations}")
+    if feature == 'Compare':
+        company_list = choice + [company]
+    else:
+        company_list = [company]
+    key = request_key(prompt_msg, persona, company_list)
+    # A pre-filled prompt submitted unchanged, for a single company
+    canned = feature != 'Compare' and is_canned(prompt_msg, persona, company)
+    prefilled = None
+    if canned:
+        prefilled_answers = get_prefilled_answers(st.secrets.get("prefilled_answers_path", DEFAULT_PREFILLED_PATH))
+        prefilled = prefilled_answers.get(prompt_msg, persona, company)
+    if prefilled is not None and key not in st.session_state.pipeline_results:
+        answer, sources, search_type = prefilled
+        st.session_state.pipeline_results[key] = {"type": "done", "answer": answer, "sources": sources, "search_type": search_type}
+
+    if key in st.session_state.pipeline_results:
+        # Precomputed, or asked before in this session: no pipeline call
+        result = st.session_state.pipeline_results[key]
+        st.session_state.messages.append({"role": "assistant", "content": result["answer"]})
+        with st.chat_message("assistant"):
+            render_result(result, st.empty())
+    else:
+        def answer_events():
+            events = rag_with_webSearch_stream(user_query=prompt_msg, user_persona=persona, company_names=company_list)
+            # Canned prompts without a current precomputed answer (new, or filings re-imported) are rebuilt
+            return prefilled_answers.recording(events, prompt_msg, persona, company) if canned else events
+
+        # Runs in the background: a rerun while it is in flight follows it instead of starting another one
+        st.session_state.pending_run = get_pipeline_runs().start(key, answer_events)
+        show_pending_run()
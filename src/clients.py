@@ -0,0 +1,142 @@
+from contextlib import contextmanager
+import threading
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+import streamlit as st
+
+from answer_cache import AnswerCache, MemoryCacheBackend, SQLiteCacheBackend
+from embedding_cache import EmbeddingCache, SQLiteEmbeddingStore
+from retrieval_backends import DEFAULT_INDEX_DIR, LocalVectorIndex, WeaviateBackend
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of the app's API clients, models and caches.
+
+    Each client is created on first use from the secrets, then shared by every
+    caller. Tests (and benchmarks) replace clients with inject() or override()
+    instead of patching secrets before import.
+    """
+    def __init__(self, secrets: Optional[Mapping[str, Any]] = None):
+        self._secrets = secrets
+        self.instances: Dict[str, Any] = {}
+        # Re-entrant: building a client may build the clients it depends on
+        self._lock = threading.RLock()
+
+    @property
+    def secrets(self) -> Mapping[str, Any]:
+        return st.secrets if self._secrets is None else self._secrets
+
+    def get(self, name: str) -> Any:
+        """
+        Return a client, creating it on first use.
+        """
+        with self._lock:
+            if name not in self.instances:
+                self.instances[name] = getattr(self, f"_build_{name}")()
+            return self.instances[name]
+
+    def inject(self, **instances: Any) -> None:
+        """
+        Replace clients, e.g. with mocks.
+        """
+        with self._lock:
+            self.instances.update(instances)
+
+    @contextmanager
+    def override(self, **instances: Any) -> Iterator["ClientRegistry"]:
+        """
+        Replace clients within a with block, restoring the previous ones afterwards.
+        """
+        with self._lock:
+            saved = {name: self.instances[name] for name in instances if name in self.instances}
+            self.instances.update(instances)
+        try:
+            yield self
+        finally:
+            with self._lock:
+                for name in instances:
+                    self.instances.pop(name, None)
+                self.instances.update(saved)
+
+    def _build_cohere(self):
+        import cohere
+        return cohere.Client(self.secrets["api_key_cohere"])
+
+    def _build_chat_model(self):
+        from langchain_community.chat_models import ChatCohere
+        return ChatCohere(cohere_api_key=self.secrets["api_key_cohere"],
+                          model="command-nightly",
+                          temperature=0,
+                          echo=True)
+
+    def _build_chat_model_light(self):
+        from langchain_community.chat_models import ChatCohere
+        return ChatCohere(cohere_api_key=self.secrets["api_key_cohere"],
+                          model="command-nightly-light",
+                          temperature=0,
+                          echo=True)
+
+    def _build_embeddings(self):
+        from langchain_community.embeddings import CohereEmbeddings
+        return CohereEmbeddings(cohere_api_key=self.secrets["api_key_cohere"],
+                                model="embed-english-v3.0")
+
+    def _build_weaviate(self):
+        import weaviate
+        return weaviate.Client(
+            url=self.secrets["url_weaviate"],
+            auth_client_secret=weaviate.AuthApiKey(api_key=self.secrets["api_key_weaviate"]),
+            timeout_config=(5, 15),
+            additional_headers={
+                "X-Cohere-Api-Key": self.secrets["api_key_cohere"],
+            }
+        )
+
+    def _build_query_embedding_cache(self):
+        # Query embedding cache (in memory, plus an optional SQLite store)
+        embeddings = self.embeddings
+        store_path = self.secrets.get("embedding_cache_path")
+        return EmbeddingCache(embeddings.embed_query,
+                              model=embeddings.model,
+                              store=SQLiteEmbeddingStore(store_path) if store_path else None,
+                              batch_embed_fn=lambda texts: embeddings.embed(texts, input_type="search_query"))
+
+    def _build_retrieval_backend(self):
+        # "weaviate" (remote cluster) or "local" (in-process index built from the filings)
+        if self.secrets.get("retrieval_backend", "weaviate") == "local":
+            return LocalVectorIndex(self.secrets.get("local_index_dir", DEFAULT_INDEX_DIR), self.query_embedding_cache)
+        # "shared" (one class filtered on companyName) or "tenants" (one tenant per company)
+        tenants = self.secrets.get("weaviate_layout", "shared") == "tenants"
+        # Class holding every page once, when chunks were imported with a page reference only
+        page_class = self.secrets.get("weaviate_page_class")
+        if self.secrets.get("weaviate_near_vector", True):
+            # Query vectors computed once through the cache, searched with near vector
+            return WeaviateBackend(self.weaviate, self.query_embedding_cache, tenants=tenants, page_class=page_class)
+        return WeaviateBackend(self.weaviate, tenants=tenants, page_class=page_class)
+
+    def _build_answer_cache(self):
+        # Answer cache in front of rag_with_webSearch ("memory" or "sqlite" backend)
+        if self.secrets.get("answer_cache_backend", "memory") == "sqlite":
+            backend = SQLiteCacheBackend()
+        else:
+            backend = MemoryCacheBackend()
+        # The embedding cache is resolved on first use, so exact-match hits need no embedding client
+        return AnswerCache(backend, embed_fn=lambda text: self.query_embedding_cache.embed_query(text))
+
+    cohere = property(lambda self: self.get("cohere"))
+    chat_model = property(lambda self: self.get("chat_model"))
+    chat_model_light = property(lambda self: self.get("chat_model_light"))
+    embeddings = property(lambda self: self.get("embeddings"))
+    weaviate = property(lambda self: self.get("weaviate"))
+    query_embedding_cache = property(lambda self: self.get("query_embedding_cache"))
+    retrieval_backend = property(lambda self: self.get("retrieval_backend"))
+    answer_cache = property(lambda self: self.get("answer_cache"))
+
+
+@st.cache_resource(show_spinner=False)
+def get_clients() -> ClientRegistry:
+    """
+    The registry of the current process, shared across Streamlit reruns and sessions.
+    """
+    return ClientRegistry()
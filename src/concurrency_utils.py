@@ -0,0 +1,103 @@
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional
+
+
+def map_bounded(
+                func: Callable[..., Any],
+                items: Iterable[Any],
+                max_workers: int = 8,
+                timeout: Optional[float] = None,
+                default: Any = None
+            ) -> List[Any]:
+    """
+    Apply a function to every item using a bounded thread pool, keeping input order.
+
+    Each call gets its own timeout, measured from the moment a worker picks it up
+    (not from submission), so queued items are not penalised by a small pool.
+    Calls that raise or exceed the timeout are logged and replaced by `default`.
+
+    Args:
+        func (Callable): Function called as func(item) for every item.
+        items (Iterable): Items to process.
+        max_workers (int, optional): Maximum number of concurrent calls. Defaults to 8.
+        timeout (float, optional): Per-call timeout in seconds. Defaults to None (no timeout).
+        default (Any, optional): Value used for failed or timed-out calls. Defaults to None.
+
+    Returns:
+        list: Results in the same order as `items`.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    # Start time of every call, filled in by the worker thread itself
+    started_at = [None] * len(items)
+    lock = threading.Lock()
+
+    def run(index: int, item: Any) -> Any:
+        with lock:
+            started_at[index] = time.monotonic()
+        return func(item)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))))
+    try:
+        futures = [executor.submit(run, index, item) for index, item in enumerate(items)]
+        results = []
+        for index, future in enumerate(futures):
+            results.append(_wait_for_result(future, index, started_at, lock, timeout, default))
+    finally:
+        # Do not block on calls that were abandoned after a timeout
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+
+def _wait_for_result(future, index, started_at, lock, timeout, default):
+    """
+    Wait for a single future, enforcing a timeout relative to when its call started.
+    """
+    while True:
+        with lock:
+            start = started_at[index]
+        remaining = None if timeout is None else timeout if start is None else start + timeout - time.monotonic()
+        try:
+            return future.result(timeout=None if remaining is None else max(remaining, 0))
+        except FutureTimeoutError:
+            with lock:
+                start = started_at[index]
+            # Not started yet: the pool is still busy with earlier items, keep waiting
+            if start is not None and time.monotonic() >= start + timeout:
+                print(f"Call {index} timed out after {timeout} seconds")
+                future.cancel()
+                return default
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            return default
+
+
+def run_in_background(func: Callable[..., Any], *args: Any) -> Future:
+    """
+    Start func(*args) on a worker thread and return its Future.
+
+    Inside a Streamlit script run, the worker gets the script's context, so cached
+    functions (st.cache_data) behave as on the script thread. Callers that discard
+    the result do not wait for the call to finish.
+    """
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+        ctx = get_script_run_ctx()
+    except ImportError:
+        ctx = None
+
+    def run() -> Any:
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return func(*args)
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        return executor.submit(run)
+    finally:
+        executor.shutdown(wait=False)
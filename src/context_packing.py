@@ -0,0 +1,156 @@
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+
+# Documents cut below this many tokens are dropped rather than truncated
+MIN_DOCUMENT_TOKENS = 50
+
+# create_stuff_documents_chain joins documents with a blank line
+SEPARATOR_TOKENS = 1
+
+# Whitespace after '.', '!' or '?' and before an upper-case letter or digit, as in segmentation.py
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])["\')\]]*\s+(?=["\'(\[]?[A-Z0-9])')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text, at about 4 characters per token for English text.
+    """
+    return (len(text) + 3) // 4
+
+
+def relevance(document: Document) -> Optional[float]:
+    """
+    Relevance of a document, higher is better: its rerank relevance score, its hybrid
+    retrieval score or its negated retrieval distance. None if it has none of them.
+    """
+    metadata = document.metadata
+    for name in ("relevance_score", "score"):
+        if metadata.get(name) is not None:
+            return float(metadata[name])
+    if metadata.get("distance") is not None:
+        return -float(metadata["distance"])
+    return None
+
+
+def rank_documents(documents: List[Document]) -> List[Document]:
+    """
+    Sort documents by relevance, most relevant first. Documents keep their order
+    when any of them has no relevance.
+    """
+    scores = [relevance(document) for document in documents]
+    if any(score is None for score in scores):
+        return list(documents)
+    order = sorted(range(len(documents)), key=lambda index: -scores[index])
+    return [documents[index] for index in order]
+
+
+def allocate_budget(demands: Dict[str, int], budget: int) -> Dict[str, int]:
+    """
+    Split a token budget between companies as evenly as their demands allow.
+
+    Companies needing less than an even share get what they need; the rest is
+    split evenly between the others (max-min fairness).
+
+    Args:
+        demands (dict): Company name -> tokens of all its documents.
+        budget (int): Tokens to split.
+
+    Returns:
+        dict: Company name -> allocated tokens.
+    """
+    allocations = {}
+    remaining = budget
+    pending = sorted(demands, key=lambda name: demands[name])
+    while pending:
+        share = remaining // len(pending)
+        name = pending.pop(0)
+        allocations[name] = min(demands[name], share)
+        remaining -= allocations[name]
+    return allocations
+
+
+def truncate_to_tokens(text: str, max_tokens: int, count_tokens: Callable[[str], int] = estimate_tokens) -> str:
+    """
+    Cut a text at a word boundary so it counts at most max_tokens tokens.
+    """
+    while text and count_tokens(text) > max_tokens:
+        cut = int(len(text) * max_tokens / count_tokens(text))
+        cut = min(cut, len(text) - 1)
+        space = text.rfind(" ", 0, cut)
+        text = text[:space if space > 0 else cut].rstrip()
+    return text
+
+
+def hit_snippet(page: str, chunk: str, offset: int, sentences: int) -> str:
+    """
+    The sentences of a page around a retrieval hit.
+
+    Args:
+        page (str): The page text.
+        chunk (str): The matched chunk, found at `offset` in the page.
+        offset (int): Character offset of the chunk in the page.
+        sentences (int): Number of sentences kept before and after the chunk.
+
+    Returns:
+        str: The chunk with up to `sentences` sentences on each side.
+    """
+    # Sentence starts up to the chunk's, and sentence ends from the chunk's
+    starts = [0] + [match.end() for match in SENTENCE_BREAK.finditer(page, 0, offset + 1)]
+    ends = [match.start() for match in SENTENCE_BREAK.finditer(page, offset + len(chunk))] + [len(page)]
+    return page[starts[max(len(starts) - 1 - sentences, 0)]:ends[min(sentences, len(ends) - 1)]].strip()
+
+
+def pack_documents(documents: List[Document],
+                   budget: int,
+                   count_tokens: Callable[[str], int] = estimate_tokens,
+                   min_document_tokens: int = MIN_DOCUMENT_TOKENS) -> Tuple[List[Document], int]:
+    """
+    Select the documents of the generation context within a token budget.
+
+    Documents are ranked by relevance (see rank_documents). The budget is split
+    between the companies of the documents (their 'company_name' metadata, see
+    allocate_budget), so every company of a comparison keeps its share. Each
+    company's documents then fill its share in rank order: the first document
+    that does not fit is truncated, or dropped if less than min_document_tokens
+    would be left, and the following ones are dropped.
+
+    Args:
+        documents (list of Document): The relevant documents.
+        budget (int): Maximum number of context tokens.
+        count_tokens (Callable, optional): Counts the tokens of a text. Defaults to estimate_tokens.
+        min_document_tokens (int, optional): Smallest truncated document kept. Defaults to MIN_DOCUMENT_TOKENS.
+
+    Returns:
+        tuple: The packed documents, the companies' best first in turns, and their number of tokens.
+    """
+    by_company = {}
+    for document in rank_documents(documents):
+        tokens = count_tokens(document.page_content) + SEPARATOR_TOKENS
+        by_company.setdefault(document.metadata.get("company_name"), []).append((document, tokens))
+    allocations = allocate_budget({name: sum(tokens for _, tokens in ranked) for name, ranked in by_company.items()}, budget)
+
+    packed = {}
+    used = 0
+    for name, ranked in by_company.items():
+        remaining = allocations[name]
+        packed[name] = []
+        for document, tokens in ranked:
+            if tokens > remaining:
+                if remaining - SEPARATOR_TOKENS >= min_document_tokens:
+                    content = truncate_to_tokens(document.page_content, remaining - SEPARATOR_TOKENS, count_tokens)
+                    document = Document(page_content=content, metadata={**document.metadata, "truncated": True})
+                    packed[name].append(document)
+                    used += count_tokens(content) + SEPARATOR_TOKENS
+                break
+            packed[name].append(document)
+            used += tokens
+            remaining -= tokens
+
+    # Interleave the companies so none is relegated to the end of the context
+    interleaved = []
+    for turn in range(max((len(company_documents) for company_documents in packed.values()), default=0)):
+        interleaved += [company_documents[turn] for company_documents in packed.values() if turn < len(company_documents)]
+    return interleaved, used
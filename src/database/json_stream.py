@@ -0,0 +1,148 @@
+# #####################################################################################
+# Incremental reader for processed SEC filing JSONs.
+# Streams the sections of a filing one at a time instead of loading the whole file,
+# so memory is bounded by the largest section rather than the size of the filing.
+#
+# #####################################################################################
+
+import codecs
+import json
+from typing import Any, Dict, Iterator, Tuple
+
+WHITESPACE = ' \t\n\r'
+
+
+class JSONStreamReader:
+	"""
+	Pull-style reader over a JSON text file.
+
+	Structural characters ('[', '{', ':', ',') are consumed one at a time and complete
+	values are decoded with json.JSONDecoder.raw_decode once enough text is buffered.
+	"""
+	def __init__(self, fp, read_size: int = 1 << 16):
+		self.fp = fp
+		self.read_size = read_size
+		self.buffer = ''
+		self.pos = 0
+		self.eof = False
+		self.bytes_read = 0
+		self.decoder = json.JSONDecoder()
+		self.utf8 = codecs.getincrementaldecoder('utf-8')()
+
+	def _fill(self, size: int) -> bool:
+		if self.eof:
+			return False
+		data = self.fp.read(size)
+		if isinstance(data, bytes):
+			self.bytes_read += len(data)
+			# The incremental decoder holds back a multi-byte character split across reads
+			data = self.utf8.decode(data, final=not data)
+		else:
+			self.bytes_read += len(data.encode('utf-8'))
+		if not data:
+			self.eof = True
+			return False
+		# Drop what has already been consumed
+		self.buffer = self.buffer[self.pos:] + data
+		self.pos = 0
+		return True
+
+	def peek(self) -> str:
+		"""
+		Return the next non-whitespace character without consuming it ('' at end of file).
+		"""
+		while True:
+			while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+				self.pos += 1
+			if self.pos < len(self.buffer):
+				return self.buffer[self.pos]
+			if not self._fill(self.read_size):
+				return ''
+
+	def expect(self, char: str) -> None:
+		found = self.peek()
+		if found != char:
+			raise ValueError(f"Expected '{char}' near byte {self.bytes_read}, found '{found}'")
+		self.pos += 1
+
+	def value(self) -> Any:
+		"""
+		Decode the next complete JSON value.
+		"""
+		self.peek()
+		while True:
+			try:
+				value, end = self.decoder.raw_decode(self.buffer, self.pos)
+				# A number at the end of the buffer may continue in the next read
+				if end < len(self.buffer) or self.eof:
+					self.pos = end
+					return value
+			except json.JSONDecodeError:
+				if self.eof:
+					raise
+			# Grow geometrically so a large value is re-scanned only a few times
+			if not self._fill(max(self.read_size, len(self.buffer) - self.pos)) and not self.buffer[self.pos:]:
+				raise ValueError('Unexpected end of JSON input')
+
+	def items(self) -> Iterator[None]:
+		"""
+		Iterate over the elements of the array at the current position.
+		Each element must be consumed (e.g. with value()) before the next iteration.
+		"""
+		self.expect('[')
+		if self.peek() == ']':
+			self.pos += 1
+			return
+		while True:
+			yield
+			if self.peek() == ',':
+				self.pos += 1
+				continue
+			self.expect(']')
+			return
+
+	def keys(self) -> Iterator[str]:
+		"""
+		Iterate over the keys of the object at the current position.
+		The value of each key must be consumed before the next iteration.
+		"""
+		self.expect('{')
+		if self.peek() == '}':
+			self.pos += 1
+			return
+		while True:
+			key = self.value()
+			self.expect(':')
+			yield key
+			if self.peek() == ',':
+				self.pos += 1
+				continue
+			self.expect('}')
+			return
+
+
+def iter_filing_sections(fp, read_size: int = 1 << 16) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+	"""
+	Stream the sections of the filings in a processed filing JSON.
+
+	Accepts a list of filings (the format written by the extract and chunk scripts)
+	or a single filing object. Filing-level fields must come before "sections",
+	as they do in every file written by this repo.
+
+	Args:
+		fp: A file object opened on the JSON file (text or binary).
+		read_size (int, optional): Number of characters read at a time. Defaults to 64KiB.
+
+	Yields:
+		tuple: (filing, section), where filing holds the filing-level fields without "sections".
+	"""
+	reader = JSONStreamReader(fp, read_size)
+	filings = reader.items() if reader.peek() == '[' else iter([None])
+	for _ in filings:
+		filing = {}
+		for key in reader.keys():
+			if key != 'sections':
+				filing[key] = reader.value()
+				continue
+			for _ in reader.items():
+				yield filing, reader.value()
@@ -7,28 +7,70 @@
 # import libraries
 from datetime import datetime
 import cohere
+import hashlib
 import json
 import os
 import pathlib
 import requests
+import resource
 import sys
-from typing import List, Dict, Any
+import time
+from typing import Iterator, List, Dict, Any
 import weaviate
-from weaviate.exceptions import SchemaValidationException
+from weaviate.exceptions import SchemaValidationException, UnexpectedStatusCodeException
+from weaviate.schema import Tenant
+from weaviate.util import generate_uuid5
 
 # Update path, then import local tools
 utils = os.path.join(pathlib.Path(__file__).parent.parent.resolve(),"utils")
 sys.path.insert(1, utils)
+sys.path.insert(1, str(pathlib.Path(__file__).parent.resolve()))
+sys.path.insert(1, str(pathlib.Path(__file__).parent.parent.resolve()))
 
 from ssl_utils import *
+from json_stream import iter_filing_sections
+from answer_cache import FilingVersions
+from retrieval_backends import DEFAULT_INDEX_DIR, PAGE_PROPERTIES, build_local_index, page_id, tenant_name
+
+# Content hash of an object, used to diff re-imports; filterable by value but never vectorized
+CONTENT_HASH_PROPERTY = {
+	"name": "contentHash",
+	"dataType": ["text"],
+	"tokenization": "field",
+	"moduleConfig": {
+		"text2vec-cohere": {
+			"skip": True,
+			"vectorizePropertyName": False
+		}
+	}
+}
+
+# Page reference of a chunk object in the page store layout, never vectorized
+PAGE_ID_PROPERTY = {
+	"name": "pageId",
+	"dataType": ["text"],
+	"tokenization": "field",
+	"moduleConfig": {
+		"text2vec-cohere": {
+			"skip": True,
+			"vectorizePropertyName": False
+		}
+	}
+}
+
+# Weaviate's default QUERY_MAXIMUM_RESULTS: offset paging cannot read past it
+QUERY_MAXIMUM_RESULTS = 10000
 
 # global setup
 secrets = {}
 secrets_file = './hackathon_secrets'
-with open(secrets_file) as f:
-	secrets = json.load(f)
 
 def init():
+	# Secrets are read on first use so the data helpers can be imported without them
+	if not secrets:
+		with open(secrets_file) as f:
+			secrets.update(json.load(f))
+
 	api_key = secrets["COHERE_API_KEY"]
 	co = cohere.Client(api_key)
 
@@ -78,7 +120,8 @@ def cleanup(client, class_name, company_name):
 
 def create_WEAVIATE_class(client: 'weaviate.client.Client', 
 						  class_name: str, 
-						  input_dtype: str = "text") -> bool:
+						  input_dtype: str = "text",
+						  multi_tenant: bool = False) -> bool:
 	"""
 	Create a class in Weaviate schema.
 
@@ -86,6 +129,7 @@ def create_WEAVIATE_class(client: 'weaviate.client.Client',
 		client: The Weaviate client instance.
 		class_name: The name of the class to create.
 		input_dtype: The data type for the input properties.
+		multi_tenant: Enable multi-tenancy, one tenant per company (import with multi_tenant=True).
 
 	Returns:
 		bool: True if successful, False otherwise.
@@ -99,8 +143,10 @@ def create_WEAVIATE_class(client: 'weaviate.client.Client',
 	class_obj = {
 		"class": class_name,
 		"vectorizer": "text2vec-cohere",  
+		"multiTenancyConfig": {"enabled": multi_tenant},
 		"moduleConfig": {
 			"text2vec-cohere": {
+				"model": "embed-english-v3.0",  # Must match the app's query embeddings (near vector search)
 				"vectorizeClassName": False,
 				"input_type": "search_document"
 			},
@@ -126,7 +172,7 @@ def create_WEAVIATE_class(client: 'weaviate.client.Client',
 				input_dtype  # Set the input data type
 			],
 			"name": "name"
-		}],
+		}, CONTENT_HASH_PROPERTY],
 		"generative-cohere": {}
 	}
 
@@ -138,146 +184,519 @@ def create_WEAVIATE_class(client: 'weaviate.client.Client',
 		return False
 
 
-def process_and_expand_json_data(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+def create_page_class(client: 'weaviate.client.Client', page_class: str) -> None:
 	"""
-	Process and expand JSON data into a list of dictionaries.
+	Create the page class of the page store layout: pages and section summaries, stored
+	once per filing and fetched by id, so they are neither vectorized nor searchable.
+	"""
+	unindexed = {"dataType": ["text"], "indexFilterable": False, "indexSearchable": False}
+	client.schema.create_class({
+		"class": page_class,
+		"vectorizer": "none",
+		"properties": [
+			{"name": "companyName", "dataType": ["text"]},
+			{"name": "filingUrl", "dataType": ["text"]},
+			dict(unindexed, name="sectionPage"),
+			dict(unindexed, name="sectionSummary"),
+		]
+	})
+
+
+def map_chunks_to_pages(chunks: List[str], 
+						pages: List[str], 
+						chunk_pages: List[int] = None) -> List[Any]:
+	"""
+	Find the index of the page each chunk belongs to.
+
+	Uses the explicit chunk -> page indexes written by chunk.py when available.
+	Older files without them fall back to a forward pass: chunks are in page
+	order, so the search resumes where the previous chunk was found. A chunk not
+	found ahead (e.g. after a short repeated sentence matched too far) is searched
+	in all pages, and the pass resumes from there.
 
 	Args:
-		data (dict): The JSON data to process and expand.
+		chunks (list): The section's sentence chunks, in order.
+		pages (list): The section's page texts, in order.
+		chunk_pages (list, optional): Page index of every chunk, as stored by chunk.py.
 
 	Returns:
-		list: A list of dictionaries representing the expanded data.
+		list: The page index of every chunk, or None for chunks not found in any page.
+	"""
+	if chunk_pages is not None and len(chunk_pages) == len(chunks):
+		return [page_index if 0 <= page_index < len(pages) else None for page_index in chunk_pages]
+
+	page_indexes = []
+	page_index, position = 0, 0
+	for chunk in chunks:
+		found = None
+		# Search forward from the end of the previous chunk, then through the following pages
+		for candidate in range(page_index, len(pages)):
+			offset = pages[candidate].find(chunk, position if candidate == page_index else 0)
+			if offset != -1:
+				found = candidate
+				page_index, position = candidate, offset + len(chunk)
+				break
+		if found is None:
+			# Then from the first page, as the full search did
+			for candidate, page in enumerate(pages):
+				offset = page.find(chunk)
+				if offset != -1:
+					found = candidate
+					page_index, position = candidate, offset + len(chunk)
+					break
+		page_indexes.append(found)
+
+	return page_indexes
+
+
+def expand_section(data: Dict[str, Any], section: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+	"""
+	Expand one section of a filing into records, one per chunk, page summary and key point.
+
+	Args:
+		data (dict): The filing-level details (companyName, filingUrl, Quarter, Filing).
+		section (dict): The section to expand.
+
+	Yields:
+		dict: The expanded records of the section.
 	"""
-	expanded_data = []
-	
 	# Extracting top-level details
 	companyName = data.get('companyName')
 	filingUrl = data.get('filingUrl')
 	quarter = data.get('Quarter')  # Using lowercase key as 'Quarter' is inconsistent
 	filing = data.get('Filing')
-	sections = data.get('sections', [])  # Handling case where 'sections' key might be missing
+
+	# Extracting section-level details
+	sectionType = section.get('SectionType')
+	sectionHeading = section.get('SectionHeading')
+	sectionSummary = section.get('sectionSummary')
+	pages = section.get('pages', [])
+	chunks = section.get('chunks', [])
+	pageSummaries = section.get('pageSummaries', [])
+	keyPoints = section.get('keyPoints', [])
 	
-	for section in sections:
-		# Extracting section-level details
-		sectionraw = section.get('raw')
-		sectionType = section.get('SectionType')
-		sectionHeading = section.get('SectionHeading')
-		sectionSummary = section.get('sectionSummary')
-		pages = section.get('pages', [])
-		chunks = section.get('chunks', [])
-		pageSummaries = section.get('pageSummaries', [])
-		keyPoints = section.get('keyPoints', [])
-		
-		# Constructing source URL
-		source = f'{filingUrl} || Section: {sectionHeading}' if filingUrl and sectionHeading else None
-		
-		# Adding Chunk details to expanded_data
-		for chunk in chunks:
-			matching_page = next((page for page in pages if chunk in page), None)
-			if matching_page:
-				expanded_data.append({
-					'companyName': companyName,
-					'filingUrl': filingUrl,
-					'quarter': quarter,
-					'filing': filing,
-					'sectionPage': matching_page,
-					'sectionType': sectionType,
-					'sectionHeading': sectionHeading,
-					'sectionSummary': sectionSummary,
-					'chunk': chunk,
-					'source': source
-				})
-		
-		# Adding LLM-Summarized Pages as CHUNKS
-		for page, pageSummary in zip(pages, pageSummaries):
-			expanded_data.append({
-				'companyName': companyName,
-				'filingUrl': filingUrl,
-				'quarter': quarter,
-				'filing': filing,
-				'sectionPage': page,
-				'sectionType': sectionType,
-				'sectionHeading': sectionHeading,
-				'sectionSummary': sectionSummary,
-				'chunk': pageSummary,
-				'source': source
-			})
+	# Constructing source URL
+	source = f'{filingUrl} || Section: {sectionHeading}' if filingUrl and sectionHeading else None
+
+	def record(page, chunk, kind):
+		return {
+			'companyName': companyName,
+			'filingUrl': filingUrl,
+			'quarter': quarter,
+			'filing': filing,
+			'sectionPage': page,
+			'sectionType': sectionType,
+			'sectionHeading': sectionHeading,
+			'sectionSummary': sectionSummary,
+			'chunk': chunk,
+			'chunkKind': kind,
+			'source': source
+		}
+	
+	# Adding Chunk details
+	chunk_pages = map_chunks_to_pages(chunks, pages, section.get('chunkPages'))
+	for chunk, page_index in zip(chunks, chunk_pages):
+		matching_page = pages[page_index] if page_index is not None else None
+		if matching_page:
+			yield record(matching_page, chunk, 'chunk')
+	
+	# Adding LLM-Summarized Pages as CHUNKS
+	for page, pageSummary in zip(pages, pageSummaries):
+		yield record(page, pageSummary, 'pageSummary')
+
+	# Adding LLM-Generated Pages KeyPoints as CHUNKS
+	for page, keyPoint in zip(pages, keyPoints):
+		for point in keyPoint:
+			yield record(page, point, 'keyPoint')
 
-		# Adding LLM-Generated Pages KeyPoints as CHUNKS
-		for page, keyPoint in zip(pages, keyPoints):
-			for point in keyPoint:
-				expanded_data.append({
-					'companyName': companyName,
-					'filingUrl': filingUrl,
-					'quarter': quarter,
-					'filing': filing,
-					'sectionPage': page,
-					'sectionType': sectionType,
-					'sectionHeading': sectionHeading,
-					'sectionSummary': sectionSummary,
-					'chunk': point,
-					'source': source
-				})
+
+def process_and_expand_json_data(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+	"""
+	Process and expand JSON data into a list of dictionaries.
+
+	Args:
+		data (dict): The JSON data to process and expand.
+
+	Returns:
+		list: A list of dictionaries representing the expanded data.
+	"""
+	expanded_data = []
+	for section in data.get('sections', []):  # Handling case where 'sections' key might be missing
+		expanded_data.extend(expand_section(data, section))
 
 	return expanded_data
 
+
+def iter_expanded_records(file_path: str) -> Iterator[Dict[str, Any]]:
+	"""
+	Stream the expanded records of a filing JSON, reading one section at a time.
+
+	Args:
+		file_path (str): Path of the processed filing JSON.
+
+	Yields:
+		dict: The expanded records, in the same order as process_and_expand_json_data.
+	"""
+	with open(file_path, 'rb') as fp:
+		for filing, section in iter_filing_sections(fp):
+			yield from expand_section(filing, section)
+
+
+def to_weaviate_properties(d: Dict[str, Any], page_store: bool = False) -> Dict[str, Any]:
+	"""
+	Build the Weaviate data object of an expanded record, with the hash of its content.
+	In the page store layout, the page and section summary are replaced by the pageId.
+	"""
+	properties = {
+		"companyName": d['companyName'],
+		"filingUrl": d['filingUrl'],
+		"source": d['source'],
+		"quarter": d['quarter'],
+		"filing": d['filing'],
+		"sectionHeading": str(d["sectionHeading"]),
+		"sectionSummary": str(d["sectionSummary"]),
+		"sectionPage": str(d["sectionPage"]),
+		"chunk": str(d["chunk"])
+	}
+	if page_store:
+		properties["pageId"] = page_id(properties["filingUrl"], properties.pop("sectionPage"), properties.pop("sectionSummary"))
+	properties["contentHash"] = hashlib.sha256(json.dumps(properties, sort_keys=True).encode('utf-8')).hexdigest()
+	return properties
+
+
+def to_page_properties(d: Dict[str, Any]) -> Dict[str, Any]:
+	"""
+	Build the page class data object of an expanded record's page.
+	"""
+	return {
+		"companyName": d['companyName'],
+		"filingUrl": d['filingUrl'],
+		"sectionPage": str(d["sectionPage"]),
+		"sectionSummary": str(d["sectionSummary"])
+	}
+
+
+def object_uuid(d: Dict[str, Any]) -> str:
+	"""
+	Deterministic object UUID of an expanded record, from (filingUrl, sectionType, chunk kind, chunk hash).
+	Re-importing a filing addresses the same objects instead of creating duplicates.
+	"""
+	chunk_hash = hashlib.sha256(str(d['chunk']).encode('utf-8')).hexdigest()
+	return generate_uuid5("|".join([str(d['filingUrl']), str(d['sectionType']), str(d.get('chunkKind', 'chunk')), chunk_hash]))
+
+
+def ensure_content_hash_property(client: 'weaviate.client.Client', class_name: str, extra_properties: List[Dict[str, Any]] = ()) -> None:
+	"""
+	Add the contentHash property (and extra_properties) to a class created before them, without vectorizing them.
+	"""
+	properties = client.schema.get(class_name).get("properties") or []
+	for prop in [CONTENT_HASH_PROPERTY, *extra_properties]:
+		if not any(existing["name"] == prop["name"] for existing in properties):
+			client.schema.property.create(class_name, prop)
+
+
+def ensure_tenant(client: 'weaviate.client.Client',
+				  class_name: str,
+				  company_name: str,
+				  known_tenants: set) -> str:
+	"""
+	Create the tenant of a company in a multi-tenant class unless it exists.
+
+	Args:
+		known_tenants: Tenants already known to exist, updated in place.
+
+	Returns:
+		str: The tenant name.
+	"""
+	tenant = tenant_name(company_name)
+	if tenant not in known_tenants:
+		known_tenants.update(t.name for t in client.schema.get_class_tenants(class_name))
+	if tenant not in known_tenants:
+		try:
+			client.schema.add_class_tenants(class_name, [Tenant(name=tenant)])
+		except UnexpectedStatusCodeException:
+			# Another import worker may have created it in the meantime
+			if tenant not in {t.name for t in client.schema.get_class_tenants(class_name)}:
+				raise
+		known_tenants.add(tenant)
+	return tenant
+
+
+def fetch_stored_hashes(client: 'weaviate.client.Client',
+						class_name: str,
+						filing_url: str,
+						page_size: int = 1000,
+						tenant: str = None,
+						hash_property: str = "contentHash",
+						max_results: int = QUERY_MAXIMUM_RESULTS) -> Dict[str, str]:
+	"""
+	Fetch the id and content hash of every object stored for a filing.
+	Objects imported before upserts have no hash and are always replaced.
+
+	Args:
+		hash_property: Property holding the content hash, None to fetch ids only
+			(for content-addressed objects such as pages, whose id is their hash).
+		max_results: The server's QUERY_MAXIMUM_RESULTS. A filing with more objects
+			raises, as an incomplete map would re-insert objects and keep orphans.
+
+	Returns:
+		dict: Object UUID -> content hash (None with ids only).
+	"""
+	stored = {}
+	offset = 0
+	while True:
+		# The after cursor cannot be combined with the filingUrl filter, so paging is by offset
+		limit = min(page_size, max_results - offset)
+		if limit <= 0:
+			raise RuntimeError(f"{filing_url} has more than {max_results} objects in {class_name}: raise QUERY_MAXIMUM_RESULTS "
+							   f"on the server (and max_results) to page through all of them")
+		query = client.query \
+			.get(class_name, [hash_property] if hash_property else None) \
+			.with_additional(["id"]) \
+			.with_where({
+				"path": ["filingUrl"],
+				"operator": "Equal",
+				"valueText": filing_url}) \
+			.with_limit(limit) \
+			.with_offset(offset)
+		if tenant:
+			query = query.with_tenant(tenant)
+		response = query.do()
+		# GraphQL errors come back in the response; an empty result would delete and re-send everything
+		if response.get('errors'):
+			raise RuntimeError(f"Fetching the stored objects of {filing_url} from {class_name} failed: {response['errors']}")
+		objects = (response.get('data', {}).get('Get', {}) or {}).get(class_name) or []
+		for obj in objects:
+			stored[obj["_additional"]["id"]] = obj.get(hash_property) if hash_property else None
+		if len(objects) < limit:
+			return stored
+		offset += limit
+
+
+def delete_orphans(client: 'weaviate.client.Client',
+				   class_name: str,
+				   stored: Dict[str, str],
+				   seen: set,
+				   chunk_size: int = 500,
+				   tenant: str = None) -> int:
+	"""
+	Delete the stored objects of a filing that are no longer produced by its import.
+	"""
+	orphans = [object_id for object_id in stored if object_id not in seen]
+	for i in range(0, len(orphans), chunk_size):
+		client.batch.delete_objects(
+			class_name=class_name,
+			where={
+				"path": ["id"],
+				"operator": "ContainsAny",
+				"valueText": orphans[i:i+chunk_size]
+			},
+			tenant=tenant
+		)
+	return len(orphans)
+
+
+def peak_rss_mb() -> float:
+	# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def print_import_metrics(metrics: Dict[str, Any]) -> None:
+	elapsed = max(metrics["seconds"], 1e-9)
+	print(f"Imported {metrics['objects']} objects from {metrics['files']} files in {elapsed:.1f}s: "
+		  f"{metrics['objects'] / elapsed:.1f} objects/sec, {metrics['bytes'] / elapsed / 1e6:.2f} MB/sec, "
+		  f"{metrics['failed']} failed objects, peak RSS {peak_rss_mb():.0f} MB")
+	if "inserted" in metrics:
+		print(f"Inserted {metrics['inserted']}, updated {metrics['updated']}, "
+			  f"unchanged {metrics['unchanged']}, deleted {metrics['deleted']} objects")
+	if metrics.get("pages"):
+		print(f"Stored {metrics['pages']} pages")
+
+
 def import_data_to_WEAVIATE(client: 'weaviate.client.Client', 
 							data_folder: str, 
 							filenames: List[str],
 							class_name: str,
 							batch_size: int=50,
-							min_chunk_charactre: int=20) -> None:
+							min_chunk_charactre: int=20,
+							num_workers: int=1,
+							record_versions: bool=True,
+							multi_tenant: bool=False,
+							page_class: str=None) -> Dict[str, Any]:
 	"""
 	Import data from JSON files in a list to Weaviate.
+	Each company whose objects changed is recorded in the filing versions
+	registry, which invalidates the app's cached answers for that company.
+
+	Imports are incremental upserts: objects have deterministic UUIDs (see
+	object_uuid) and are diffed against the objects already stored for the
+	filing. New objects are inserted, objects whose content hash changed are
+	replaced, unchanged ones are skipped and orphaned ones are deleted, so a
+	new or re-processed filing only touches its own objects.
+
+	Files are streamed section by section and records are sent through a
+	dynamically sized batch as they are produced, so memory stays bounded
+	by the largest section whatever the size of the filings.
+
+	With multi_tenant, the class must have been created multi-tenant (see
+	create_WEAVIATE_class) and every company's objects go to its own tenant
+	(see tenant_name), created on first import, so that the app can search a
+	company without filtering the whole corpus (weaviate_layout = "tenants").
+
+	With a page_class, every distinct page of a filing and its section summary
+	are stored once in that class, under a content-addressed id (see page_id),
+	and chunk objects only hold the pageId instead of a copy of the page. Pages
+	no longer referenced by a re-imported filing are deleted with its orphans.
+	The app reads this layout with weaviate_page_class set to the page class.
 
 	Args:
 		client: The Weaviate client instance.
 		data_folder: The path to the folder containing JSON files.
 		class_name: The name of the class in Weaviate.
+		batch_size: Initial batch size; Weaviate adapts it to the observed latency.
+		min_chunk_charactre: Chunks shorter than this are skipped.
+		num_workers: Number of concurrent batch requests.
+		record_versions: Record changed companies in the filing versions registry.
+			Drivers running several imports in parallel record them from the returned companies instead.
+		multi_tenant: Import every company into its own tenant.
+		page_class: Store pages once in this class (created if missing) instead of on every object.
 
 	Returns:
-		None
+		dict: Throughput metrics (files, objects, bytes, failed, seconds), the upsert counts
+			(inserted, updated, unchanged, deleted), the pages written and the changed companies.
 	"""
-	for file in filenames:
-		file_path = os.path.join(data_folder, file)
-	 	# Loading JSONs
-		with open(file_path, 'rb') as fp:
-			data = json.load(fp)[0]
-		company_name = data["companyName"]
-		print_time()
-		print(f"Company Name: {company_name}")
-		# Constructing the Expanded JSONs to be Pushed to Weaviate
-		expanded_data = process_and_expand_json_data(data)
-
-		# Splitting expanded data into batches
-		batches = [expanded_data[i:i+batch_size] for i in range(0, len(expanded_data), batch_size)]
-
-		with client.batch as batch:  # Initialize a batch process
-			for i, d in enumerate(expanded_data, start=1):  # Batch import data
-				if i % 500 == 0:
-					print(f"Importing record: {i}")
+	filing_versions = FilingVersions() if record_versions else None
+	metrics = {"files": 0, "objects": 0, "bytes": 0, "failed": 0, "seconds": 0.0,
+			   "inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0, "pages": 0, "companies": []}
+
+	def count_failures(results):
+		# Replaces the default callback, which only prints the errors
+		for result in results or []:
+			errors = result.get("result", {}).get("errors")
+			if errors:
+				metrics["failed"] += 1
+				print(errors)
+
+	start = time.perf_counter()
+	known_tenants = set()
+	if page_class:
+		if not client.schema.exists(page_class):
+			create_page_class(client, page_class)
+		ensure_content_hash_property(client, class_name, [PAGE_ID_PROPERTY])
+	else:
+		ensure_content_hash_property(client, class_name)
+	client.batch.configure(batch_size=batch_size, dynamic=True, num_workers=num_workers, callback=count_failures)
+	with client.batch as batch:  # Initialize a batch process
+		for file in filenames:
+			file_path = os.path.join(data_folder, file)
+			print_time()
+			print(f"File: {file}")
+			company_name = None
+			changes = metrics["inserted"] + metrics["updated"] + metrics["deleted"]
+			filing_url, stored, seen, tenant = None, {}, set(), None
+			stored_pages, seen_pages = {}, set()
+			for d in iter_expanded_records(file_path):
+				company_name = d['companyName']
 				# Filtering Out Junk Chunks (too short!)
-				if len(d["chunk"]) >= min_chunk_charactre:
-					properties = {
-						"companyName": d['companyName'],
-						"filingUrl": d['filingUrl'],
-						"source": d['source'],
-						"quarter": d['quarter'],
-						"filing": d['filing'],
-						"sectionHeading": str(d["sectionHeading"]),
-						"sectionSummary": str(d["sectionSummary"]),
-						"sectionPage": str(d["sectionPage"]),
-						"chunk": str(d["chunk"])
-					}
-					batch.add_data_object(
-						data_object=properties,
-						class_name=class_name
-					)
+				if len(d["chunk"]) < min_chunk_charactre:
+					continue
+
+				if d['filingUrl'] != filing_url:
+					metrics["deleted"] += delete_orphans(client, class_name, stored, seen, tenant=tenant)
+					if page_class:
+						delete_orphans(client, page_class, stored_pages, seen_pages)
+					filing_url, seen, seen_pages = d['filingUrl'], set(), set()
+					tenant = ensure_tenant(client, class_name, company_name, known_tenants) if multi_tenant else None
+					stored = fetch_stored_hashes(client, class_name, filing_url, tenant=tenant) if filing_url else {}
+					# Pages are content-addressed: their ids are all there is to compare
+					stored_pages = fetch_stored_hashes(client, page_class, filing_url, hash_property=None) if page_class and filing_url else {}
+
+				object_id = object_uuid(d)
+				# The same sentence twice in a section is one object
+				if object_id in seen:
+					continue
+				seen.add(object_id)
+				metrics["objects"] += 1
+				if metrics["objects"] % 500 == 0:
+					print(f"Importing record: {metrics['objects']}")
+
+				properties = to_weaviate_properties(d, page_store=bool(page_class))
+				# Each page is written once per filing, and not at all if already stored
+				if page_class and properties["pageId"] not in seen_pages:
+					seen_pages.add(properties["pageId"])
+					if properties["pageId"] not in stored_pages:
+						metrics["pages"] += 1
+						batch.add_data_object(data_object=to_page_properties(d), class_name=page_class, uuid=properties["pageId"])
+				if stored.get(object_id) == properties["contentHash"]:
+					metrics["unchanged"] += 1
+					continue
+				metrics["updated" if object_id in stored else "inserted"] += 1
+				batch.add_data_object(
+					data_object=properties,
+					class_name=class_name,
+					uuid=object_id,
+					tenant=tenant
+				)
+			metrics["deleted"] += delete_orphans(client, class_name, stored, seen, tenant=tenant)
+			if page_class:
+				delete_orphans(client, page_class, stored_pages, seen_pages)
+
+			metrics["files"] += 1
+			metrics["bytes"] += os.path.getsize(file_path)
+			# Send the pending objects before invalidating the company's cached answers
+			batch.flush()
+			if company_name and metrics["inserted"] + metrics["updated"] + metrics["deleted"] > changes:
+				print(f"Company Name: {company_name}")
+				metrics["companies"].append(company_name)
+				if record_versions:
+					filing_versions.record(company_name)
+
+	metrics["seconds"] = time.perf_counter() - start
+	print_import_metrics(metrics)
+	return metrics
+
+
+def export_to_local_index(co: cohere.Client,
+						  data_folder: str,
+						  filenames: List[str],
+						  index_dir: str = DEFAULT_INDEX_DIR,
+						  min_chunk_charactre: int = 20) -> int:
+	"""
+	Build the local vector index (the in-process alternative to Weaviate) from JSON files in a list.
+
+	Args:
+		co: The Cohere client instance, used to embed the chunks.
+		data_folder: The path to the folder containing JSON files.
+		filenames: The JSON files to index.
+		index_dir: The output directory of the index.
+		min_chunk_charactre: Chunks shorter than this are skipped.
+
+	Returns:
+		int: Number of rows in the index.
+	"""
+	def embed_documents(texts):
+		return co.embed(texts=texts, model="embed-english-v3.0", input_type="search_document").embeddings
+
+	def expanded_records():
+		for file in filenames:
+			print_time()
+			print(f"File: {file}")
+			yield from iter_expanded_records(os.path.join(data_folder, file))
+
+	return build_local_index(expanded_records(), embed_documents, index_dir, min_chunk_charactre=min_chunk_charactre)
 
 # ########################################################################
-# Takes a path rather than walking a directory for simple parallelization.
+# Takes a path to a file list. To import a whole directory in parallel use:
+# > python3 ./src/ingest.py import output/fortune100_10K_2023
 # Usage: 
 # > python3 ./push/weaviate.py path_to_filelist
+# Build the local vector index instead of pushing to Weaviate:
+# > python3 ./push/weaviate.py --local-index path_to_filelist
+# Import into a multi-tenant class, one tenant per company:
+# > python3 ./push/weaviate.py --multi-tenant path_to_filelist
+# Store every page once in the SECSavvyNOWPages class:
+# > python3 ./push/weaviate.py --page-store path_to_filelist
 # ########################################################################
 if __name__ == "__main__":
 	for arg in sys.argv:
@@ -290,12 +709,18 @@ if __name__ == "__main__":
 		clients = init()	
 		class_name="SECSavvyNOW"
 
-		import_data_to_WEAVIATE(client=clients["weaviate"], data_folder=in_path, filenames=filenames, class_name=class_name)
+		if "--local-index" in sys.argv:
+			export_to_local_index(co=clients["cohere"], data_folder=in_path, filenames=filenames)
+		else:
+			import_data_to_WEAVIATE(client=clients["weaviate"], data_folder=in_path, filenames=filenames, class_name=class_name,
+									multi_tenant="--multi-tenant" in sys.argv,
+									page_class=f"{class_name}Pages" if "--page-store" in sys.argv else None)
 
 		# Sample usage of other calls
 		# filing_type="10-Q"
 		# company_name = "Apple Inc."
 		# create_WEAVIATE_class(clients["weaviate"], class_name)
+		# create_WEAVIATE_class(clients["weaviate"], class_name, multi_tenant=True)
     	# some_objects = clients["weaviate"].data_object.get()
 		# print(json.dumps(some_objects, indent=4))
 		# cleanup(clients["weaviate"], class_name, company_name)
@@ -0,0 +1,128 @@
+from collections import OrderedDict
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+class SQLiteEmbeddingStore:
+    """
+    Persistent store of query embeddings, keyed on (model, query text).
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        return None if row is None else np.frombuffer(row[0], dtype=np.float32).tolist()
+
+    def set(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                               (key, np.asarray(vector, dtype=np.float32).tobytes()))
+            self._conn.commit()
+
+
+class EmbeddingCache:
+    """
+    Query embedding cache: an in-memory LRU in front of an optional persistent store.
+
+    Wraps an embedding function (e.g. cohere_embeddings.embed_query) so that repeated
+    queries, such as the canned questions and generated comparison sub-queries, are
+    embedded once. Hit and miss counters are exposed through stats().
+    """
+    def __init__(self,
+                 embed_fn: Callable[[str], List[float]],
+                 model: str = "",
+                 max_entries: int = 2048,
+                 store: Optional[SQLiteEmbeddingStore] = None,
+                 batch_embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None):
+        self.embed_fn = embed_fn
+        self.batch_embed_fn = batch_embed_fn
+        self.model = model
+        self.max_entries = max_entries
+        self.store = store
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\n{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        if self.store is not None:
+            vector = self.store.get(key)
+            if vector is not None:
+                with self._lock:
+                    self.store_hits += 1
+                self._remember(key, vector)
+                return vector
+
+        return None
+
+    def _add(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self.misses += 1
+        self._remember(key, vector)
+        if self.store is not None:
+            self.store.set(key, vector)
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Return the embedding of a query, computing it only on a miss.
+        """
+        key = self._key(text)
+        vector = self._lookup(key)
+        if vector is None:
+            vector = list(self.embed_fn(text))
+            self._add(key, vector)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Return the embeddings of several queries, computing all misses in one batch call when possible.
+        """
+        keys = [self._key(text) for text in texts]
+        vectors = [self._lookup(key) for key in keys]
+        missing = list(OrderedDict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            if self.batch_embed_fn is not None:
+                computed = dict(zip(missing, self.batch_embed_fn(missing)))
+            else:
+                computed = {text: self.embed_fn(text) for text in missing}
+            for text, vector in computed.items():
+                self._add(self._key(text), list(vector))
+            vectors = [list(computed[text]) if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the hit/miss counters and the number of embeddings held in memory.
+        """
+        with self._lock:
+            return {"hits": self.hits, "store_hits": self.store_hits, "misses": self.misses, "size": len(self._entries)}
@@ -0,0 +1,255 @@
+# #####################################################################
+# Parallel driver for the ingestion scripts.
+# Discovers filing JSONs under a directory and runs one stage on each file
+# in a process pool:
+#   chunk:  text_processing/chunk.py (pages, chunks, summaries, key points)
+#   import: database/weaviate_utils.py (push to Weaviate)
+# Per-file status is tracked in a JSON lines manifest; failed files are
+# retried and files whose content hash is unchanged since their last
+# successful run are skipped.
+#
+# Usage:
+# > python3 ./src/ingest.py chunk data/fortune100_10K_2023 --out output/fortune100_10K_2023
+# > python3 ./src/ingest.py import output/fortune100_10K_2023 --workers 4
+# > python3 ./src/ingest.py import output/fortune100_10K_2023 --multi-tenant
+# > python3 ./src/ingest.py import output/fortune100_10K_2023 --page-class SECSavvyNOWPages
+# #####################################################################
+
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+import hashlib
+import json
+import os
+import pathlib
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+src = pathlib.Path(__file__).parent.resolve()
+sys.path.insert(1, os.path.join(src, "database"))
+sys.path.insert(1, os.path.join(src, "text_processing"))
+
+DEFAULT_PATTERN = "*_10-*.json"
+MANIFEST_NAME = "ingest_manifest.jsonl"
+
+
+def file_hash(path: str) -> str:
+    """
+    SHA-256 of a file's content, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def discover_filings(data_dir: str, pattern: str = DEFAULT_PATTERN) -> List[str]:
+    """
+    Find the filing JSONs (named ticker_filedAt_formType.json) under a directory, recursively.
+    """
+    return sorted(str(path) for path in pathlib.Path(data_dir).rglob(pattern) if path.is_file())
+
+
+class IngestManifest:
+    """
+    Append-only JSON lines log of per-file runs; the last record of a (stage, path) wins.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.records = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A partially written last line from an interrupted run
+                        continue
+                    self.records[(record["stage"], record["path"])] = record
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a")
+
+    def is_current(self, stage: str, path: str, content_hash: str) -> bool:
+        record = self.records.get((stage, path))
+        return record is not None and record["status"] == "done" and record["hash"] == content_hash
+
+    def record(self, stage: str, path: str, **fields) -> None:
+        record = {"stage": stage, "path": path, "time": time.time(), **fields}
+        self.records[(stage, path)] = record
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _attempt(worker: Callable[[str], Dict[str, Any]], path: str, delay: float) -> Dict[str, Any]:
+    # Runs in the pool: waits out the retry backoff, then processes one file
+    if delay:
+        time.sleep(delay)
+    start = time.perf_counter()
+    result = dict(worker(path) or {})
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_ingest(stage: str,
+               files: List[str],
+               worker: Callable[[str], Dict[str, Any]],
+               manifest_path: str,
+               max_workers: int = 4,
+               retries: int = 2,
+               backoff: float = 5.0,
+               on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Run a stage over many files in a process pool.
+
+    Args:
+        stage: Stage name, the manifest key together with the file path.
+        files: Paths of the files to process.
+        worker: Picklable function processing one path; may return a dict with "sections", "objects" and "failed" counts.
+        manifest_path: JSON lines manifest of per-file status.
+        max_workers: Number of worker processes.
+        retries: Retries per file after the first failed attempt.
+        backoff: Delay before the first retry in seconds, doubled after every failed attempt.
+        on_result: Called in the driver process with (path, result) after every successful file.
+
+    Returns:
+        dict: Counts of done, partial (some objects failed), skipped and failed files, sections, objects, bytes and seconds.
+    """
+    manifest = IngestManifest(manifest_path)
+    summary = {"done": 0, "partial": 0, "skipped": 0, "failed": 0, "sections": 0, "objects": 0, "bytes": 0, "seconds": 0.0}
+    start = time.perf_counter()
+
+    pending = []
+    hashes = {}
+    for path in files:
+        hashes[path] = file_hash(path)
+        if manifest.is_current(stage, path, hashes[path]):
+            summary["skipped"] += 1
+        else:
+            pending.append(path)
+    print(f"{stage}: {len(pending)} files to process, {summary['skipped']} unchanged")
+
+    def progress(path, status, detail):
+        finished = summary["done"] + summary["partial"] + summary["failed"]
+        elapsed = time.perf_counter() - start
+        print(f"[{finished}/{len(pending)}] {status:<7} {os.path.basename(path)} {detail} "
+              f"| {summary['objects'] / max(elapsed, 1e-9):.1f} objects/sec, "
+              f"{summary['bytes'] / max(elapsed, 1e-9) / 1e6:.2f} MB/sec")
+
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            attempts = {path: 1 for path in pending}
+            futures = {executor.submit(_attempt, worker, path, 0.0): path for path in pending}
+            while futures:
+                completed, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    path = futures.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if attempts[path] <= retries:
+                            delay = backoff * 2 ** (attempts[path] - 1)
+                            print(f"Attempt {attempts[path]} failed for {path} ({e}), retrying in {delay:.1f}s")
+                            attempts[path] += 1
+                            futures[executor.submit(_attempt, worker, path, delay)] = path
+                            continue
+                        summary["failed"] += 1
+                        manifest.record(stage, path, status="failed", hash=hashes[path], attempts=attempts[path], error=str(e))
+                        progress(path, "failed", str(e))
+                        continue
+
+                    # Files with failed objects are not skipped on the next run
+                    status = "partial" if result.get("failed") else "done"
+                    summary[status] += 1
+                    summary["sections"] += result.get("sections", 0)
+                    summary["objects"] += result.get("objects", 0)
+                    summary["bytes"] += os.path.getsize(path)
+                    manifest.record(stage, path, status=status, hash=hashes[path], attempts=attempts[path],
+                                    sections=result.get("sections", 0), objects=result.get("objects", 0), failed=result.get("failed", 0),
+                                    seconds=round(result["seconds"], 3))
+                    if on_result is not None:
+                        on_result(path, result)
+                    counts = "".join(f"{result[name]} {name}, " for name in ("sections", "objects") if name in result)
+                    progress(path, status, f"({counts}{result['seconds']:.1f}s)")
+    finally:
+        manifest.close()
+
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def print_summary(stage: str, summary: Dict[str, Any]) -> None:
+    elapsed = max(summary["seconds"], 1e-9)
+    print(f"{stage} finished in {elapsed:.1f}s: {summary['done']} done, {summary['partial']} partial, "
+          f"{summary['skipped']} skipped, {summary['failed']} failed; {summary['sections']} sections, {summary['objects']} objects "
+          f"({summary['objects'] / elapsed:.1f}/sec), {summary['bytes'] / 1e6:.1f} MB ({summary['bytes'] / elapsed / 1e6:.2f} MB/sec)")
+
+
+# Worker processes build their clients once, on first use
+_clients = None
+
+
+def chunk_worker(path: str, out_dir: str) -> Dict[str, Any]:
+    import chunk
+    return chunk.chunk_filing_file(os.path.dirname(path), out_dir, os.path.basename(path))
+
+
+def import_worker(path: str, class_name: str, multi_tenant: bool = False, page_class: Optional[str] = None) -> Dict[str, Any]:
+    global _clients
+    import weaviate_utils
+    with weaviate_utils.no_ssl_verification():
+        if _clients is None:
+            _clients = weaviate_utils.init()
+        return weaviate_utils.import_data_to_WEAVIATE(client=_clients["weaviate"],
+                                                      data_folder=os.path.dirname(path),
+                                                      filenames=[os.path.basename(path)],
+                                                      class_name=class_name,
+                                                      record_versions=False,
+                                                      multi_tenant=multi_tenant,
+                                                      page_class=page_class)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run an ingestion stage over a directory of filings in parallel.")
+    parser.add_argument("stage", choices=["chunk", "import"])
+    parser.add_argument("data_dir", help="Directory searched recursively for filing JSONs")
+    parser.add_argument("--out", help="Output directory of the chunk stage (default: data_dir with data -> output)")
+    parser.add_argument("--class-name", default="SECSavvyNOW", help="Weaviate class of the import stage")
+    parser.add_argument("--multi-tenant", action="store_true", help="Import every company into its own tenant of the class")
+    parser.add_argument("--page-class", help="Store every page once in this class instead of on every object")
+    parser.add_argument("--pattern", default=DEFAULT_PATTERN, help="File name pattern of the filings")
+    parser.add_argument("--workers", type=int, default=4, help="Number of worker processes")
+    parser.add_argument("--retries", type=int, default=2, help="Retries per file")
+    parser.add_argument("--manifest", help=f"Manifest path (default: {MANIFEST_NAME} in data_dir)")
+    args = parser.parse_args(argv)
+
+    files = discover_filings(args.data_dir, args.pattern)
+    manifest_path = args.manifest or os.path.join(args.data_dir, MANIFEST_NAME)
+    on_result = None
+    if args.stage == "chunk":
+        worker = partial(chunk_worker, out_dir=args.out or args.data_dir.replace("data", "output"))
+        stage = "chunk"
+    else:
+        from answer_cache import FilingVersions
+        filing_versions = FilingVersions()
+        worker = partial(import_worker, class_name=args.class_name, multi_tenant=args.multi_tenant, page_class=args.page_class)
+        # A separate manifest stage, so switching layouts re-imports every file
+        stage = f"import:{args.class_name}" + (":tenants" if args.multi_tenant else "") + (f":{args.page_class}" if args.page_class else "")
+
+        def on_result(path, result):
+            # The registry is written from this process only, after each file is fully imported
+            for company_name in result.get("companies", []):
+                filing_versions.record(company_name)
+
+    summary = run_ingest(stage, files, worker, manifest_path, args.workers, args.retries, on_result=on_result)
+    print_summary(stage, summary)
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,197 @@
-from langchain.retrievers import ContextualCompressionRetriever, CohereRagRetriever
-from langchain.retrievers.document_compressors import CohereRerank
-from langchain_community.embeddings import CohereEmbeddings
-from langchain_community.chat_models import ChatCohere
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.docstore.document import Document
+from langchain_core.documents import Document
 from langchain_core.messages import AIMessage, HumanMessage
-from langchain.prompts import PromptTemplate
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 
-import cohere
-import weaviate
 import streamlit as st
 
 import requests
 import json
 import re
-from typing import List, Tuple, Optional, Dict
+import threading
+import numpy as np
+from typing import TYPE_CHECKING, List, Tuple, Optional, Dict, Iterator
 
+if TYPE_CHECKING:
+    from langchain_community.chat_models import ChatCohere
 
-# Cohere Instantiation
-api_key_cohere = st.secrets["api_key_cohere"]
-client_cohere = cohere.Client(api_key_cohere)
+from clients import get_clients
+from concurrency_utils import map_bounded, run_in_background
+from context_packing import estimate_tokens, hit_snippet, pack_documents
 
-# Create Cohere's chat model and embeddings objects
-cohere_chat_model = ChatCohere(cohere_api_key=api_key_cohere, 
-                               model="command-nightly", 
-                               temperature=0, 
-                               echo=True)
-cohere_chat_model_light = ChatCohere(cohere_api_key=api_key_cohere, 
-                                     model="command-nightly-light", 
-                                     temperature=0, 
-                                     echo=True)
-cohere_embeddings = CohereEmbeddings(cohere_api_key=api_key_cohere, 
-                                     model="embed-english-v3.0")
 
+# API clients, models and caches are created on first use and shared across reruns (see clients.py)
+clients = get_clients()
 
-# Weaviate Instantiation
-api_key_weaviate = st.secrets["api_key_weaviate"] 
-auth_config = weaviate.AuthApiKey(api_key=api_key_weaviate)
+# Module-level names of the clients, kept for callers that read them from this module
+LAZY_CLIENTS = {
+    "client_cohere": "cohere",
+    "cohere_chat_model": "chat_model",
+    "cohere_chat_model_light": "chat_model_light",
+    "cohere_embeddings": "embeddings",
+    "client_weaviate": "weaviate",
+    "query_embedding_cache": "query_embedding_cache",
+    "retrieval_backend": "retrieval_backend",
+    "answer_cache": "answer_cache",
+}
 
-client_weaviate = weaviate.Client(
-  url=st.secrets["url_weaviate"], 
-  auth_client_secret=auth_config,  
-  timeout_config=(5, 15), 
-  additional_headers={  
-    "X-Cohere-Api-Key": api_key_cohere,   
-  }
-)
+
+def __getattr__(name):
+    if name in LAZY_CLIENTS:
+        return clients.get(LAZY_CLIENTS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def create_stuff_documents_chain(**kwargs):
+    # langchain.chains takes over a second to import, so it is loaded by the first answer rather than at startup
+    from langchain.chains.combine_documents import create_stuff_documents_chain as create_chain
+    return create_chain(**kwargs)
+
+# Relevance filtering mode: "llm" (one light-model call per document) or "rerank" (one batched rerank call)
+# None reads the "relevance_filter_mode" secret on first use
+RELEVANCE_FILTER_MODE = None
+
+# Sentences of the page kept on each side of the retrieval hit in the relevance filter prompts,
+# None (or negative) for the whole page; the "snippet_sentences" secret overrides it
+SNIPPET_SENTENCES = 3
+# Snippets shorter than this many words are replaced by the whole page
+SNIPPET_MIN_WORDS = 60
+
+# Relevance filtering concurrency settings
+RELEVANCE_MAX_WORKERS = 8
+RELEVANCE_CALL_TIMEOUT = 30.0
+
+# Seconds retrieval results are reused across reruns and sessions; 0 queries the backend every time
+RETRIEVAL_CACHE_TTL = 300
+
+# Retrieval mode: "vector" or "hybrid" (BM25 + vector, fused by the backend)
+# None reads the "retrieval_mode" secret on first use
+RETRIEVAL_MODE = None
+
+# Hybrid retrieval settings: weight of the vector ranking (0 is BM25 only) and fusion ("ranked" or "relative_score")
+HYBRID_ALPHA = 0.5
+HYBRID_FUSION = "ranked"
+
+# Retrieve distinct pages (the best hit of each, grouped by the backend) rather than chunks
+# None reads the "retrieval_group_by_page" secret on first use
+GROUP_BY_PAGE = None
+
+# Follow-up questions: retrieve the raw query while it is rewritten, and reuse the results when the
+# rewrite embeds within SPECULATIVE_SIMILARITY (cosine) of it; the "speculative_retrieval" and
+# "speculative_similarity" secrets override them
+SPECULATIVE_RETRIEVAL = True
+SPECULATIVE_SIMILARITY = 0.9
+
+# Rerank filtering settings
+RERANK_MODEL = "rerank-english-v2.0"
+RERANK_TOP_K = 8
+RERANK_SCORE_THRESHOLD = 0.2
+RERANK_EXTRACTIVE_SUMMARY = False
+
+# Maximum prompt tokens of the final generation (template and documents) for cohere_chat_model_light,
+# leaving room for the answer in its 4k context; the "prompt_token_budget" secret overrides it
+PROMPT_TOKEN_BUDGET = 3000
+
+
+def parse_retrieved_documents(items: List[Dict], unique_contents: Optional[set] = None) -> List[Document]:
+    """
+    Convert retrieval backend result items into Documents, skipping repeated sectionPage contents.
+    The retrieval distance (vector search) or score (hybrid search) of an item is kept in the metadata,
+    with the matched chunk and its character offset in the page when the chunk is a passage of the page.
+
+    Args:
+        items (list of dict): Result items returned by the retrieval backend for one query.
+        unique_contents (set, optional): sectionPage contents already seen. Pass the same set
+            across calls to de-duplicate over several queries. Defaults to a new empty set.
+
+    Returns:
+        list of Document: List of unique documents.
+    """
+    # Set to store unique sectionPage contents
+    if unique_contents is None:
+        unique_contents = set()
+
+    documents = []
+    for item in items:
+        page_content = item.get("sectionPage", "")
+        # Check if the content is already encountered, skip if so
+        if page_content in unique_contents:
+            continue
+        filing_url = item.get("filingUrl", "")
+        metadata = {"source": filing_url}
+        if item.get("companyName"):
+            metadata["company_name"] = item["companyName"]
+        metadata.update({name: value for name, value in (item.get("_additional") or {}).items() if name in ("distance", "score")})
+        # Page summaries and key points are not passages of the page
+        chunk = item.get("chunk")
+        offset = page_content.find(chunk) if chunk else -1
+        if offset != -1:
+            metadata.update(chunk=chunk, chunk_offset=offset)
+        documents.append(Document(page_content=page_content, metadata=metadata))
+        # Add the content to the set of unique contents
+        unique_contents.add(page_content)
+
+    return documents
+
+
+def hybrid_settings(search_mode: Optional[str] = None,
+                    alpha: Optional[float] = None,
+                    fusion: Optional[str] = None) -> Tuple[Optional[float], str]:
+    """
+    Resolve the retrieval mode into the (alpha, fusion) arguments of the retrieval backend.
+
+    Args:
+        search_mode (str, optional): "vector" or "hybrid". Defaults to RETRIEVAL_MODE, then the
+            "retrieval_mode" secret, then "vector".
+        alpha (float, optional): Weight of the vector ranking in hybrid mode. Defaults to the
+            "hybrid_alpha" secret, then HYBRID_ALPHA.
+        fusion (str, optional): "ranked" or "relative_score". Defaults to the "hybrid_fusion"
+            secret, then HYBRID_FUSION.
+
+    Returns:
+        tuple: (alpha, fusion), alpha None for vector search.
+    """
+    search_mode = search_mode or RETRIEVAL_MODE or clients.secrets.get("retrieval_mode", "vector")
+    fusion = fusion or clients.secrets.get("hybrid_fusion", HYBRID_FUSION)
+    if search_mode == "vector":
+        return None, fusion
+    if search_mode == "hybrid":
+        return (alpha if alpha is not None else float(clients.secrets.get("hybrid_alpha", HYBRID_ALPHA))), fusion
+    raise ValueError(f"Unknown retrieval mode '{search_mode}', expected 'vector' or 'hybrid'")
+
+
+def group_by_page_setting(group_by_page: Optional[bool] = None) -> bool:
+    """
+    Resolve whether retrieval returns distinct pages: the argument, then GROUP_BY_PAGE,
+    then the "retrieval_group_by_page" secret, then False.
+    """
+    if group_by_page is None:
+        group_by_page = GROUP_BY_PAGE
+    if group_by_page is None:
+        group_by_page = clients.secrets.get("retrieval_group_by_page", False)
+    return bool(group_by_page)
+
+
+@st.cache_data(ttl=RETRIEVAL_CACHE_TTL, max_entries=1024, show_spinner=False)
+def cached_search(query: str, company_names: Tuple[str, ...], top_n: int, max_distance: float, class_name: str,
+                  alpha: Optional[float] = None, fusion: str = HYBRID_FUSION, group_by_page: bool = False) -> List[Dict]:
+    """
+    Retrieval backend search, memoised with st.cache_data for RETRIEVAL_CACHE_TTL seconds.
+    """
+    return clients.retrieval_backend.search(query, list(company_names), top_n, max_distance, class_name, alpha, fusion,
+                                            group_by_page)
+
+
+@st.cache_data(ttl=RETRIEVAL_CACHE_TTL, max_entries=1024, show_spinner=False)
+def cached_search_many(queries: Tuple[Tuple[str, Tuple[str, ...]], ...], top_n: int, max_distance: float, class_name: str,
+                       alpha: Optional[float] = None, fusion: str = HYBRID_FUSION,
+                       group_by_page: bool = False) -> List[List[Dict]]:
+    """
+    Retrieval backend search_many, memoised with st.cache_data for RETRIEVAL_CACHE_TTL seconds.
+    """
+    return clients.retrieval_backend.search_many([(query, list(names)) for query, names in queries], top_n, max_distance,
+                                                 class_name, alpha, fusion, group_by_page)
 
 
 def retrieve_top_documents(
@@ -56,44 +199,89 @@ def retrieve_top_documents(
                             company_names: List[str],
                             class_name: str = 'SECSavvyNOW',
                             top_n: int = 15,
-                            max_distance: float = 999.0
+                            max_distance: float = 999.0,
+                            search_mode: Optional[str] = None,
+                            alpha: Optional[float] = None,
+                            fusion: Optional[str] = None,
+                            group_by_page: Optional[bool] = None
                         ) -> List[Document]:
     """
-    Retrieve top documents from Weaviate based on the provided query and company names.
+    Retrieve top documents from the retrieval backend based on the provided query and company names.
+
+    In hybrid mode, BM25 keyword matches (exact figures, tickers, defined terms) are fused
+    with the vector search results; see hybrid_settings. Grouped by page, top_n counts
+    distinct pages, each scored by its best hit, and only the page properties are fetched.
 
     Args:
         query (str): The query string used for retrieving relevant documents.
         company_names (list of str): List of company names to filter the documents.
         class_name (str, optional): Name of the class in Weaviate. Defaults to 'SECSavvyNOW'.
         top_n (int, optional): Number of top documents to retrieve. Defaults to 20.
-        max_distance (float, optional): Maximum distance for near text search. Defaults to 999.0.
+        max_distance (float, optional): Maximum distance for near text search, not applied in hybrid mode. Defaults to 999.0.
+        search_mode (str, optional): "vector" or "hybrid". Defaults to the configured retrieval mode.
+        alpha (float, optional): Weight of the vector ranking in hybrid mode, 0 for BM25 only. Defaults to HYBRID_ALPHA.
+        fusion (str, optional): "ranked" or "relative_score" fusion in hybrid mode. Defaults to HYBRID_FUSION.
+        group_by_page (bool, optional): Retrieve top_n distinct pages. Defaults to the configured setting (see group_by_page_setting).
 
     Returns:
-        list of Document: List of top documents retrieved from Weaviate.
-    """
-    response = (
-        client_weaviate.query
-        .get(class_name, ["companyName", "filingUrl", "sectionSummary", "sectionPage", "chunk"])
-        .with_near_text({"concepts": [query], "distance": max_distance})
-        .with_where({"path": ["companyName"], "operator": "ContainsAny", "valueText": company_names})
-        .with_limit(top_n)
-        .do()
-    )
+        list of Document: List of top documents retrieved from the retrieval backend.
+    """
+    alpha, fusion = hybrid_settings(search_mode, alpha, fusion)
+    group_by_page = group_by_page_setting(group_by_page)
+    if RETRIEVAL_CACHE_TTL:
+        items = cached_search(query, tuple(company_names), top_n, max_distance, class_name, alpha, fusion, group_by_page)
+    else:
+        items = clients.retrieval_backend.search(query, company_names, top_n, max_distance, class_name, alpha, fusion,
+                                                 group_by_page)
+
+    return parse_retrieved_documents(items)
+
+
+def retrieve_top_documents_per_company(
+                                        matched_pairs: List[Dict[str, str]],
+                                        class_name: str = 'SECSavvyNOW',
+                                        top_n: int = 10,
+                                        max_distance: float = 999.0,
+                                        search_mode: Optional[str] = None,
+                                        alpha: Optional[float] = None,
+                                        fusion: Optional[str] = None,
+                                        group_by_page: Optional[bool] = None
+                                    ) -> List[Document]:
+    """
+    Retrieve top documents for several (company, query) pairs in a single backend request.
 
-    # Set to store unique sectionPage contents
-    unique_contents = set()
+    With Weaviate, each pair becomes an aliased near text query in one GraphQL Get, so
+    comparing several companies costs one retrieval round trip. Results are merged in
+    pair order with sectionPage de-duplication.
+
+    Args:
+        matched_pairs (list of dict): Dictionaries with 'company_name' and 'query' keys,
+            as returned by match_company_to_generated_query.
+        class_name (str, optional): Name of the class in Weaviate. Defaults to 'SECSavvyNOW'.
+        top_n (int, optional): Number of top documents to retrieve per company. Defaults to 10.
+        max_distance (float, optional): Maximum distance for near text search, not applied in hybrid mode. Defaults to 999.0.
+        search_mode (str, optional): "vector" or "hybrid". Defaults to the configured retrieval mode.
+        alpha (float, optional): Weight of the vector ranking in hybrid mode. Defaults to HYBRID_ALPHA.
+        fusion (str, optional): "ranked" or "relative_score" fusion in hybrid mode. Defaults to HYBRID_FUSION.
+        group_by_page (bool, optional): Retrieve top_n distinct pages per company. Defaults to the configured setting.
+
+    Returns:
+        list of Document: Merged list of top documents for all companies.
+    """
+    alpha, fusion = hybrid_settings(search_mode, alpha, fusion)
+    group_by_page = group_by_page_setting(group_by_page)
+    queries = [(pair['query'], [pair['company_name']]) for pair in matched_pairs]
+    if RETRIEVAL_CACHE_TTL:
+        results = cached_search_many(tuple((query, tuple(names)) for query, names in queries), top_n, max_distance,
+                                     class_name, alpha, fusion, group_by_page)
+    else:
+        results = clients.retrieval_backend.search_many(queries, top_n, max_distance, class_name, alpha, fusion,
+                                                        group_by_page)
 
+    unique_contents = set()
     documents = []
-    if 'data' in response and 'Get' in response['data'] and class_name in response['data']['Get']:
-        for item in response['data']['Get'][class_name]:
-            page_content = item.get("sectionPage", "")
-            # Check if the content is already encountered, skip if so
-            if page_content in unique_contents:
-                continue
-            filing_url = item.get("filingUrl", "")
-            documents.append(Document(page_content=page_content, metadata={"source": filing_url}))
-            # Add the content to the set of unique contents
-            unique_contents.add(page_content)
+    for items in results:
+        documents += parse_retrieved_documents(items, unique_contents)
 
     return documents
 
@@ -110,7 +298,7 @@ def generate_comparison_new_queries(user_query: str) -> List[str]:
     """
     # Assuming 'client_cohere' is already initialized Cohere client
     try:
-        new_queries_results = client_cohere.chat(message=user_query,
+        new_queries_results = clients.cohere.chat(message=user_query,
                                                  search_queries_only=True
                                                 )
         new_queries = [x['text'] for x in new_queries_results.search_queries]
@@ -199,7 +387,7 @@ def match_company_to_generated_query(company_names: List[str], queries: List[str
 
 
 def generate_user_query(chat_history: str, 
-                        model: ChatCohere = cohere_chat_model_light
+                        model: Optional["ChatCohere"] = None
                     ) -> str:
     """
     Generates a new user query based on the provided chat history using the specified Cohere model.
@@ -207,7 +395,7 @@ def generate_user_query(chat_history: str,
     Args:
         chat_history (str): Chat history exchanged between the user and the AI assistant.
         model (ChatCohere, optional): The Cohere model instance to use for generating the user query. 
-            Defaults to cohere_chat_model_light.
+            Defaults to the light chat model.
 
     Returns:
         str: The generated user query.
@@ -223,6 +411,8 @@ def generate_user_query(chat_history: str,
 
     # Create a prompt template from the template string
     prompt = ChatPromptTemplate.from_template(template)
+    if model is None:
+        model = clients.chat_model_light
 
     # Define the processing chain
     rag_chain = (
@@ -284,9 +474,34 @@ def generate_rag_prompt_template(
     return PROMPT
 
 
+def document_snippet(document: Document, sentences: Optional[int] = None, min_words: int = SNIPPET_MIN_WORDS) -> str:
+    """
+    The part of a retrieved document sent to the relevance filter: the sentences around
+    its retrieval hit, or the whole page without a hit or when the snippet is too short.
+
+    Args:
+        document (Document): A retrieved document, with 'chunk' and 'chunk_offset' metadata for its hit.
+        sentences (int, optional): Sentences kept on each side of the hit. Defaults to the
+            "snippet_sentences" secret, then SNIPPET_SENTENCES.
+        min_words (int, optional): Shortest snippet used. Defaults to SNIPPET_MIN_WORDS.
+
+    Returns:
+        str: The snippet or the page.
+    """
+    if sentences is None:
+        sentences = clients.secrets.get("snippet_sentences", SNIPPET_SENTENCES)
+    metadata = document.metadata
+    if sentences is None or int(sentences) < 0 or metadata.get("chunk_offset") is None:
+        return document.page_content
+    snippet = hit_snippet(document.page_content, metadata["chunk"], metadata["chunk_offset"], int(sentences))
+    if len(snippet.split()) < min_words:
+        return document.page_content
+    return snippet
+
+
 def is_document_relevant(document: Document, 
                          user_query: str, 
-                         cohere_model: ChatCohere = cohere_chat_model_light
+                         cohere_model: Optional["ChatCohere"] = None
                         ) -> bool:
     """
     Check the relevancy of a document to the user query using the specified Cohere model.
@@ -300,8 +515,8 @@ def is_document_relevant(document: Document,
         bool: True if the document is relevant, False otherwise.
     """
     
-    # Get the document content
-    document_content = document.page_content
+    # Get the sentences around the retrieval hit
+    document_content = document_snippet(document)
 
     # Generate the prompt using the document content and user query
     prompt = f"""Reply with YES or NO only. 
@@ -309,6 +524,8 @@ def is_document_relevant(document: Document,
                  '{user_query}'? Document content: {document_content}. \n"""
     
     # Generate response using the Cohere model
+    if cohere_model is None:
+        cohere_model = clients.chat_model_light
     messages = [HumanMessage(content=prompt)]
     response = cohere_model(messages)
 
@@ -318,7 +535,7 @@ def is_document_relevant(document: Document,
 
 def is_document_relevant_extractive_summary(document: Document, 
                                             user_query: str, 
-                                            cohere_model: ChatCohere = cohere_chat_model_light
+                                            cohere_model: Optional["ChatCohere"] = None
                                            ) -> bool:
     """
     Check the relevancy of a document to the user query using the specified Cohere model.
@@ -333,8 +550,8 @@ def is_document_relevant_extractive_summary(document: Document,
         of the document. Otherwise, return None.
     """
     
-    # Get the document content
-    document_content = document.page_content
+    # Get the sentences around the retrieval hit
+    document_content = document_snippet(document)
 
     # Generate the prompt using the document content and user query
     prompt = f"""If Document_Content partially answer the User_Query create the extractive summary of the relevant part of the document. \n
@@ -344,6 +561,8 @@ def is_document_relevant_extractive_summary(document: Document,
                  Document_Content: {document_content}."""
 
     # Generate response using the Cohere model
+    if cohere_model is None:
+        cohere_model = clients.chat_model_light
     messages = [HumanMessage(content=prompt)]
     response = cohere_model(messages)
 
@@ -351,7 +570,130 @@ def is_document_relevant_extractive_summary(document: Document,
     if "irrelevant" in response.content.lower():
         return None
     else:
-        return Document(page_content=response.content, metadata={"source": document.metadata['source']})
+        return Document(page_content=response.content, metadata=dict(document.metadata))
+
+
+def filter_relevant_documents(documents: List[Document],
+                              user_query: str,
+                              cohere_model: Optional["ChatCohere"] = None,
+                              max_workers: int = RELEVANCE_MAX_WORKERS,
+                              timeout: float = RELEVANCE_CALL_TIMEOUT
+                             ) -> List[Document]:
+    """
+    Run the extractive-summary relevance check over the documents concurrently.
+
+    Args:
+        documents (list of Document): The retrieved documents, in retrieval order.
+        user_query (str): The user query.
+        cohere_model (ChatCohere): The Cohere model instance to use for relevancy checking.
+        max_workers (int, optional): Maximum number of concurrent model calls. Defaults to RELEVANCE_MAX_WORKERS.
+        timeout (float, optional): Per-call timeout in seconds; timed-out documents are treated as irrelevant.
+            Defaults to RELEVANCE_CALL_TIMEOUT.
+
+    Returns:
+        list of Document: Extractive summaries of the relevant documents, in retrieval order.
+    """
+    summaries = map_bounded(
+        lambda doc: is_document_relevant_extractive_summary(doc, user_query, cohere_model),
+        documents,
+        max_workers=max_workers,
+        timeout=timeout
+    )
+
+    return [summary for summary in summaries if summary]
+
+
+def rerank_relevant_documents(documents: List[Document],
+                              user_query: str,
+                              top_k: int = RERANK_TOP_K,
+                              score_threshold: float = RERANK_SCORE_THRESHOLD,
+                              extractive_summary: bool = RERANK_EXTRACTIVE_SUMMARY,
+                              cohere_model: Optional["ChatCohere"] = None
+                             ) -> List[Document]:
+    """
+    Score all documents against the user query with one Cohere Rerank call and keep the best ones.
+
+    Args:
+        documents (list of Document): The retrieved documents.
+        user_query (str): The user query.
+        top_k (int, optional): Maximum number of documents to keep. Defaults to RERANK_TOP_K.
+        score_threshold (float, optional): Minimum relevance score to keep a document. Defaults to RERANK_SCORE_THRESHOLD.
+        extractive_summary (bool, optional): Also run the extractive-summary step on the kept documents.
+            Defaults to RERANK_EXTRACTIVE_SUMMARY.
+        cohere_model (ChatCohere): The Cohere model instance used for the optional extractive summaries.
+
+    Returns:
+        list of Document: The kept documents, most relevant first, with their 'relevance_score' in the metadata.
+    """
+    if not documents:
+        return []
+
+    results = clients.cohere.rerank(model=RERANK_MODEL,
+                                   query=user_query,
+                                   documents=[doc.page_content for doc in documents],
+                                   top_n=top_k)
+
+    relevant_docs = []
+    for result in results:
+        if result.relevance_score < score_threshold:
+            continue
+        doc = documents[result.index]
+        relevant_docs.append(Document(page_content=doc.page_content,
+                                      metadata={**doc.metadata, "relevance_score": result.relevance_score}))
+
+    if extractive_summary:
+        return filter_relevant_documents(relevant_docs, user_query, cohere_model)
+
+    return relevant_docs
+
+
+def select_relevant_documents(documents: List[Document],
+                              user_query: str,
+                              mode: Optional[str] = None,
+                              cohere_model: Optional["ChatCohere"] = None
+                             ) -> List[Document]:
+    """
+    Keep the documents relevant to the user query, using the selected filtering mode.
+
+    Args:
+        documents (list of Document): The retrieved documents.
+        user_query (str): The user query.
+        mode (str, optional): "llm" for per-document extractive summaries with the light model,
+            "rerank" for a single Cohere Rerank call. Defaults to RELEVANCE_FILTER_MODE, then the
+            "relevance_filter_mode" secret.
+        cohere_model (ChatCohere): The Cohere model instance used for relevancy checking.
+
+    Returns:
+        list of Document: The relevant documents.
+    """
+    mode = mode or RELEVANCE_FILTER_MODE or clients.secrets.get("relevance_filter_mode", "llm")
+    if mode == "llm":
+        return filter_relevant_documents(documents, user_query, cohere_model)
+    if mode == "rerank":
+        return rerank_relevant_documents(documents, user_query, cohere_model=cohere_model)
+    raise ValueError(f"Unknown relevance filter mode: {mode}")
+
+
+def pack_context(documents: List[Document], rag_prompt: PromptTemplate, budget: Optional[int] = None) -> List[Document]:
+    """
+    Fit the relevant documents into the prompt token budget of the final generation, and log the prompt size.
+
+    Args:
+        documents (list of Document): The relevant documents.
+        rag_prompt (PromptTemplate): The RAG prompt, from generate_rag_prompt_template.
+        budget (int, optional): Maximum prompt tokens. Defaults to the "prompt_token_budget" secret,
+            then PROMPT_TOKEN_BUDGET.
+
+    Returns:
+        list of Document: The documents of the context, see context_packing.pack_documents.
+    """
+    if budget is None:
+        budget = int(clients.secrets.get("prompt_token_budget", PROMPT_TOKEN_BUDGET))
+    template_tokens = estimate_tokens(rag_prompt.format(context=""))
+    packed, context_tokens = pack_documents(documents, max(budget - template_tokens, 0))
+    print(f"Prompt: {template_tokens + context_tokens} tokens ({template_tokens} template, {context_tokens} context "
+          f"from {len(packed)} of {len(documents)} documents), budget {budget}")
+    return packed
 
 
 def rag(user_query: str, 
@@ -382,17 +724,16 @@ def rag(user_query: str,
     input_docs = retrieve_top_documents(user_query, company_names=company_names)
     
     # Filter relevant documents using the light model
-    relevant_docs = []
-    for doc in input_docs:
-        doc_relevancy_summary = is_document_relevant_extractive_summary(doc, user_query)
-        if doc_relevancy_summary:
-            relevant_docs.append(doc_relevancy_summary)
+    relevant_docs = select_relevant_documents(input_docs, user_query)
     
     # Generate the RAG prompt template
     rag_prompt = generate_rag_prompt_template(user_persona=user_persona, user_query=user_query, company_names=company_names)
     
+    # Fit the documents into the prompt token budget
+    relevant_docs = pack_context(relevant_docs, rag_prompt)
+
     # Generate the Response
-    chain = create_stuff_documents_chain(llm=cohere_chat_model_light, prompt=rag_prompt)
+    chain = create_stuff_documents_chain(llm=clients.chat_model_light, prompt=rag_prompt)
     answer = chain.invoke({"context": relevant_docs})
     sources = list(set([x.metadata['source'] for x in relevant_docs]))
     search_type = "Grounded Search"
@@ -481,10 +822,205 @@ def rag(user_query: str,
 #     return answer, sources, search_type
     
 
+def retrieve_input_documents(user_query: str,
+                             company_names: List[str],
+                             cancelled: Optional[threading.Event] = None) -> List[Document]:
+    """
+    Retrieve the candidate documents for the user query, per company in Compare mode.
+
+    Args:
+        user_query (str): The (refined) user query.
+        company_names (list of str): List of company names being analyzed.
+        cancelled (threading.Event, optional): Once set, the remaining steps are skipped and
+            nothing is returned. Defaults to None.
+
+    Returns:
+        list of Document: The retrieved documents.
+    """
+    if cancelled is not None and cancelled.is_set():
+        return []
+    if len(company_names) > 1:
+        # Creating company specific query
+        user_queries = generate_comparison_new_queries(user_query)
+        if cancelled is not None and cancelled.is_set():
+            return []
+        # Match the query and the company name
+        matched_pairs = match_company_to_generated_query(queries=user_queries, company_names=company_names)
+        # Retrieve all companies in one request
+        return retrieve_top_documents_per_company(matched_pairs, top_n=10)
+
+    return retrieve_top_documents(user_query, company_names=company_names)
+
+
+def query_similarity(query: str, other_query: str) -> float:
+    """
+    Cosine similarity of the embeddings of two queries, through the query embedding cache.
+    """
+    vectors = np.asarray(clients.query_embedding_cache.embed_queries([query, other_query]), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1)
+    if not norms.all():
+        return 0.0
+    return float(vectors[0] @ vectors[1] / (norms[0] * norms[1]))
+
+
+def rewrite_and_retrieve(user_query: str,
+                         chat_history: str,
+                         company_names: List[str],
+                         speculative: Optional[bool] = None,
+                         similarity_threshold: Optional[float] = None
+                        ) -> Tuple[str, List[Document]]:
+    """
+    Rewrite a follow-up question with the chat history and retrieve its documents.
+
+    Speculatively, the raw question is retrieved (with its comparison queries in Compare
+    mode) while the light model rewrites it. The speculative documents are kept when the
+    rewritten question embeds close enough to the raw one; otherwise the speculative
+    retrieval is cancelled (its remaining steps are skipped) and the rewritten question
+    is retrieved.
+
+    Args:
+        user_query (str): The user query, as typed.
+        chat_history (str): The chat history.
+        company_names (list of str): List of company names being analyzed.
+        speculative (bool, optional): Retrieve the raw query during the rewrite. Defaults to the
+            "speculative_retrieval" secret, then SPECULATIVE_RETRIEVAL.
+        similarity_threshold (float, optional): Smallest query similarity to keep the speculative
+            documents. Defaults to the "speculative_similarity" secret, then SPECULATIVE_SIMILARITY.
+
+    Returns:
+        tuple: The rewritten query and its documents.
+    """
+    if speculative is None:
+        speculative = clients.secrets.get("speculative_retrieval", SPECULATIVE_RETRIEVAL)
+    if similarity_threshold is None:
+        similarity_threshold = float(clients.secrets.get("speculative_similarity", SPECULATIVE_SIMILARITY))
+    # Append the user query to the chat history
+    combined_history = f"{chat_history}\n{user_query}"
+    if not speculative:
+        rewritten_query = generate_user_query(combined_history)
+        return rewritten_query, retrieve_input_documents(rewritten_query, company_names)
+
+    cancelled = threading.Event()
+    speculative_docs = run_in_background(retrieve_input_documents, user_query, company_names, cancelled)
+    rewritten_query = generate_user_query(combined_history)
+    try:
+        similarity = query_similarity(user_query, rewritten_query)
+        if similarity >= similarity_threshold:
+            print(f"Speculative retrieval kept (query similarity {similarity:.2f})")
+            return rewritten_query, speculative_docs.result()
+        print(f"Speculative retrieval discarded (query similarity {similarity:.2f})")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+    # A comparison retrieval still generating its queries stops before its search
+    cancelled.set()
+    speculative_docs.cancel()
+    return rewritten_query, retrieve_input_documents(rewritten_query, company_names)
+
+
+def web_search_answer(user_query: str, user_persona: str, company_names: List[str]) -> Tuple[str, str, str]:
+    """
+    Answer the user query with Cohere's web search connector, used when no filings are relevant.
+
+    Args:
+        user_query (str): The (refined) user query.
+        user_persona (str): The persona of the user.
+        company_names (list of str): List of company names being analyzed.
+
+    Returns:
+        tuple: The answer text, the citation and the search type.
+    """
+    # Fall back to web search with user_persona and company_names included in the query
+    search_query = f"{user_query} related to user persona of {user_persona} and companies {' '.join(company_names)}"
+    from langchain_community.retrievers import CohereRagRetriever
+    rag_retriever = CohereRagRetriever(llm=clients.chat_model, connectors=[{"id": "web-search"}])
+    docs = rag_retriever.get_relevant_documents(search_query)
+    # Extract answer and citations
+    return docs[-1].page_content, 'Web Search', 'Connector'
+
+
+def rag_with_webSearch_stream(user_query: str, 
+                              chat_history: str = None, 
+                              user_persona: str = 'Individual Investor', 
+                              company_names: List[str] = ['UNITEDHEALTH GROUP INC'],
+                              use_cache: bool = True
+                              ) -> Iterator[Dict]:
+    """
+    Streaming variant of rag_with_webSearch.
+
+    Yields events as the pipeline progresses:
+        {"type": "status", "message": str}: a pipeline step finished (retrieval, filtering).
+        {"type": "token", "text": str}: the next piece of the answer text.
+        {"type": "done", "answer": str, "sources": list, "search_type": str}: the final result,
+            always the last event.
+
+    Args:
+        user_query (str): The user query for which the answer is sought.
+        chat_history (str): The chat history containing the conversation context.
+        user_persona (str, optional): The persona of the user. Defaults to 'Individual Investor'.
+        company_names (list of str, optional): List of company names being analyzed. Defaults to ['UNITEDHEALTH GROUP INC'].
+        use_cache (bool, optional): Serve and store answers through the answer cache. Only used
+            without chat history, since follow-up questions depend on the conversation. Defaults to True.
+
+    Yields:
+        dict: Pipeline events, as described above.
+    """
+    # Serve repeated questions from the answer cache
+    use_cache = use_cache and not chat_history
+    if use_cache:
+        cached = clients.answer_cache.get(user_query, company_names, user_persona)
+        if cached is not None:
+            answer, sources, search_type = cached
+            yield {"type": "token", "text": answer}
+            yield {"type": "done", "answer": answer, "sources": sources, "search_type": search_type}
+            return
+    original_query = user_query
+
+    # If chat_history is not empty, refine the user query, retrieving speculatively meanwhile
+    if chat_history:
+        user_query, input_docs = rewrite_and_retrieve(user_query, chat_history, company_names)
+    else:
+        # Retrieve top relevant documents
+        input_docs = retrieve_input_documents(user_query, company_names)
+    yield {"type": "status", "message": f"Retrieved {len(input_docs)} documents"}
+
+    # Filter relevant documents using the light model
+    relevant_docs = select_relevant_documents(input_docs, user_query) if input_docs else []
+    if input_docs:
+        yield {"type": "status", "message": f"Kept {len(relevant_docs)} relevant documents"}
+
+    # Check if relevant_docs is empty
+    if not relevant_docs:
+        answer, sources, search_type = web_search_answer(user_query, user_persona, company_names)
+        yield {"type": "token", "text": answer}
+    else:
+        # Generate the RAG prompt template
+        rag_prompt = generate_rag_prompt_template(user_persona=user_persona, user_query=user_query, company_names=company_names)
+        # Fit the documents into the prompt token budget
+        relevant_docs = pack_context(relevant_docs, rag_prompt)
+        # Stream the Response
+        chain = create_stuff_documents_chain(llm=clients.chat_model_light, prompt=rag_prompt)
+        answer_parts = []
+        for token in chain.stream({"context": relevant_docs}):
+            answer_parts.append(token)
+            yield {"type": "token", "text": token}
+        answer = "".join(answer_parts)
+        sources = list(set([x.metadata['source'] for x in relevant_docs]))
+        search_type = "Grounded Search"
+
+    # Check if docs is empty
+    if not answer:
+        answer, sources, search_type = "No relevant information found. Please try again later.", [], ''
+    elif use_cache:
+        clients.answer_cache.set(original_query, company_names, user_persona, answer, sources, search_type)
+
+    yield {"type": "done", "answer": answer, "sources": sources, "search_type": search_type}
+
+
 def rag_with_webSearch(user_query: str, 
                        chat_history: str = None, 
                        user_persona: str = 'Individual Investor', 
-                       company_names: List[str] = ['UNITEDHEALTH GROUP INC']
+                       company_names: List[str] = ['UNITEDHEALTH GROUP INC'],
+                       use_cache: bool = True
                        ) -> Tuple[str, List[str]]:
     """
     Retrieve an answer and citations related to the given user query using Cohere's RAG model.
@@ -495,71 +1031,12 @@ def rag_with_webSearch(user_query: str,
         chat_history (str): The chat history containing the conversation context.
         user_persona (str, optional): The persona of the user (e.g., Individual Investor, Financial Analyst, Sales Representative). Defaults to 'Individual Investor'.
         company_names (list of str, optional): List of company names being analyzed. Defaults to ['UNITEDHEALTH GROUP INC'].
+        use_cache (bool, optional): Serve and store answers through the answer cache. Only used
+            without chat history, since follow-up questions depend on the conversation. Defaults to True.
 
     Returns:
         tuple: A tuple containing the answer text and a list of citations.
     """
-
-    # If chat_history is not empty, refine the user query
-    if chat_history:
-        # Append the user query to the chat history
-        combined_history = f"{chat_history}\n{user_query}"
-        user_query = generate_user_query(combined_history)
-
-    # Retrieve top relevant documents
-    if len(company_names) > 1:
-        # Creating company specific query
-        user_queries = generate_comparison_new_queries(user_query)
-        # Match the query and the company name
-        matched_pairs = match_company_to_generated_query(queries=user_queries, company_names=company_names)
-        input_docs = []
-        for pair in matched_pairs:
-            company_name = pair['company_name']
-            company_query = pair['query']
-            query_docs = retrieve_top_documents(company_query, company_names=[company_name], top_n=10)
-            input_docs += query_docs
-    else:
-        input_docs = retrieve_top_documents(user_query, company_names=company_names)
-    
-    # Check if input_docs is empty
-    if not input_docs:
-        # Fall back to web search with user_persona and company_names included in the query
-        search_query = f"{user_query} related to user persona of {user_persona} and companies {' '.join(company_names)}"
-        rag_retriever = CohereRagRetriever(llm=cohere_chat_model, connectors=[{"id": "web-search"}])
-        docs = rag_retriever.get_relevant_documents(search_query)
-        # Extract answer and citations
-        answer = docs[-1].page_content
-        sources = 'Web Search'
-        search_type = 'Connector'
-    else:
-        # Filter relevant documents using the light model
-        relevant_docs = []
-        for doc in input_docs:
-            doc_relevancy_summary = is_document_relevant_extractive_summary(doc, user_query)
-            if doc_relevancy_summary:
-                relevant_docs.append(doc_relevancy_summary)
-        # Check if relevant_docs is empty
-        if not relevant_docs:
-            # Fall back to web search with user_persona and company_names included in the query
-            search_query = f"{user_query} related to user persona of {user_persona} and companies {' '.join(company_names)}"
-            rag_retriever = CohereRagRetriever(llm=cohere_chat_model, connectors=[{"id": "web-search"}])
-            docs = rag_retriever.get_relevant_documents(search_query)
-            # Extract answer and citations
-            answer = docs[-1].page_content
-            sources = 'Web Search'
-            search_type = 'Connector'
-        else:
-            # Generate the RAG prompt template
-            rag_prompt = generate_rag_prompt_template(user_persona=user_persona, user_query=user_query, company_names=company_names)
-            # Generate the Response
-            chain = create_stuff_documents_chain(llm=cohere_chat_model_light, prompt=rag_prompt)
-            answer = chain.invoke({"context": relevant_docs})
-            sources = list(set([x.metadata['source'] for x in relevant_docs]))
-            search_type = "Grounded Search"
-    
-    # Check if docs is empty
-    if not answer:
-        return "No relevant information found. Please try again later.", [], ''
-
-    return answer, sources, search_type
-    
\ No newline at end of file
+    for event in rag_with_webSearch_stream(user_query, chat_history, user_persona, company_names, use_cache):
+        if event["type"] == "done":
+            return event["answer"], event["sources"], event["search_type"]
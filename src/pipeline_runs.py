@@ -0,0 +1,139 @@
+import hashlib
+import json
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+def request_key(user_query: str, user_persona: str, company_names: List[str], chat_history: Optional[str] = None) -> str:
+    """
+    Identify a pipeline request by everything its answer depends on.
+
+    Args:
+        user_query (str): The user query.
+        user_persona (str): The persona of the user.
+        company_names (list of str): List of company names being analyzed.
+        chat_history (str, optional): The chat history the query is refined with. Defaults to None.
+
+    Returns:
+        str: The SHA-256 hex digest of the request.
+    """
+    request = [user_query.strip(), user_persona, sorted(company_names), chat_history or ""]
+    return hashlib.sha256(json.dumps(request).encode("utf-8")).hexdigest()
+
+
+class PipelineRun:
+    """
+    One pipeline call running in a background thread.
+
+    The events it yields (see rag_with_webSearch_stream) are recorded, so any number
+    of readers, e.g. the reruns of a Streamlit session, can follow the run from the
+    start without calling the pipeline again.
+    """
+    def __init__(self, key: str):
+        self.key = key
+        self.events: List[Dict] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._condition = threading.Condition()
+
+    def run(self, events_fn: Callable[[], Iterator[Dict]]) -> None:
+        try:
+            for event in events_fn():
+                with self._condition:
+                    self.events.append(event)
+                    self._condition.notify_all()
+        except BaseException as e:
+            self.error = e
+        finally:
+            with self._condition:
+                self.done = True
+                self._condition.notify_all()
+
+    def follow(self, timeout: Optional[float] = None) -> Iterator[Dict]:
+        """
+        Yield every event of the run, from the first one, waiting for new events until the run ends.
+
+        Args:
+            timeout (float, optional): Maximum wait for the next event in seconds. Defaults to None (no limit).
+
+        Yields:
+            dict: Pipeline events, in order. An error raised by the pipeline is re-raised after the last event.
+        """
+        index = 0
+        while True:
+            with self._condition:
+                if index == len(self.events) and not self.done:
+                    if not self._condition.wait_for(lambda: index < len(self.events) or self.done, timeout):
+                        raise TimeoutError(f"No pipeline event within {timeout} seconds")
+                events = self.events[index:]
+                done = self.done
+            for event in events:
+                yield event
+            index += len(events)
+            if done and index == len(self.events):
+                break
+        if self.error is not None:
+            raise self.error
+
+    @property
+    def result(self) -> Optional[Dict]:
+        """
+        The final ("done") event, or None while the run is in flight or if it failed.
+        """
+        if self.done and self.events and self.events[-1]["type"] == "done":
+            return self.events[-1]
+        return None
+
+
+class PipelineRuns:
+    """
+    Process-wide registry of the pipeline runs in flight.
+
+    Starting a request whose key is already running attaches to that run, so
+    repeated submissions and reruns never issue a second identical pipeline call.
+    Runs leave the registry when they end; finished results are kept by the caller.
+    """
+    def __init__(self):
+        self.in_flight: Dict[str, PipelineRun] = {}
+        self.started = 0
+        self._lock = threading.Lock()
+
+    def start(self, key: str, events_fn: Callable[[], Iterator[Dict]]) -> PipelineRun:
+        """
+        Return the run in flight for the key, or start events_fn in a new background thread.
+
+        Args:
+            key (str): The request key, see request_key.
+            events_fn (Callable): Called without arguments, returns the pipeline event iterator.
+
+        Returns:
+            PipelineRun: The run of the request.
+        """
+        with self._lock:
+            run = self.in_flight.get(key)
+            if run is not None:
+                return run
+            run = PipelineRun(key)
+            self.in_flight[key] = run
+            self.started += 1
+
+        try:
+            from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+            ctx = get_script_run_ctx()
+        except ImportError:
+            ctx = None
+
+        def target():
+            try:
+                run.run(events_fn)
+            finally:
+                with self._lock:
+                    if self.in_flight.get(key) is run:
+                        del self.in_flight[key]
+
+        thread = threading.Thread(target=target, name=f"pipeline-{key[:8]}", daemon=True)
+        # The pipeline's st.* calls and cached functions (st.cache_data) run in the starting script's context
+        if ctx is not None:
+            add_script_run_ctx(thread, ctx)
+        thread.start()
+        return run
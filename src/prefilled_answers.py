@@ -0,0 +1,184 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import constants
+from answer_cache import CACHE_DIR, FilingVersions
+from pipeline_runs import request_key
+
+
+DEFAULT_PREFILLED_PATH = os.path.join(CACHE_DIR, "prefilled_answers.sqlite")
+
+# Bump when a pipeline change (prompts, models, retrieval) should invalidate every stored answer
+PIPELINE_VERSION = 1
+
+PERSONAS = ['Sales Representative', 'Investor', 'Financial Analyst']
+
+PERSONA_QUESTIONS = {
+    'Sales Representative': constants.sales_questions,
+    'Investor': constants.investor_questions,
+    'Financial Analyst': constants.fin_questions,
+}
+
+PROMPTS = {
+    'Summarize': 'Summarize the following section',
+    'Questions': 'Answer the following question',
+    'Compare': 'Compare these companies',
+}
+
+
+def prefill_text(action: str, choice: Any, company: str) -> str:
+    """
+    The chat input text the app pre-fills for a feature, a choice and a company.
+
+    Args:
+        action (str): The feature, 'Summarize', 'Questions' or 'Compare'.
+        choice (str or list of str): The section, the question or the companies to compare.
+        company (str): The company being analyzed.
+
+    Returns:
+        str: The prompt text.
+    """
+    # list of companies
+    if type(choice) == list:
+        choice = ", ".join(choice)
+
+    # grammar fix
+    if action == 'Compare':
+        return f'{PROMPTS[action]} with {company}: {str(choice)}'
+    return f'{PROMPTS[action]} for {company}: {str(choice)}'
+
+
+def canned_requests(companies: Optional[List[str]] = None, personas: Optional[List[str]] = None) -> Iterator[Dict[str, str]]:
+    """
+    Every (persona, company, canned question) combination the app can pre-fill.
+
+    The Questions feature offers the questions of the persona, Summarize the
+    summary sections for every persona. Compare prompts depend on a free choice
+    of companies and are not enumerated.
+
+    Args:
+        companies (list of str, optional): Companies to include. Defaults to constants.companies.
+        personas (list of str, optional): Personas to include. Defaults to PERSONAS.
+
+    Yields:
+        dict: Requests with 'persona', 'company', 'feature', 'choice' and 'prompt' keys.
+    """
+    for persona in personas or PERSONAS:
+        for company in companies or constants.companies:
+            for feature, choices in [('Questions', PERSONA_QUESTIONS[persona]), ('Summarize', constants.summary_sections)]:
+                for choice in choices:
+                    yield {"persona": persona, "company": company, "feature": feature, "choice": choice,
+                           "prompt": prefill_text(feature, choice, company)}
+
+
+def is_canned(prompt: str, persona: str, company: str) -> bool:
+    """
+    Check whether a prompt is one the app pre-fills for the persona and the company, unchanged.
+    """
+    return any(request["prompt"] == prompt for request in canned_requests([company], [persona]))
+
+
+class PrefilledAnswerStore:
+    """
+    On-disk store of precomputed answers to the canned prompts, in SQLite.
+
+    Every answer records the filing version of its company (see FilingVersions)
+    and the pipeline version it was computed with. It is served only while both
+    are current: re-importing a company's filings or bumping PIPELINE_VERSION
+    makes its answers stale until they are rebuilt.
+    """
+    def __init__(self,
+                 path: str = DEFAULT_PREFILLED_PATH,
+                 versions: Optional[FilingVersions] = None,
+                 pipeline_version: int = PIPELINE_VERSION):
+        self.path = path
+        self.versions = versions if versions is not None else FilingVersions()
+        self.pipeline_version = pipeline_version
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, persona TEXT, company TEXT, prompt TEXT, answer TEXT, sources TEXT, "
+            "search_type TEXT, filing_version REAL, pipeline_version INTEGER, created_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_company ON answers (company)")
+        self._conn.commit()
+
+    def filing_version(self, company: str) -> float:
+        """
+        The current filing version of a company (its last import time, 0 if never recorded).
+        """
+        return self.versions.load().get(company, 0)
+
+    def _is_current(self, company: str, filing_version: float, pipeline_version: int) -> bool:
+        return pipeline_version == self.pipeline_version and filing_version >= self.filing_version(company)
+
+    def get(self, prompt: str, persona: str, company: str) -> Optional[Tuple[str, Any, str]]:
+        """
+        Look up the current answer of a canned prompt.
+
+        Args:
+            prompt (str): The prompt text, as pre-filled by the app.
+            persona (str): The persona of the user.
+            company (str): The company being analyzed.
+
+        Returns:
+            tuple or None: (answer, sources, search_type), or None if missing or stale.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer, sources, search_type, filing_version, pipeline_version FROM answers WHERE key = ?",
+                (request_key(prompt, persona, [company]),)
+            ).fetchone()
+        if row is None or not self._is_current(company, row[3], row[4]):
+            return None
+        return row[0], json.loads(row[1]), row[2]
+
+    def set(self, prompt: str, persona: str, company: str, answer: str, sources: Any, search_type: str,
+            filing_version: Optional[float] = None) -> None:
+        """
+        Store the answer of a canned prompt.
+
+        Args:
+            filing_version (float, optional): Filing version of the company when the pipeline started.
+                Defaults to the current one.
+        """
+        if filing_version is None:
+            filing_version = self.filing_version(company)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, persona, company, prompt, answer, sources, search_type, "
+                "filing_version, pipeline_version, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (request_key(prompt, persona, [company]), persona, company, prompt, answer, json.dumps(sources),
+                 search_type, filing_version, self.pipeline_version, time.time())
+            )
+            self._conn.commit()
+
+    def current_keys(self) -> set:
+        """
+        The keys of every answer that is still current.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT key, company, filing_version, pipeline_version FROM answers").fetchall()
+        return {key for key, company, filing_version, pipeline_version in rows
+                if self._is_current(company, filing_version, pipeline_version)}
+
+    def recording(self, events: Iterator[Dict], prompt: str, persona: str, company: str) -> Iterator[Dict]:
+        """
+        Pass pipeline events through, storing the final answer of the prompt.
+
+        The filing version is read before the first event, so filings imported
+        while the pipeline runs leave the answer stale.
+        """
+        filing_version = self.filing_version(company)
+        for event in events:
+            if event["type"] == "done" and event["search_type"]:
+                self.set(prompt, persona, company, event["answer"], event["sources"], event["search_type"], filing_version)
+            yield event
@@ -0,0 +1,745 @@
+from abc import ABC, abstractmethod
+from collections import Counter
+import hashlib
+import json
+import mmap
+import os
+import pathlib
+import re
+import tempfile
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import uuid
+
+import numpy as np
+
+
+# Default location of the local index, relative to the repository root
+DEFAULT_INDEX_DIR = os.path.join(pathlib.Path(__file__).parent.parent.resolve(), "index")
+
+# Properties returned for every hit, matching what the app reads from Weaviate
+RETRIEVAL_PROPERTIES = ["companyName", "filingUrl", "sectionSummary", "sectionPage", "chunk"]
+
+# Page store layout: pages and section summaries are stored once, chunks only reference them
+PAGE_PROPERTIES = ["sectionPage", "sectionSummary"]
+PAGE_REFERENCE_PROPERTIES = ["companyName", "filingUrl", "chunk", "pageId"]
+
+# Searches grouped by page return one hit per distinct page, with only these properties (chunk is the best hit)
+PAGE_HIT_PROPERTIES = ["companyName", "filingUrl", "sectionPage", "chunk"]
+# Chunk hits fetched per requested page when pages are grouped on the client
+GROUP_OVERSAMPLING = 4
+
+# Hybrid search: properties searched with BM25, and the ways of fusing the BM25 and vector rankings
+KEYWORD_PROPERTIES = ["chunk"]
+FUSION_RANKED = "ranked"                  # Reciprocal rank fusion (Weaviate rankedFusion)
+FUSION_RELATIVE_SCORE = "relative_score"  # Min-max normalised scores (Weaviate relativeScoreFusion)
+HYBRID_FUSIONS = [FUSION_RANKED, FUSION_RELATIVE_SCORE]
+RANK_CONSTANT = 60
+# Rows each ranking contributes to the local hybrid fusion
+HYBRID_CANDIDATES = 100
+
+# BM25 parameters, as in Weaviate
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {"a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "if", "in", "into", "is", "it",
+             "no", "not", "of", "on", "or", "such", "that", "the", "their", "then", "there", "these",
+             "they", "this", "to", "was", "will", "with", "what", "which", "how", "does", "do", "its"}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased alphanumeric words without stopwords (Weaviate's word tokenization and en stopwords).
+    """
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def fuse_rankings(vector_ranking: List[Tuple[Any, float]],
+                  keyword_ranking: List[Tuple[Any, float]],
+                  alpha: float = 0.5,
+                  fusion: str = FUSION_RANKED) -> List[Tuple[Any, float]]:
+    """
+    Fuse a vector and a keyword ranking into one, as Weaviate hybrid search does.
+
+    Args:
+        vector_ranking (list of tuple): (id, score) pairs, best first; higher scores are better.
+        keyword_ranking (list of tuple): (id, BM25 score) pairs, best first.
+        alpha (float, optional): Weight of the vector ranking, 0 for BM25 only and 1 for vector only. Defaults to 0.5.
+        fusion (str, optional): FUSION_RANKED, each ranking contributes weight / (RANK_CONSTANT + rank),
+            or FUSION_RELATIVE_SCORE, each ranking's scores are min-max normalised then weighted. Defaults to FUSION_RANKED.
+
+    Returns:
+        list of tuple: (id, fused score) pairs, best first.
+    """
+    if fusion not in HYBRID_FUSIONS:
+        raise ValueError(f"Unknown fusion '{fusion}', expected one of {HYBRID_FUSIONS}")
+    fused = {}
+    for ranking, weight in [(vector_ranking, alpha), (keyword_ranking, 1.0 - alpha)]:
+        if not ranking or weight == 0:
+            continue
+        if fusion == FUSION_RANKED:
+            contributions = [weight / (RANK_CONSTANT + rank) for rank in range(len(ranking))]
+        else:
+            scores = [score for _, score in ranking]
+            low, high = min(scores), max(scores)
+            contributions = [weight * ((score - low) / (high - low) if high > low else 1.0) for score in scores]
+        for (key, _), contribution in zip(ranking, contributions):
+            fused[key] = fused.get(key, 0.0) + contribution
+    # Ties keep the vector ranking's order (dicts preserve insertion order, sorted is stable)
+    return sorted(fused.items(), key=lambda item: -item[1])
+
+
+def tenant_name(company_name: str) -> str:
+    """
+    Weaviate tenant of a company in the per-company layout.
+
+    Tenant names only allow letters, digits, '-' and '_', so the company name is
+    slugged and suffixed with a short hash of the full name to keep tenants distinct.
+    """
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", company_name).strip("-")[:48]
+    return f"{slug}-{hashlib.sha256(company_name.encode('utf-8')).hexdigest()[:8]}"
+
+
+def page_id(filing_url: str, section_page: str, section_summary: str) -> str:
+    """
+    Content address of a page of a filing: a UUID (usable as a Weaviate object id) of its text and section summary.
+    """
+    content = hashlib.sha256(f"{section_page}\n{section_summary}".encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{filing_url}|{content}"))
+
+
+def page_key(hit: Dict[str, Any]) -> Any:
+    return hit["pageId"] if hit.get("pageId") is not None else hit.get("sectionPage")
+
+
+def group_hits(hits: List[Dict[str, Any]], top_n: int) -> List[Dict[str, Any]]:
+    """
+    Group hits by page: the best hit of each of the first top_n distinct pages.
+
+    Args:
+        hits (list of dict): Chunk hits, best first.
+        top_n (int): Number of pages.
+
+    Returns:
+        list of dict: One hit per page, best first, with the number of hits on the page under '_additional'.
+    """
+    pages = {}
+    for hit in hits:
+        key = page_key(hit)
+        if key in pages:
+            pages[key]["_additional"]["count"] += 1
+        elif len(pages) < top_n:
+            pages[key] = dict(hit, _additional=dict(hit.get("_additional") or {}, count=1))
+    return list(pages.values())
+
+
+def page_hits(hit_lists: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+    """
+    Keep only the PAGE_HIT_PROPERTIES (and the page scores) of page hits.
+    """
+    return [[dict({name: hit.get(name) for name in PAGE_HIT_PROPERTIES}, _additional=hit.get("_additional") or {})
+             for hit in hits] for hits in hit_lists]
+
+
+def attach_pages(hit_lists: List[List[Dict[str, Any]]],
+                 fetch_pages: Callable[[List[Any]], Dict[Any, Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+    """
+    Resolve the pageId of hits into their PAGE_PROPERTIES, fetching every distinct page once.
+
+    Args:
+        hit_lists (list of list of dict): Hits of one or several searches, updated in place.
+        fetch_pages (Callable): Maps a list of page ids to {page id: page properties}.
+
+    Returns:
+        list of list of dict: The hits. Hits without a pageId (objects of the legacy layout) are left as they are.
+    """
+    page_ids = list(dict.fromkeys(hit["pageId"] for hits in hit_lists for hit in hits if hit.get("pageId") is not None))
+    if page_ids:
+        pages = fetch_pages(page_ids)
+        for hits in hit_lists:
+            for hit in hits:
+                hit.update(pages.get(hit.get("pageId"), {}))
+    return hit_lists
+
+
+def merge_hits(hit_lists: List[List[Dict[str, Any]]], top_n: int) -> List[Dict[str, Any]]:
+    """
+    Merge the hits of several searches, best first: lowest distance, or highest score for hybrid hits.
+    """
+    def rank(hit):
+        additional = hit.get("_additional") or {}
+        if additional.get("distance") is not None:
+            return float(additional["distance"])
+        return -float(additional.get("score") or 0.0)
+    return sorted((hit for hits in hit_lists for hit in hits), key=rank)[:top_n]
+
+
+class RetrievalBackend(ABC):
+    """
+    Interface for the document stores behind retrieve_top_documents.
+
+    A backend returns raw hits as property dictionaries (the same shape as Weaviate
+    Get results), best match first, with the distance (vector search) or the fused
+    score (hybrid search) under '_additional'.
+
+    With `alpha` set, searches are hybrid: BM25 over KEYWORD_PROPERTIES and vector
+    search, fused with `fusion` (see fuse_rankings). max_distance only applies to
+    vector search.
+
+    With `group_by_page`, top_n counts distinct pages: hits are grouped by page and
+    only the best hit of each page is returned, with the PAGE_HIT_PROPERTIES and the
+    page's best distance (or score) and number of hits under '_additional'.
+    """
+    @abstractmethod
+    def search(self,
+               query: str,
+               company_names: List[str],
+               top_n: int = 15,
+               max_distance: float = 999.0,
+               class_name: str = 'SECSavvyNOW',
+               alpha: Optional[float] = None,
+               fusion: str = FUSION_RANKED,
+               group_by_page: bool = False) -> List[Dict[str, Any]]:
+        """
+        Search the chunks of the given companies.
+        """
+
+    def search_many(self,
+                    queries: List[Tuple[str, List[str]]],
+                    top_n: int = 10,
+                    max_distance: float = 999.0,
+                    class_name: str = 'SECSavvyNOW',
+                    alpha: Optional[float] = None,
+                    fusion: str = FUSION_RANKED,
+                    group_by_page: bool = False) -> List[List[Dict[str, Any]]]:
+        """
+        Run several (query, company_names) searches; backends may batch them into one request.
+        """
+        return [self.search(query, company_names, top_n, max_distance, class_name, alpha, fusion, group_by_page)
+                for query, company_names in queries]
+
+
+class WeaviateBackend(RetrievalBackend):
+    """
+    Retrieval from the Weaviate cluster.
+
+    With an embedding cache, query vectors are computed client-side and searched with
+    near vector; otherwise Weaviate vectorises every query with text2vec-cohere (near text).
+    The cache must use the same embedding model as the class vectorizer.
+
+    With tenants, the class is multi-tenant with one tenant per company (see tenant_name
+    and import_data_to_WEAVIATE), so every company is searched in its own vector index
+    instead of filtering the whole corpus on companyName. Searches over several companies
+    send one aliased query per company and merge the hits.
+
+    With a page class, chunk objects only hold a pageId (see import_data_to_WEAVIATE):
+    the distinct pages of all hits are fetched from the page class in one request
+    after the search.
+
+    Vector searches grouped by page use Weaviate's groupBy on the page key (pageId,
+    or sectionPage without a page class), one object per group. Weaviate cannot group
+    hybrid searches, so those are oversampled and grouped on the client.
+    """
+    def __init__(self, client, embedding_cache=None, tenants: bool = False, page_class: Optional[str] = None):
+        self.client = client
+        self.embedding_cache = embedding_cache
+        self.tenants = tenants
+        self.page_class = page_class
+
+    def build_query(self, query, company_names, top_n, max_distance, class_name, vector=None, alpha=None, fusion=FUSION_RANKED,
+                    group_by_page=False):
+        """
+        Build the Weaviate query used for document retrieval, without sending it.
+        """
+        if group_by_page:
+            # Every property comes from the best hit of each group
+            key = "pageId" if self.page_class else "sectionPage"
+            properties = " ".join(["companyName", "filingUrl", "chunk", key])
+            builder = (
+                self.client.query.get(class_name)
+                .with_group_by([key], groups=top_n, objects_per_group=1)
+                .with_additional({"group": ["count", "minDistance", f"hits {{ {properties} _additional {{ distance }} }}"]})
+            )
+            near = {"vector": vector, "distance": max_distance} if vector is not None else {"concepts": [query], "distance": max_distance}
+            builder = builder.with_near_vector(near) if vector is not None else builder.with_near_text(near)
+            if self.tenants:
+                return builder.with_tenant(tenant_name(company_names[0]))
+            return builder.with_where({"path": ["companyName"], "operator": "ContainsAny", "valueText": company_names})
+
+        builder = self.client.query.get(class_name, PAGE_REFERENCE_PROPERTIES if self.page_class else RETRIEVAL_PROPERTIES)
+        if alpha is not None:
+            from weaviate.gql.get import HybridFusion
+            fusion_type = {FUSION_RANKED: HybridFusion.RANKED, FUSION_RELATIVE_SCORE: HybridFusion.RELATIVE_SCORE}[fusion]
+            # Without a vector, Weaviate vectorises the query with text2vec-cohere
+            builder = builder.with_hybrid(query, alpha=alpha, vector=vector, properties=KEYWORD_PROPERTIES,
+                                          fusion_type=fusion_type).with_additional(["score"])
+        elif vector is not None:
+            builder = builder.with_near_vector({"vector": vector, "distance": max_distance}).with_additional(["distance"])
+        else:
+            builder = builder.with_near_text({"concepts": [query], "distance": max_distance}).with_additional(["distance"])
+        if self.tenants:
+            # One company per query, searched in its own tenant without a filter
+            return builder.with_tenant(tenant_name(company_names[0])).with_limit(top_n)
+        return (
+            builder
+            .with_where({"path": ["companyName"], "operator": "ContainsAny", "valueText": company_names})
+            .with_limit(top_n)
+        )
+
+    def query_vectors(self, queries: List[str], alpha: Optional[float] = None) -> List[Optional[List[float]]]:
+        """
+        Query vectors from the embedding cache, or None for every query (near text) without one.
+        BM25-only hybrid searches (alpha 0) need no vectors.
+        """
+        if self.embedding_cache is None or alpha == 0:
+            return [None] * len(queries)
+        return self.embedding_cache.embed_queries(queries)
+
+    def search(self, query, company_names, top_n=15, max_distance=999.0, class_name='SECSavvyNOW', alpha=None, fusion=FUSION_RANKED,
+               group_by_page=False):
+        if group_by_page or (self.tenants and len(company_names) != 1):
+            return self.search_many([(query, company_names)], top_n, max_distance, class_name, alpha, fusion, group_by_page)[0]
+        vector = self.query_vectors([query], alpha)[0]
+        response = self.build_query(query, company_names, top_n, max_distance, class_name, vector, alpha, fusion).do()
+
+        hits = []
+        if 'data' in response and 'Get' in response['data'] and class_name in response['data']['Get']:
+            hits = response['data']['Get'][class_name] or []
+        return self.with_pages([hits])[0]
+
+    def search_many(self, queries, top_n=10, max_distance=999.0, class_name='SECSavvyNOW', alpha=None, fusion=FUSION_RANKED,
+                    group_by_page=False):
+        """
+        Send all searches as aliased queries in a single GraphQL Get request.
+        """
+        if not queries:
+            return []
+        if group_by_page and alpha is not None:
+            results = self.search_many(queries, top_n * GROUP_OVERSAMPLING, max_distance, class_name, alpha, fusion)
+            return page_hits([group_hits(hits, top_n) for hits in results])
+
+        vectors = self.query_vectors([query for query, _ in queries], alpha)
+        if not self.tenants:
+            results = self.multi_get([(query, company_names, vector) for (query, company_names), vector in zip(queries, vectors)],
+                                     top_n, max_distance, class_name, alpha, fusion, group_by_page)
+        else:
+            # One query per company and tenant, merged back per search
+            hit_lists = self.multi_get([(query, [name], vector) for (query, company_names), vector in zip(queries, vectors)
+                                        for name in company_names], top_n, max_distance, class_name, alpha, fusion, group_by_page)
+            results = []
+            for _, company_names in queries:
+                results.append(merge_hits(hit_lists[:len(company_names)], top_n))
+                hit_lists = hit_lists[len(company_names):]
+
+        if group_by_page:
+            return page_hits(self.with_pages(results, ["sectionPage"]))
+        return self.with_pages(results)
+
+    def with_pages(self, hit_lists, properties=PAGE_PROPERTIES):
+        if not self.page_class:
+            return hit_lists
+        return attach_pages(hit_lists, lambda page_ids: self.fetch_pages(page_ids, properties))
+
+    def fetch_pages(self, page_ids: List[str], properties: List[str] = PAGE_PROPERTIES) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch pages from the page class by id, in one Get request.
+        """
+        response = (
+            self.client.query.get(self.page_class, properties)
+            .with_additional(["id"])
+            .with_where({"path": ["id"], "operator": "ContainsAny", "valueText": page_ids})
+            .with_limit(len(page_ids))
+            .do()
+        )
+        pages = {}
+        if 'data' in response and 'Get' in response['data']:
+            for page in response['data']['Get'].get(self.page_class) or []:
+                pages[page["_additional"]["id"]] = {name: page.get(name) for name in properties}
+        return pages
+
+    @staticmethod
+    def group_results(objects):
+        """
+        The best hit of every group of a groupBy response, with the group's best distance and size.
+        """
+        hits = []
+        for obj in objects:
+            group = (obj.get("_additional") or {}).get("group") or {}
+            if group.get("hits"):
+                hit = dict(group["hits"][0])
+                hit["_additional"] = {"distance": group.get("minDistance"), "count": group.get("count")}
+                hits.append(hit)
+        return sorted(hits, key=lambda hit: hit["_additional"]["distance"])
+
+    def multi_get(self, searches, top_n, max_distance, class_name, alpha, fusion, group_by_page=False):
+        """
+        Send (query, company_names, vector) searches as aliased queries in one Get request.
+        """
+        if not searches:
+            return []
+
+        aliases = [f"query{index}" for index in range(len(searches))]
+        builders = [
+            self.build_query(query, company_names, top_n, max_distance, class_name, vector, alpha, fusion, group_by_page).with_alias(alias)
+            for alias, (query, company_names, vector) in zip(aliases, searches)
+        ]
+        response = self.client.query.multi_get(builders).do()
+
+        results = {}
+        if 'data' in response and 'Get' in response['data']:
+            results = response['data']['Get'] or {}
+
+        if group_by_page:
+            return [self.group_results(results.get(alias) or []) for alias in aliases]
+        return [results.get(alias) or [] for alias in aliases]
+
+
+class LocalVectorIndex(RetrievalBackend):
+    """
+    In-process brute-force vector search over a memory-mapped matrix of chunk embeddings.
+
+    The index directory, written by build_local_index, holds:
+        embeddings.npy: float32 matrix of L2-normalised chunk embeddings, rows grouped by company.
+        records.jsonl: one JSON object of properties per row.
+        offsets.npy: byte offset of every row in records.jsonl.
+        companies.json: company name -> [start, end) row range.
+        bm25_terms.json: term -> [start, end) range of its postings.
+        bm25_postings.npy, bm25_frequencies.npy: rows (ascending) and term frequencies of every term's postings.
+        bm25_lengths.npy: number of terms in every row's chunk.
+        pages.jsonl, page_offsets.npy: every distinct page (PAGE_PROPERTIES) once; rows reference theirs by pageId.
+        row_pages.npy: pageId of every row, for searches grouped by page.
+
+    The companyName filter is a slice of the matrix (and of every posting list) rather
+    than a scan, and distances are cosine distances, as in Weaviate. Query vectors come
+    from the embedding cache. Indexes built without the BM25 files only support vector search;
+    indexes built without the pages files hold the page of every row in records.jsonl.
+    """
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR, embedding_cache=None):
+        self.index_dir = index_dir
+        self.embedding_cache = embedding_cache
+        self.embeddings = np.load(os.path.join(index_dir, "embeddings.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(index_dir, "offsets.npy"), mmap_mode="r")
+        with open(os.path.join(index_dir, "companies.json")) as f:
+            self.company_ranges = json.load(f)
+        self._records = self.map_lines(os.path.join(index_dir, "records.jsonl"))
+        self.has_page_store = os.path.exists(os.path.join(index_dir, "pages.jsonl"))
+        if self.has_page_store:
+            self.page_offsets = np.load(os.path.join(index_dir, "page_offsets.npy"), mmap_mode="r")
+            self._pages = self.map_lines(os.path.join(index_dir, "pages.jsonl"))
+        self.row_pages = None
+        if os.path.exists(os.path.join(index_dir, "row_pages.npy")):
+            self.row_pages = np.load(os.path.join(index_dir, "row_pages.npy"), mmap_mode="r")
+        self.has_keyword_index = os.path.exists(os.path.join(index_dir, "bm25_terms.json"))
+        if self.has_keyword_index:
+            with open(os.path.join(index_dir, "bm25_terms.json")) as f:
+                self.terms = json.load(f)
+            self.postings = np.load(os.path.join(index_dir, "bm25_postings.npy"), mmap_mode="r")
+            self.frequencies = np.load(os.path.join(index_dir, "bm25_frequencies.npy"), mmap_mode="r")
+            self.lengths = np.load(os.path.join(index_dir, "bm25_lengths.npy"))
+            self.average_length = float(self.lengths.mean()) if len(self.lengths) else 1.0
+
+    @staticmethod
+    def map_lines(path):
+        with open(path, "rb") as f:
+            # mmap cannot map an empty file (an index without rows); the mapping outlives the file
+            if not os.fstat(f.fileno()).st_size:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def read_line(lines, offsets, row):
+        start = int(offsets[row])
+        end = lines.find(b"\n", start)
+        return json.loads(lines[start:end if end != -1 else len(lines)])
+
+    def record(self, row: int) -> Dict[str, Any]:
+        """
+        Read the properties of one row from the memory-mapped records file.
+        """
+        return self.read_line(self._records, self.offsets, row)
+
+    def fetch_pages(self, page_ids: List[int], properties: List[str] = PAGE_PROPERTIES) -> Dict[int, Dict[str, Any]]:
+        """
+        Read pages from the memory-mapped pages file.
+        """
+        pages = {}
+        for page in page_ids:
+            content = self.read_line(self._pages, self.page_offsets, page)
+            pages[page] = {name: content.get(name) for name in properties}
+        return pages
+
+    def company_row_ranges(self, company_names):
+        return [self.company_ranges[name] for name in company_names if name in self.company_ranges]
+
+    def rank_vector(self, vector, company_names, top_n=15):
+        """
+        Rows of the companies closest to a query embedding, with their cosine distances, best first.
+        """
+        query_vector = np.asarray(vector, dtype=np.float32)
+        query_vector = query_vector / (np.linalg.norm(query_vector) or 1.0)
+
+        ranges = self.company_row_ranges(company_names)
+        if not ranges:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+        distances = 1.0 - np.concatenate([self.embeddings[start:end] @ query_vector for start, end in ranges])
+
+        count = min(top_n, len(rows))
+        if not count:
+            return rows[:0], distances[:0]
+        best = np.argpartition(distances, count - 1)[:count]
+        best = best[np.argsort(distances[best])]
+        return rows[best], distances[best]
+
+    def rank_keywords(self, query, company_names, top_n=15):
+        """
+        Rows of the companies with the highest BM25 scores for the query terms, with their scores, best first.
+        """
+        ranges = self.company_row_ranges(company_names)
+        total_rows = len(self.lengths)
+        rows, scores = [], []
+        for term in set(tokenize(query)):
+            if term not in self.terms:
+                continue
+            start, end = self.terms[term]
+            postings = self.postings[start:end]
+            idf = np.log(1.0 + (total_rows - len(postings) + 0.5) / (len(postings) + 0.5))
+            # Postings are sorted by row, so each company is a slice
+            for first, last in ranges:
+                lo, hi = np.searchsorted(postings, [first, last])
+                if lo == hi:
+                    continue
+                term_rows = np.asarray(postings[lo:hi])
+                frequencies = np.asarray(self.frequencies[start + lo:start + hi], dtype=np.float32)
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.lengths[term_rows] / self.average_length)
+                rows.append(term_rows)
+                scores.append(idf * frequencies * (BM25_K1 + 1.0) / (frequencies + norm))
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        unique_rows, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(scores))
+        count = min(top_n, len(unique_rows))
+        best = np.argpartition(-totals, count - 1)[:count]
+        # Highest score first, lower row first among equal scores
+        best = best[np.lexsort((unique_rows[best], -totals[best]))]
+        return unique_rows[best], totals[best]
+
+    def search_vector(self, vector, company_names, top_n=15, max_distance=999.0):
+        """
+        Search the index with a query embedding.
+        """
+        hits = []
+        for row, distance in zip(*self.rank_vector(vector, company_names, top_n)):
+            if distance > max_distance:
+                break
+            hit = self.record(int(row))
+            hit["_additional"] = {"distance": float(distance)}
+            hits.append(hit)
+        return hits
+
+    def search_pages(self, vector, company_names, top_n=15, max_distance=999.0):
+        """
+        Search the index with a query embedding, returning the best hit of each of the top_n closest pages.
+        """
+        if self.row_pages is None:
+            # Index built before row_pages.npy: group an oversampled ranking
+            return group_hits(self.search_vector(vector, company_names, top_n * GROUP_OVERSAMPLING, max_distance), top_n)
+
+        ranges = self.company_row_ranges(company_names)
+        rows, distances = self.rank_vector(vector, company_names, sum(end - start for start, end in ranges))
+        keep = distances <= max_distance
+        rows, distances = rows[keep], distances[keep]
+        # The first occurrence of every page in the ranking is its best hit
+        pages, first, counts = np.unique(np.asarray(self.row_pages)[rows], return_index=True, return_counts=True)
+        order = np.argsort(first)[:top_n]
+        hits = []
+        for position, count in zip(first[order], counts[order]):
+            hit = self.record(int(rows[position]))
+            hit["_additional"] = {"distance": float(distances[position]), "count": int(count)}
+            hits.append(hit)
+        return hits
+
+    def search_hybrid(self, query, vector, company_names, top_n=15, alpha=0.5, fusion=FUSION_RANKED):
+        """
+        Search the index with BM25 and a query embedding, fusing both rankings (see fuse_rankings).
+
+        Each ranking contributes its best max(top_n, HYBRID_CANDIDATES) rows. The vector
+        ranking is skipped for alpha 0 (vector may then be None), BM25 for alpha 1.
+        """
+        candidates = max(top_n, HYBRID_CANDIDATES)
+        vector_ranking, keyword_ranking = [], []
+        if alpha > 0:
+            rows, distances = self.rank_vector(vector, company_names, candidates)
+            vector_ranking = list(zip(rows.tolist(), (1.0 - distances).tolist()))
+        if alpha < 1:
+            rows, scores = self.rank_keywords(query, company_names, candidates)
+            keyword_ranking = list(zip(rows.tolist(), scores.tolist()))
+
+        hits = []
+        for row, score in fuse_rankings(vector_ranking, keyword_ranking, alpha, fusion)[:top_n]:
+            hit = self.record(row)
+            hit["_additional"] = {"score": score}
+            hits.append(hit)
+        return hits
+
+    def is_hybrid(self, alpha):
+        if alpha is None:
+            return False
+        if not self.has_keyword_index:
+            print(f"Local index {self.index_dir} has no BM25 index, searching vectors only; rebuild it for hybrid search")
+            return False
+        return True
+
+    def search(self, query, company_names, top_n=15, max_distance=999.0, class_name='SECSavvyNOW', alpha=None, fusion=FUSION_RANKED,
+               group_by_page=False):
+        return self.search_many([(query, company_names)], top_n, max_distance, class_name, alpha, fusion, group_by_page)[0]
+
+    def search_many(self, queries, top_n=10, max_distance=999.0, class_name='SECSavvyNOW', alpha=None, fusion=FUSION_RANKED,
+                    group_by_page=False):
+        if not self.is_hybrid(alpha):
+            # Embed all queries in one batch through the embedding cache
+            vectors = self.embedding_cache.embed_queries([query for query, _ in queries])
+            search_vector = self.search_pages if group_by_page else self.search_vector
+            results = [search_vector(vector, company_names, top_n, max_distance)
+                       for vector, (_, company_names) in zip(vectors, queries)]
+        else:
+            # BM25-only searches (alpha 0) need no query embeddings
+            vectors = self.embedding_cache.embed_queries([query for query, _ in queries]) if alpha > 0 else [None] * len(queries)
+            # Fused rankings are grouped from the candidate pool
+            candidates = top_n * GROUP_OVERSAMPLING if group_by_page else top_n
+            results = [self.search_hybrid(query, vector, company_names, candidates, alpha, fusion)
+                       for vector, (query, company_names) in zip(vectors, queries)]
+            if group_by_page:
+                results = [group_hits(hits, top_n) for hits in results]
+
+        if not group_by_page:
+            return attach_pages(results, self.fetch_pages) if self.has_page_store else results
+        if self.has_page_store:
+            results = attach_pages(results, lambda page_ids: self.fetch_pages(page_ids, ["sectionPage"]))
+        return page_hits(results)
+
+
+def build_local_index(records: Iterable[Dict[str, Any]],
+                      embed_documents_fn: Callable[[List[str]], List[List[float]]],
+                      index_dir: str = DEFAULT_INDEX_DIR,
+                      batch_size: int = 96,
+                      min_chunk_charactre: int = 20) -> int:
+    """
+    Build a LocalVectorIndex from expanded records (the output of process_and_expand_json_data).
+    Every distinct page is written once to the pages file, rows only hold its pageId.
+
+    Records are streamed: they are spooled to a temporary file, and every embedding
+    batch is written straight into the memory-mapped embeddings matrix, so memory
+    does not grow with the size of the corpus text or of its embeddings.
+
+    Args:
+        records (Iterable of dict): Expanded records with at least the RETRIEVAL_PROPERTIES.
+        embed_documents_fn (Callable): Embeds a list of chunk texts (e.g. cohere_embeddings.embed_documents).
+        index_dir (str, optional): Output directory. Defaults to DEFAULT_INDEX_DIR.
+        batch_size (int, optional): Number of chunks per embedding call. Defaults to 96.
+        min_chunk_charactre (int, optional): Chunks shorter than this are skipped, as in the Weaviate import. Defaults to 20.
+
+    Returns:
+        int: Number of rows in the index.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    with tempfile.TemporaryFile(dir=index_dir) as spool:
+        # Group rows by company so every company is a contiguous row range; only spool offsets are kept
+        by_company = {}
+        for record in records:
+            if len(record["chunk"]) < min_chunk_charactre:
+                continue
+            properties = {name: str(record.get(name, "")) for name in RETRIEVAL_PROPERTIES}
+            by_company.setdefault(properties["companyName"], []).append(spool.tell())
+            spool.write(json.dumps(properties).encode("utf-8") + b"\n")
+        rows = sum(len(spool_offsets) for spool_offsets in by_company.values())
+
+        def spooled(spool_offsets):
+            for spool_offset in spool_offsets:
+                spool.seek(spool_offset)
+                yield json.loads(spool.readline())
+
+        company_ranges = {}
+        offsets = np.zeros(rows, dtype=np.int64)
+        row_pages = np.zeros(rows, dtype=np.int64)
+        # Page content address -> page row
+        page_rows = {}
+        page_offsets = []
+        matrix = None
+        row = 0
+        with open(os.path.join(index_dir, "records.jsonl"), "wb") as f, open(os.path.join(index_dir, "pages.jsonl"), "wb") as pages:
+            for company_name, spool_offsets in by_company.items():
+                company_ranges[company_name] = [row, row + len(spool_offsets)]
+                for start in range(0, len(spool_offsets), batch_size):
+                    batch = list(spooled(spool_offsets[start:start + batch_size]))
+                    vectors = np.asarray(embed_documents_fn([properties["chunk"] for properties in batch]), dtype=np.float32)
+                    if matrix is None:
+                        # The first batch gives the embedding dimension
+                        matrix = np.lib.format.open_memmap(os.path.join(index_dir, "embeddings.npy"), mode="w+",
+                                                           dtype=np.float32, shape=(rows, vectors.shape[1]))
+                    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                    matrix[row:row + len(batch)] = vectors / np.where(norms == 0, 1, norms)
+                    for properties in batch:
+                        page = {name: properties[name] for name in PAGE_PROPERTIES}
+                        key = page_id(properties["filingUrl"], page["sectionPage"], page["sectionSummary"])
+                        if key not in page_rows:
+                            page_rows[key] = len(page_offsets)
+                            page_offsets.append(pages.tell())
+                            pages.write(json.dumps(page).encode("utf-8") + b"\n")
+                        reference = {name: properties[name] for name in PAGE_REFERENCE_PROPERTIES if name != "pageId"}
+                        reference["pageId"] = page_rows[key]
+                        row_pages[row] = page_rows[key]
+                        offsets[row] = f.tell()
+                        f.write(json.dumps(reference).encode("utf-8") + b"\n")
+                        row += 1
+
+        if matrix is None:
+            np.save(os.path.join(index_dir, "embeddings.npy"), np.zeros((0, 0), dtype=np.float32))
+        else:
+            matrix.flush()
+            del matrix
+        np.save(os.path.join(index_dir, "offsets.npy"), offsets)
+        np.save(os.path.join(index_dir, "page_offsets.npy"), np.asarray(page_offsets, dtype=np.int64))
+        np.save(os.path.join(index_dir, "row_pages.npy"), row_pages)
+        with open(os.path.join(index_dir, "companies.json"), "w") as f:
+            json.dump(company_ranges, f, indent=4)
+
+        # Searchable texts are read back from the spool in row order
+        build_keyword_index((" ".join(properties[name] for name in KEYWORD_PROPERTIES)
+                             for spool_offsets in by_company.values() for properties in spooled(spool_offsets)), index_dir)
+
+    return rows
+
+
+def build_keyword_index(texts: Iterable[str], index_dir: str = DEFAULT_INDEX_DIR) -> None:
+    """
+    Write the BM25 files of a LocalVectorIndex.
+
+    Args:
+        texts (Iterable of str): The searchable text of every row, in row order.
+        index_dir (str, optional): Index directory. Defaults to DEFAULT_INDEX_DIR.
+    """
+    # term -> rows (in ascending order) and term frequencies
+    postings = {}
+    lengths = []
+    for row, text in enumerate(texts):
+        tokens = tokenize(text)
+        for term, frequency in Counter(tokens).items():
+            term_rows, frequencies = postings.setdefault(term, ([], []))
+            term_rows.append(row)
+            frequencies.append(frequency)
+        lengths.append(len(tokens))
+
+    terms = {}
+    start = 0
+    for term, (term_rows, _) in postings.items():
+        terms[term] = [start, start + len(term_rows)]
+        start += len(term_rows)
+    np.save(os.path.join(index_dir, "bm25_postings.npy"),
+            np.asarray([r for term_rows, _ in postings.values() for r in term_rows], dtype=np.int32))
+    np.save(os.path.join(index_dir, "bm25_frequencies.npy"),
+            np.asarray([n for _, frequencies in postings.values() for n in frequencies], dtype=np.int32))
+    np.save(os.path.join(index_dir, "bm25_lengths.npy"), np.asarray(lengths, dtype=np.int32))
+    with open(os.path.join(index_dir, "bm25_terms.json"), "w") as f:
+        json.dump(terms, f)
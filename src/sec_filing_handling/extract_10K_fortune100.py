@@ -1,21 +1,45 @@
 import json
 import openai
-import re
+import sys
 from sec_api import ExtractorApi
 
+from extraction_engine import clean_section_text, extract_filings, generate_section
+
 extractorApi = ExtractorApi(
     '')
 
-
-# Function to generate a section
-def generate_section(section_type, section_heading, section_text):
-  return {
-      "SectionType": section_type,
-      "SectionHeading": section_heading,
-      "sectionSummary": "",
-      "raw": section_text,
-      "chunks": []
-  }
+SECTION_INFO = [
+    ("1", "Business"),
+    ("1A", "Risk Factors"),
+    ("1B", "Unresolved Staff Comments"),
+    ("2", "Properties"),
+    ("3", "Legal Proceedings"),
+    ("4", "Mine Safety Disclosures"),
+    ("5",
+     "Market for Registrant's Common Equity, Related Stockholder Matters and Issuer Purchases of Equity Securities"
+     ),
+    ("6", "Selected Financial Data"),
+    ("7",
+     "Management's Discussion and Analysis of Financial Condition and Results of Operations"
+     ),
+    ("7A", "Quantitative and Qualitative Disclosures About Market Risk"),
+    ("8", "Financial Statements and Supplementary Data"),
+    ("9",
+     "Changes in and Disagreements With Accountants on Accounting and Financial Disclosure"
+     ),
+    ("9A", "Controls and Procedures"),
+    ("9B", "Other Information"),
+    ("10", "Directors, Executive Officers and Corporate Governance"),
+    ("11", "Executive Compensation"),
+    ("12",
+     "Security Ownership of Certain Beneficial Owners and Management and Related Stockholder Matters"
+     ),
+    ("13",
+     "Certain Relationships and Related Transactions, and Director Independence"
+     ),
+    ("14", "Principal Accountant Fees and Services"),
+    ("15", "Exhibits, Financial Statement Schedules"),
+]
 
 
 # Function to generate a company entry with multiple sections
@@ -25,42 +49,10 @@ def generate_company_entry(company_name,
                            filing,
                            num_sections=2):
   sections = []
-  section_info = [
-      ("1", "Business"),
-      ("1A", "Risk Factors"),
-      ("1B", "Unresolved Staff Comments"),
-      ("2", "Properties"),
-      ("3", "Legal Proceedings"),
-      ("4", "Mine Safety Disclosures"),
-      ("5",
-       "Market for Registrant's Common Equity, Related Stockholder Matters and Issuer Purchases of Equity Securities"
-       ),
-      ("6", "Selected Financial Data"),
-      ("7",
-       "Management's Discussion and Analysis of Financial Condition and Results of Operations"
-       ),
-      ("7A", "Quantitative and Qualitative Disclosures About Market Risk"),
-      ("8", "Financial Statements and Supplementary Data"),
-      ("9",
-       "Changes in and Disagreements With Accountants on Accounting and Financial Disclosure"
-       ),
-      ("9A", "Controls and Procedures"),
-      ("9B", "Other Information"),
-      ("10", "Directors, Executive Officers and Corporate Governance"),
-      ("11", "Executive Compensation"),
-      ("12",
-       "Security Ownership of Certain Beneficial Owners and Management and Related Stockholder Matters"
-       ),
-      ("13",
-       "Certain Relationships and Related Transactions, and Director Independence"
-       ),
-      ("14", "Principal Accountant Fees and Services"),
-      ("15", "Exhibits, Financial Statement Schedules"),
-  ]
 
-  for section_id, section_heading in section_info:
+  for section_id, section_heading in SECTION_INFO:
     section_text = extractorApi.get_section(filing_url, section_id, "text")
-    cleaned_section = re.sub(r"\n|&#[0-9]+;", "", section_text)
+    cleaned_section = clean_section_text(section_text)
     sections.append(
         generate_section(section_id, section_heading, cleaned_section))
 
@@ -73,35 +65,27 @@ def generate_company_entry(company_name,
   }
 
 
-file_path = "../../data/filing_urls_10K_fortune100.json"  # Replace with the actual path to your file
-
-# Read the JSON data from the file
-with open(file_path, 'r') as file:
-  json_data = json.load(file)
-
-# Loop through each entry in the JSON data
-for entry in json_data:
-  company_name = entry.get("companyName", "N/A")
-  ticker = entry.get("ticker", "N/A")
-  filing_details_link = entry.get("linkToFilingDetails", "N/A")
-  form_type = entry.get("formType", "N/A")
-  filed_at = entry.get("filedAt", "N/A")
-
-  # Generate JSON data with user-input company name and filing URL
-  company_entry = generate_company_entry(company_name, filing_details_link,
-                                         filed_at, form_type)
-
-  # Convert the dictionary to a JSON-formatted string
-  json_data = json.dumps([company_entry], indent=2)
-
-  # Print the result
-  #print(json_data)
-  # Specify the file path
-  file_path = "../../data/fortune100_10K_2023/" + ticker + "_" + filed_at + "_" + form_type + ".json"
-
-  # Write data to the JSON file
-  with open(file_path, 'w') as json_file:
-    json_file.write(json_data)
-
-  print(f"Data has been written to {file_path}.")
-print("All data generation complete")
+# ########################################################################
+# Extracts every filing in the URL list with the shared extraction engine.
+# Interrupted runs resume from the checkpoint manifest in the output folder.
+# Usage:
+# > python3 extract_10K_fortune100.py [max_workers] [requests_per_second]
+# ########################################################################
+if __name__ == "__main__":
+  file_path = "../../data/filing_urls_10K_fortune100.json"  # Replace with the actual path to your file
+
+  # Read the JSON data from the file
+  with open(file_path, 'r') as file:
+    json_data = json.load(file)
+
+  max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+  requests_per_second = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+  summary = extract_filings(json_data,
+                            SECTION_INFO,
+                            extractorApi,
+                            "../../data/fortune100_10K_2023/",
+                            max_workers=max_workers,
+                            requests_per_second=requests_per_second)
+  print(summary)
+  print("All data generation complete")
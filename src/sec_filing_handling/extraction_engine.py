@@ -0,0 +1,216 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+
+# Function to generate a section
+def generate_section(section_type, section_heading, section_text):
+  return {
+      "SectionType": section_type,
+      "SectionHeading": section_heading,
+      "sectionSummary": "",
+      "raw": section_text,
+      "chunks": []
+  }
+
+
+# Function to clean the text returned by the extractor
+def clean_section_text(section_text):
+  return re.sub(r"\n|&#[0-9]+;", "", section_text)
+
+
+# Output file name of a filing, as used by the extract scripts
+def filing_file_name(entry):
+  return entry.get("ticker", "N/A") + "_" + entry.get("filedAt", "N/A") + "_" + entry.get("formType", "N/A") + ".json"
+
+
+class HostRateLimiter:
+  """
+  Spaces out requests to the same host to at most `requests_per_second`.
+  """
+
+  def __init__(self, requests_per_second, sleep=time.sleep):
+    self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+    self.sleep = sleep
+    self._next_slot = {}
+    self._lock = threading.Lock()
+
+  def acquire(self, host):
+    with self._lock:
+      now = time.monotonic()
+      slot = max(now, self._next_slot.get(host, now))
+      self._next_slot[host] = slot + self.interval
+    if slot > now:
+      self.sleep(slot - now)
+
+
+class CheckpointManifest:
+  """
+  Append-only JSON lines log of extracted sections and written filings.
+
+  Every fetched section is recorded as soon as it arrives, so an interrupted run
+  resumes at the next missing section instead of starting the filing over.
+  """
+
+  def __init__(self, path):
+    self.path = path
+    self.sections = {}
+    self.filings = {}
+    self._lock = threading.Lock()
+    if os.path.exists(path):
+      with open(path) as f:
+        for line in f:
+          try:
+            record = json.loads(line)
+          except json.JSONDecodeError:
+            # A partially written last line from an interrupted run
+            continue
+          if record["type"] == "section":
+            self.sections[(record["filingUrl"], record["section"])] = record["text"]
+          elif record["type"] == "filing":
+            self.filings[record["filingUrl"]] = record["output"]
+    if os.path.dirname(path):
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+    self._file = open(path, "a")
+
+  def _append(self, record):
+    with self._lock:
+      self._file.write(json.dumps(record) + "\n")
+      self._file.flush()
+
+  def get_section(self, filing_url, section_id):
+    return self.sections.get((filing_url, section_id))
+
+  def record_section(self, filing_url, section_id, text):
+    self.sections[(filing_url, section_id)] = text
+    self._append({"type": "section", "filingUrl": filing_url, "section": section_id, "text": text})
+
+  def is_filing_done(self, filing_url):
+    return filing_url in self.filings
+
+  def record_filing(self, filing_url, output_path):
+    self.filings[filing_url] = output_path
+    self._append({"type": "filing", "filingUrl": filing_url, "output": output_path})
+
+  def close(self):
+    self._file.close()
+
+
+# Function to call `fn` with exponential backoff and jitter between attempts
+def call_with_retries(fn, retries=4, backoff=1.0, max_backoff=30.0, sleep=time.sleep):
+  for attempt in range(retries + 1):
+    try:
+      return fn()
+    except Exception as e:
+      if attempt == retries:
+        raise
+      delay = min(max_backoff, backoff * 2**attempt) * (0.5 + random.random() / 2)
+      print(f"Attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s")
+      sleep(delay)
+
+
+def extract_filings(entries,
+                    section_info,
+                    extractor,
+                    output_dir,
+                    manifest_path=None,
+                    max_workers=8,
+                    requests_per_second=5.0,
+                    retries=4,
+                    backoff=1.0,
+                    sleep=time.sleep):
+  """
+  Extract the sections of many filings with a bounded worker pool.
+
+  Sections of all filings share one pool; requests are rate limited per extractor
+  host and retried with backoff. Each filing is written as soon as all of its
+  sections are available, in the same format as generate_company_entry.
+
+  Args:
+    entries: Filing entries (companyName, ticker, linkToFilingDetails, formType, filedAt).
+    section_info: (section id, section heading) pairs to extract for every filing.
+    extractor: Object with get_section(filing_url, section_id, return_type), e.g. sec_api.ExtractorApi.
+    output_dir: Directory the filing JSONs are written to.
+    manifest_path: Checkpoint manifest path. Defaults to extraction_manifest.jsonl in output_dir.
+    max_workers: Maximum number of concurrent extractor requests.
+    requests_per_second: Maximum request rate per extractor host.
+    retries: Retries per section after the first failed attempt.
+    backoff: Initial backoff in seconds, doubled after every failed attempt.
+
+  Returns:
+    dict: Counts of written, skipped and failed filings and of fetched and resumed sections.
+  """
+  manifest = CheckpointManifest(manifest_path or os.path.join(output_dir, "extraction_manifest.jsonl"))
+  limiter = HostRateLimiter(requests_per_second, sleep=sleep)
+  host = urlparse(getattr(extractor, "api_endpoint", "")).netloc or "default"
+  summary = {"written": 0, "skipped": 0, "failed": 0, "sections_fetched": 0, "sections_resumed": 0}
+
+  def fetch(filing_url, section_id):
+    def request():
+      limiter.acquire(host)
+      return extractor.get_section(filing_url, section_id, "text")
+    return clean_section_text(call_with_retries(request, retries=retries, backoff=backoff, sleep=sleep))
+
+  def write_filing(entry):
+    filing_url = entry.get("linkToFilingDetails", "N/A")
+    sections = [
+        generate_section(section_id, section_heading, manifest.get_section(filing_url, section_id))
+        for section_id, section_heading in section_info
+    ]
+    company_entry = {
+        "companyName": entry.get("companyName", "N/A"),
+        "filingUrl": filing_url,
+        "Quarter": entry.get("filedAt", "N/A"),
+        "Filing": entry.get("formType", "N/A"),
+        "sections": sections
+    }
+    output_path = os.path.join(output_dir, filing_file_name(entry))
+    with open(output_path, "w") as json_file:
+      json_file.write(json.dumps([company_entry], indent=2))
+    manifest.record_filing(filing_url, output_path)
+    summary["written"] += 1
+    print(f"Data has been written to {output_path}.")
+
+  os.makedirs(output_dir, exist_ok=True)
+  remaining = {}
+  failed = set()
+  executor = ThreadPoolExecutor(max_workers=max_workers)
+  try:
+    futures = {}
+    for entry in entries:
+      filing_url = entry.get("linkToFilingDetails", "N/A")
+      if manifest.is_filing_done(filing_url):
+        summary["skipped"] += 1
+        continue
+      missing = [section_id for section_id, _ in section_info if manifest.get_section(filing_url, section_id) is None]
+      summary["sections_resumed"] += len(section_info) - len(missing)
+      if not missing:
+        write_filing(entry)
+        continue
+      remaining[filing_url] = [entry, len(missing)]
+      for section_id in missing:
+        futures[executor.submit(fetch, filing_url, section_id)] = (filing_url, section_id)
+
+    for future in as_completed(futures):
+      filing_url, section_id = futures[future]
+      entry = remaining[filing_url][0]
+      try:
+        manifest.record_section(filing_url, section_id, future.result())
+        summary["sections_fetched"] += 1
+      except Exception as e:
+        print(f"Failed to extract section {section_id} of {filing_url}: {e}")
+        failed.add(filing_url)
+      remaining[filing_url][1] -= 1
+      if remaining[filing_url][1] == 0 and filing_url not in failed:
+        write_filing(entry)
+  finally:
+    executor.shutdown(wait=True)
+    manifest.close()
+
+  summary["failed"] = len(failed)
+  return summary
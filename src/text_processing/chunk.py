@@ -8,6 +8,7 @@
 
 # import libraries
 import copy
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from itertools import chain
 import json
@@ -17,9 +18,8 @@ import os
 import pathlib
 import re
 import requests
-import spacy
-from spacy.lang.en import English
 import sys
+import threading
 import time
 import warnings
 
@@ -28,30 +28,88 @@ import warnings
 utils = os.path.join(pathlib.Path(__file__).parent.parent.resolve(),"utils")
 sys.path.insert(1, utils)
 from chunking_utils import *
+from completion_cache import DEFAULT_COMPLETION_CACHE_PATH, CompletionCache
+from llm_pool import CompletionClient, RateLimiter, map_ordered
+from segmentation import get_segmenter, segment_sections
 
 
 # global setup
-nlp = spacy.load('en_core_web_sm')
-
+# The secrets file is read, and the clients built, on first use: importing this module is cheap
 secrets = {}
 secrets_file = 'hackathon_secrets'
-with open(secrets_file) as f:
-	secrets = json.load(f)
-exit()
+
+def get_secrets():
+	if not secrets:
+		with open(secrets_file) as f:
+			secrets.update(json.load(f))
+	return secrets
 
 
 # GPT summarization
+endpoint = "xxxxxxxx"
+deployment = "xxxxxxxx"
+
+# Pages (and page-level requests) processed concurrently; the limiter bounds the actual requests.
+# None reads LLM_MAX_WORKERS / SECTION_MAX_WORKERS from the secrets file
+LLM_MAX_WORKERS = None
+SECTION_MAX_WORKERS = None
+
+# Shared by every summarisation thread of the process; assign to inject another instance
+completion_client = None
+completion_cache = None
+segmenter = None
+_init_lock = threading.Lock()
+
+
+def get_setting(name, default):
+	value = globals()[name]
+	return int(value if value is not None else get_secrets().get(name, default))
+
+
+def get_completion_client():
+	# One client and one limiter shared by every summarisation thread of the process
+	global completion_client
+	with _init_lock:
+		if completion_client is None:
+			completion_client = CompletionClient(
+				lambda: AzureOpenAI(
+					api_key = get_secrets()["OPEN_API_KEY"],
+					api_version="2023-03-15-preview",
+					azure_endpoint=endpoint,
+					max_retries=0  # Retries are handled by CompletionClient
+				),
+				limiter=RateLimiter(
+					max_concurrency=int(get_secrets().get("LLM_MAX_CONCURRENCY", 8)),
+					tokens_per_minute=int(get_secrets().get("LLM_TOKENS_PER_MINUTE", 120000))
+				)
+			)
+		return completion_client
+
+
+def get_completion_cache():
+	# Completions of identical (model, prompt, page text) are reused across runs
+	global completion_cache
+	with _init_lock:
+		if completion_cache is None:
+			completion_cache = CompletionCache(
+				get_secrets().get("COMPLETION_CACHE_PATH", DEFAULT_COMPLETION_CACHE_PATH),
+				max_bytes=int(get_secrets().get("COMPLETION_CACHE_MAX_MB", 512)) * 1024 * 1024
+			)
+		return completion_cache
+
+
+def get_segmenter_instance():
+	# Sentence segmentation backend (full, senter, sentencizer or regex), see segmentation.py
+	global segmenter
+	with _init_lock:
+		if segmenter is None:
+			segmenter = get_segmenter(get_secrets().get("SEGMENTATION_BACKEND", "senter"),
+									  n_process=int(get_secrets().get("SEGMENTATION_N_PROCESS", 1)))
+		return segmenter
+
 def call_chatGpt(prompt, context):
-	endpoint = "xxxxxxxx"    
-	
-	client = AzureOpenAI(
-		api_key = secrets["OPEN_API_KEY"],
-		api_version="2023-03-15-preview",
-		azure_endpoint=endpoint
-	)
-	
-	response = client.chat.completions.create(
-		model = "xxxxxxxx",
+	response = get_completion_client().create(
+		model = deployment,
 		messages=[
 			{"role":"system", "content":"{}".format(prompt)},
 			{"role":"user", "content": "{}".format(context)}
@@ -59,22 +117,16 @@ def call_chatGpt(prompt, context):
 	
 	return response
 
-def segment_text(text):
-	pages = [[]]
-	page_total_words = 0
-
-	sentences = nlp(text)
-
-	for sentence in sentences.sents:
-		page_total_words += len(sentence.text.split(" "))
-
-		if page_total_words > 2000:
-			pages.append([])
-			page_total_words = len(sentence.text.split(" "))
+def call_chatGpt_cached(prompt, context):
+	# Content of the completion, from the completion cache when available
+	def complete(prompt, context):
+		return call_chatGpt(prompt, context).choices[0].message.content
 
-		pages[len(pages)-1].append(sentence.text)
+	return get_completion_cache().complete(f"{deployment}@2023-03-15-preview", prompt, context, complete)
 
-	return pages
+def segment_text(text):
+	# Sentences packed into pages of up to 2000 words
+	return segment_sections([text], get_segmenter_instance())[0]
 
 
 def truncate_words(text, cap):
@@ -90,40 +142,34 @@ def truncate_words(text, cap):
 
 def summarize_text(text):
 	prompt = "Summarize the following 10-K report section in no more than 250 words:"
-	response = call_chatGpt(prompt, text)
-	return response.choices[0].message.content
+	return call_chatGpt_cached(prompt, text)
 
 
 def get_page_summaries(pages):
-	page_summaries = []
-
-	for chunks in pages:
+	# Pages are summarized concurrently, in page order
+	def summarize_page(chunks):
 		long_summary = truncate_words(" ".join(chunks), 2000)
-		page_summary = summarize_text(long_summary)
-		page_summaries.append(page_summary)
+		return summarize_text(long_summary)
 
-	return page_summaries
+	return map_ordered(summarize_page, pages, get_setting("LLM_MAX_WORKERS", 8))
 
 def extract_key_points(text):
 	prompt = "Extract the 5 most important segments from this financal report. Limit each segment to 100 words. "
-	response = call_chatGpt(prompt, text)
-	content = response.choices[0].message.content
-	return content
+	return call_chatGpt_cached(prompt, text)
 
 def process_key_points(pages):
-	key_points = []
-
-	for chunks in pages:
+	# Key points of every page, extracted concurrently, in page order
+	def page_key_points(chunks):
 		long_summary = truncate_words(" ".join(chunks), 2000)
 		response = extract_key_points(long_summary)
 		if response is not None:
 			split_response = response.split("\n")
-			points = [p for p in split_response if len(p.strip()) > 0]
-			key_points.append(points)
-			return key_points
+			return [p for p in split_response if len(p.strip()) > 0]
 		else:
 			print("Failed to generate key points")
-			return ''
+			return []
+
+	return map_ordered(page_key_points, pages, get_setting("LLM_MAX_WORKERS", 8))
 
 
 def print_time():
@@ -132,10 +178,27 @@ def print_time():
 	print("Current Time =", current_time)
 
 
-def process(text):
+def get_chunk_offsets(pages):
+	# page index and character offset of every chunk within the joined page text
+	chunk_pages = []
+	chunk_offsets = []
+
+	for page_index, chunks in enumerate(pages):
+		offset = 0
+		for chunk in chunks:
+			chunk_pages.append(page_index)
+			chunk_offsets.append(offset)
+			offset += len(chunk) + 1
+
+	return chunk_pages, chunk_offsets
+
+
+def process(text, pages=None):
 	response = {
 		"pages": [],
 		"chunks": [],
+		"chunkPages": [],
+		"chunkOffsets": [],
 		"sectionSummary": "",
 		"pageSummaries": []
 	}
@@ -144,17 +207,27 @@ def process(text):
 	if len(text) < 100:
 		response["pages"] = [ text ]
 		response["chunks"] = [ text ]
+		response["chunkPages"] = [ 0 ]
+		response["chunkOffsets"] = [ 0 ]
 		response["sectionSummary"] = [ text ]
 		response["keyPoints"] = []
 		return response
 		
-	pages = segment_text(text)
+	# Pages may be segmented beforehand, with all the sections of a filing in one batch
+	if pages is None:
+		pages = segment_text(text)
 	chunks = list(chain.from_iterable(pages))
-	summaries = get_page_summaries(pages)
-	section_summary = summarize_text(truncate_words(" ".join(summaries), 5500))
-	key_points = process_key_points(pages)
+	chunk_pages, chunk_offsets = get_chunk_offsets(pages)
+	# Key points do not depend on the summaries: run both page-level stages together
+	with ThreadPoolExecutor(max_workers=2) as executor:
+		key_points_future = executor.submit(process_key_points, pages)
+		summaries = get_page_summaries(pages)
+		section_summary = summarize_text(truncate_words(" ".join(summaries), 5500))
+		key_points = key_points_future.result()
 
 	response["chunks"] = chunks
+	response["chunkPages"] = chunk_pages
+	response["chunkOffsets"] = chunk_offsets
 	response["pages"] = [ " ".join(chunk) for chunk in pages]
 	response["pageSummaries"] = summaries
 	response["sectionSummary"] = section_summary
@@ -163,8 +236,33 @@ def process(text):
 
 
 
+def chunk_filing_file(in_path, out_path, file):
+	# Chunks and summarizes every section of a filing JSON and exports it to out_path
+	filing = load_filing(in_path, file)
+	sections = [section for f in filing for section in f["sections"]]
+	# All sections are segmented in one batch, then processed concurrently; responses come back in section order
+	section_pages = segment_sections([section["raw"] for section in sections], get_segmenter_instance())
+	responses = map_ordered(lambda item: process(item[0]["raw"], item[1]), list(zip(sections, section_pages)), get_setting("SECTION_MAX_WORKERS", 4))
+	for section, response in zip(sections, responses):
+		section["chunks"] = response["chunks"]        
+		section["chunkPages"] = response["chunkPages"]
+		section["chunkOffsets"] = response["chunkOffsets"]
+		section["pages"] = response["pages"]
+		section["pageSummaries"] = response["pageSummaries"]
+		section["sectionSummary"] = response["sectionSummary"]
+		section["keyPoints"] = response["keyPoints"]
+		print("finished section {}".format(section["SectionType"]))
+
+	os.makedirs(out_path, exist_ok=True)
+	export(out_path, file, filing)
+	print("finished filing {}".format(file))
+	print("completion cache: {}".format(get_completion_cache().stats()))
+	return {"sections": len(sections)}
+
+
 # ########################################################################
-# Takes a path rather than walking a directory for simple parallelization.
+# Takes a path to a file list. To chunk a whole directory in parallel use:
+# > python3 ./src/ingest.py chunk data/fortune100_10K_2023
 # Usage: 
 # > python3 ./chunk/chunk.py path_to_filelist
 # ########################################################################
@@ -177,19 +275,4 @@ if __name__ == "__main__":
 	out_path = in_path.replace("data", "output")	
 	for file in files:
 		print_time()
-		filing = load_filing(in_path, file)
-		for f in filing:
-			for section in f["sections"]:
-				response = process(section["raw"])
-				section["chunks"] = response["chunks"]        
-				section["pages"] = response["pages"]
-				section["pageSummaries"] = response["pageSummaries"]
-				section["sectionSummary"] = response["sectionSummary"]
-				section["keyPoints"] = response["keyPoints"]
-				print("finished section {}".format(section["SectionType"]))
-
-		export(out_path, file, filing)
-		print("finished filing {}".format(file))
-
-
-
+		chunk_filing_file(in_path, out_path, file)
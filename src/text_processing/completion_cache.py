@@ -0,0 +1,106 @@
+# #####################################################################################
+# Persistent, content-addressed cache of LLM completions.
+# Keys are the hash of (model, prompt, text), so re-chunking identical pages,
+# e.g. boilerplate repeated across quarters, costs no completion calls.
+#
+# #####################################################################################
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Default location of the cache, relative to the repository root
+DEFAULT_COMPLETION_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "cache", "completions.sqlite")
+
+
+def completion_key(model, prompt, text):
+	return hashlib.sha256(json.dumps([model, prompt, text]).encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+	"""
+	SQLite store of completions with least-recently-used eviction above `max_bytes`.
+
+	Safe to share between the threads of a process and, through SQLite's own
+	locking, between the processes of the ingest driver.
+	"""
+	def __init__(self, path, max_bytes=512 * 1024 * 1024):
+		self.path = path
+		self.max_bytes = max_bytes
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self._lock = threading.Lock()
+		if os.path.dirname(path):
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+		self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+		self._conn.execute("PRAGMA journal_mode=WAL")
+		self._conn.execute("CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, completion TEXT, size INTEGER, last_access REAL)")
+		self._conn.execute("CREATE INDEX IF NOT EXISTS completions_last_access ON completions (last_access)")
+		self._conn.commit()
+		self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+
+	def get(self, model, prompt, text):
+		"""
+		Return the cached completion, or None on a miss.
+		"""
+		key = completion_key(model, prompt, text)
+		with self._lock:
+			row = self._conn.execute("SELECT completion FROM completions WHERE key = ?", (key,)).fetchone()
+			if row is None:
+				self.misses += 1
+				return None
+			self.hits += 1
+			self._conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (time.time(), key))
+			self._conn.commit()
+			return row[0]
+
+	def set(self, model, prompt, text, completion):
+		key = completion_key(model, prompt, text)
+		size = len(completion.encode("utf-8"))
+		with self._lock:
+			old = self._conn.execute("SELECT size FROM completions WHERE key = ?", (key,)).fetchone()
+			self._conn.execute("INSERT OR REPLACE INTO completions (key, completion, size, last_access) VALUES (?, ?, ?, ?)",
+							   (key, completion, size, time.time()))
+			self._total += size - (old[0] if old else 0)
+			if self._total > self.max_bytes:
+				self._evict()
+			self._conn.commit()
+
+	def _evict(self):
+		# Other processes may have written too: start from the stored total
+		total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+		while total > self.max_bytes:
+			rows = self._conn.execute("SELECT key, size FROM completions ORDER BY last_access LIMIT 100").fetchall()
+			if not rows:
+				break
+			for key, size in rows:
+				if total <= self.max_bytes:
+					break
+				self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+				total -= size
+				self.evictions += 1
+		self._total = total
+
+	def complete(self, model, prompt, text, complete_fn):
+		"""
+		Return the cached completion of (model, prompt, text), calling complete_fn(prompt, text) on a miss.
+		Empty completions (failed calls) are not cached.
+		"""
+		completion = self.get(model, prompt, text)
+		if completion is None:
+			completion = complete_fn(prompt, text)
+			if completion:
+				self.set(model, prompt, text, completion)
+		return completion
+
+	def stats(self):
+		"""
+		Return the hit/miss/eviction counters of this process and the size of the cache.
+		"""
+		with self._lock:
+			entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+			return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": entries, "bytes": size}
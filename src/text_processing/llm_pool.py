@@ -0,0 +1,147 @@
+# #####################################################################################
+# Shared completion client for the summarisation stage.
+# One chat completions client per process, a global concurrency and token-rate
+# limiter, retries on rate limits and server errors, and an order-preserving
+# thread-pooled map.
+#
+# #####################################################################################
+
+from concurrent.futures import ThreadPoolExecutor
+import random
+import threading
+import time
+
+import openai
+
+
+class RateLimiter:
+	"""
+	Global limit on concurrent requests and on estimated tokens per minute.
+
+	Tokens are drawn from a bucket refilled continuously at tokens_per_minute / 60
+	per second, so bursts never exceed one minute's budget.
+	"""
+	def __init__(self, max_concurrency=8, tokens_per_minute=None, clock=time.monotonic, sleep=time.sleep):
+		self.max_concurrency = max_concurrency
+		self.tokens_per_minute = tokens_per_minute
+		self.clock = clock
+		self.sleep = sleep
+		self._slots = threading.BoundedSemaphore(max_concurrency)
+		self._lock = threading.Lock()
+		self._tokens = float(tokens_per_minute or 0)
+		self._updated = clock()
+
+	def _take_tokens(self, tokens):
+		if not self.tokens_per_minute:
+			return
+		# A single request larger than the budget waits for a full bucket
+		tokens = min(tokens, self.tokens_per_minute)
+		while True:
+			with self._lock:
+				now = self.clock()
+				self._tokens = min(self.tokens_per_minute, self._tokens + (now - self._updated) * self.tokens_per_minute / 60.0)
+				self._updated = now
+				if self._tokens >= tokens:
+					self._tokens -= tokens
+					return
+				wait = (tokens - self._tokens) * 60.0 / self.tokens_per_minute
+			self.sleep(wait)
+
+	def __call__(self, tokens=0):
+		return _Reservation(self, tokens)
+
+
+class _Reservation:
+	def __init__(self, limiter, tokens):
+		self.limiter = limiter
+		self.tokens = tokens
+
+	def __enter__(self):
+		self.limiter._take_tokens(self.tokens)
+		self.limiter._slots.acquire()
+		return self
+
+	def __exit__(self, *args):
+		self.limiter._slots.release()
+
+
+def estimate_tokens(messages, max_output_tokens=400):
+	# About 4 characters per token for English text, plus room for the completion
+	return sum(len(message["content"]) for message in messages) // 4 + max_output_tokens
+
+
+def is_retryable(e):
+	"""
+	Rate limits (429), server errors (5xx), timeouts and dropped connections are retried.
+	"""
+	if isinstance(e, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+		return True
+	return isinstance(e, openai.APIStatusError) and e.status_code >= 500
+
+
+def retry_after(e):
+	# Seconds requested by the server in a Retry-After header, if any
+	response = getattr(e, "response", None)
+	try:
+		return float(response.headers.get("retry-after"))
+	except (AttributeError, TypeError, ValueError):
+		return None
+
+
+class CompletionClient:
+	"""
+	Chat completions through one shared client, rate limited and retried.
+
+	The client is built on first use by `client_factory` (e.g. an AzureOpenAI
+	constructor with max_retries=0, as retries are handled here) and reused by
+	every thread.
+	"""
+	def __init__(self, client_factory, limiter=None, retries=5, backoff=1.0, max_backoff=60.0, sleep=time.sleep):
+		self.client_factory = client_factory
+		self.limiter = limiter or RateLimiter()
+		self.retries = retries
+		self.backoff = backoff
+		self.max_backoff = max_backoff
+		self.sleep = sleep
+		self._client = None
+		self._lock = threading.Lock()
+		self.calls = 0
+		self.retried = 0
+
+	@property
+	def client(self):
+		with self._lock:
+			if self._client is None:
+				self._client = self.client_factory()
+			return self._client
+
+	def create(self, **kwargs):
+		"""
+		Call chat.completions.create, retrying retryable errors with exponential backoff.
+		"""
+		tokens = estimate_tokens(kwargs.get("messages", []))
+		for attempt in range(self.retries + 1):
+			try:
+				with self.limiter(tokens):
+					with self._lock:
+						self.calls += 1
+					return self.client.chat.completions.create(**kwargs)
+			except Exception as e:
+				if attempt == self.retries or not is_retryable(e):
+					raise
+				delay = retry_after(e) or min(self.max_backoff, self.backoff * 2**attempt) * (0.5 + random.random() / 2)
+				with self._lock:
+					self.retried += 1
+				print(f"Completion attempt {attempt + 1} failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+				self.sleep(delay)
+
+
+def map_ordered(func, items, max_workers=8):
+	"""
+	Apply `func` to every item in a thread pool, returning the results in input order.
+	"""
+	items = list(items)
+	if len(items) <= 1:
+		return [func(item) for item in items]
+	with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+		return list(executor.map(func, items))
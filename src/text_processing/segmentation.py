@@ -0,0 +1,138 @@
+# #####################################################################################
+# Sentence segmentation and page packing for chunk.py.
+# Backends, fastest last to first:
+#   full:        en_core_web_sm with every component (the original pipeline)
+#   senter:      en_core_web_sm with only the statistical sentence recognizer
+#   sentencizer: rule-based spaCy sentencizer on a blank English pipeline
+#   regex:       punctuation and capitalisation rules, no spaCy
+# spaCy backends segment many sections at once with nlp.pipe (and n_process).
+#
+# #####################################################################################
+
+import re
+import threading
+
+PAGE_MAX_WORDS = 2000
+
+# Abbreviations that end with a period without ending the sentence
+ABBREVIATIONS = {"inc", "corp", "co", "ltd", "no", "nos", "mr", "ms", "mrs", "dr", "st", "vs", "etc",
+				 "u.s", "e.g", "i.e", "approx", "jan", "feb", "mar", "apr", "jun", "jul", "aug",
+				 "sep", "sept", "oct", "nov", "dec", "fig", "sec"}
+
+SENTENCE_END = re.compile(r'[.!?]["\')\]]*\s+(?=["\'(\[]?[A-Z0-9])')
+LAST_WORD = re.compile(r'(\S+?)[.!?]["\')\]]*\s*$')
+
+
+def count_words(sentence):
+	# Whitespace separated words, so leading or repeated spaces kept by some backends do not count
+	return len(sentence.split())
+
+
+def pack_pages(sentences, max_words=PAGE_MAX_WORDS):
+	"""
+	Pack sentences into pages of at most `max_words` words (a longer sentence is a page of its own).
+	Every sentence's word count is computed once.
+	"""
+	pages = [[]]
+	page_total_words = 0
+
+	for sentence in sentences:
+		words = count_words(sentence)
+		page_total_words += words
+
+		if page_total_words > max_words and pages[-1]:
+			pages.append([])
+			page_total_words = words
+
+		pages[-1].append(sentence)
+
+	return pages
+
+
+class RegexSegmenter:
+	"""
+	Splits after '.', '!' or '?' followed by whitespace and an upper-case letter or digit,
+	except after common abbreviations.
+	"""
+	def split(self, text):
+		sentences = []
+		start = 0
+		for match in SENTENCE_END.finditer(text):
+			last_word = LAST_WORD.search(text, start, match.end())
+			if last_word and last_word.group(1).lower() in ABBREVIATIONS:
+				continue
+			sentence = text[start:match.end()].strip()
+			if sentence:
+				sentences.append(sentence)
+			start = match.end()
+		if text[start:].strip():
+			sentences.append(text[start:].strip())
+		return sentences
+
+	def split_many(self, texts):
+		return [self.split(text) for text in texts]
+
+
+class SpacySegmenter:
+	"""
+	spaCy sentence segmentation; the pipeline is loaded on first use.
+	"""
+	def __init__(self, backend="senter", model="en_core_web_sm", n_process=1, batch_size=4):
+		self.backend = backend
+		self.model = model
+		self.n_process = n_process
+		self.batch_size = batch_size
+		self._nlp = None
+		self._lock = threading.Lock()
+
+	@property
+	def nlp(self):
+		with self._lock:
+			if self._nlp is None:
+				import spacy
+				if self.backend == "sentencizer":
+					nlp = spacy.blank("en")
+					nlp.add_pipe("sentencizer")
+				elif self.backend == "senter":
+					# Only the sentence recognizer, which is disabled by default in the trained pipelines
+					nlp = spacy.load(self.model, exclude=["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "ner"])
+					nlp.enable_pipe("senter")
+				else:
+					nlp = spacy.load(self.model)
+				nlp.max_length = max(nlp.max_length, 5000000)
+				self._nlp = nlp
+			return self._nlp
+
+	def split(self, text):
+		return self.split_many([text])[0]
+
+	def split_many(self, texts):
+		nlp = self.nlp
+		# A pipeline is not shared between threads concurrently; n_process forks workers instead
+		with self._lock:
+			docs = nlp.pipe(texts, batch_size=self.batch_size, n_process=self.n_process)
+			return [[sentence.text for sentence in doc.sents] for doc in docs]
+
+
+SEGMENTATION_BACKENDS = ["full", "senter", "sentencizer", "regex"]
+
+
+def get_segmenter(backend="senter", n_process=1):
+	"""
+	Build the segmenter of a backend (see SEGMENTATION_BACKENDS).
+	"""
+	if backend == "regex":
+		return RegexSegmenter()
+	if backend in SEGMENTATION_BACKENDS:
+		return SpacySegmenter(backend, n_process=n_process)
+	raise ValueError(f"Unknown segmentation backend '{backend}', expected one of {SEGMENTATION_BACKENDS}")
+
+
+def segment_sections(texts, segmenter, max_words=PAGE_MAX_WORDS):
+	"""
+	Segment many section texts at once and pack each one into pages.
+
+	Returns:
+		list: The pages (lists of sentences) of every text, in order.
+	"""
+	return [pack_pages(sentences, max_words) for sentences in segmenter.split_many(texts)]
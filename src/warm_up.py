@@ -0,0 +1,119 @@
+# #####################################################################
+# Precomputes the answers of the app's canned prompts.
+# Runs the RAG pipeline for every (persona, company, canned question)
+# combination with bounded concurrency and stores the answers and their
+# citations in the prefilled answer store (see prefilled_answers.py),
+# which the app serves when a pre-filled prompt is submitted unchanged.
+# Answers that are still current are skipped, so after an import only the
+# re-imported companies are rebuilt.
+#
+# Usage (from the repository root, with .streamlit/secrets.toml):
+# > python3 ./src/warm_up.py --workers 4
+# > python3 ./src/warm_up.py --companies "Apple Inc." --personas Investor --dry-run
+# #####################################################################
+
+import argparse
+import os
+import pathlib
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+src = pathlib.Path(__file__).parent.resolve()
+sys.path.insert(1, str(src))
+
+from concurrency_utils import map_bounded
+from prefilled_answers import PERSONAS, PrefilledAnswerStore, canned_requests
+from pipeline_runs import request_key
+
+
+def pending_requests(store: PrefilledAnswerStore,
+                     companies: Optional[List[str]] = None,
+                     personas: Optional[List[str]] = None,
+                     force: bool = False) -> List[Dict[str, str]]:
+    """
+    The canned requests without a current answer in the store (all of them with force).
+    """
+    current = set() if force else store.current_keys()
+    return [request for request in canned_requests(companies, personas)
+            if request_key(request["prompt"], request["persona"], [request["company"]]) not in current]
+
+
+def warm_up(store: PrefilledAnswerStore,
+            requests: List[Dict[str, str]],
+            answer_events=None,
+            max_workers: int = 4,
+            timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Run the pipeline for every request and store the answers.
+
+    Args:
+        store (PrefilledAnswerStore): Store of the answers.
+        requests (list of dict): Requests from canned_requests.
+        answer_events (Callable, optional): Called like rag_with_webSearch_stream. Defaults to it.
+        max_workers (int, optional): Requests run concurrently. Defaults to 4.
+        timeout (float, optional): Per-request timeout in seconds. Defaults to None (no timeout).
+
+    Returns:
+        dict: Counts of stored, unanswered (no relevant information) and failed requests, and seconds.
+    """
+    if answer_events is None:
+        from main import rag_with_webSearch_stream as answer_events
+
+    start = time.perf_counter()
+    finished = [0]
+    lock = threading.Lock()
+
+    def run(request):
+        events = answer_events(user_query=request["prompt"],
+                               user_persona=request["persona"],
+                               company_names=[request["company"]],
+                               use_cache=False)
+        status = "unanswered"
+        for event in store.recording(events, request["prompt"], request["persona"], request["company"]):
+            if event["type"] == "done" and event["search_type"]:
+                status = "stored"
+        with lock:
+            finished[0] += 1
+            elapsed = time.perf_counter() - start
+            print(f"[{finished[0]}/{len(requests)}] {status:<10} {request['persona']} | {request['company']} | "
+                  f"{request['choice']} ({finished[0] / max(elapsed, 1e-9) * 60:.1f} answers/min)")
+        return status
+
+    # Failed and timed-out requests come back as None and are retried by the next run
+    statuses = map_bounded(run, requests, max_workers=max_workers, timeout=timeout)
+    return {
+        "stored": statuses.count("stored"),
+        "unanswered": statuses.count("unanswered"),
+        "failed": statuses.count(None),
+        "seconds": time.perf_counter() - start
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute the answers of the app's canned prompts.")
+    parser.add_argument("--companies", nargs="+", help="Companies to warm up (default: all of constants.companies)")
+    parser.add_argument("--personas", nargs="+", choices=PERSONAS, help="Personas to warm up (default: all)")
+    parser.add_argument("--workers", type=int, default=4, help="Requests run concurrently")
+    parser.add_argument("--timeout", type=float, help="Per-request timeout in seconds")
+    parser.add_argument("--store", help="Path of the prefilled answer store")
+    parser.add_argument("--force", action="store_true", help="Rebuild current answers too")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the requests to run")
+    args = parser.parse_args(argv)
+
+    store = PrefilledAnswerStore(args.store) if args.store else PrefilledAnswerStore()
+    requests = pending_requests(store, args.companies, args.personas, args.force)
+    total = sum(1 for _ in canned_requests(args.companies, args.personas))
+    print(f"{len(requests)} of {total} canned prompts to answer ({os.path.basename(store.path)})")
+    if args.dry_run or not requests:
+        return
+
+    summary = warm_up(store, requests, max_workers=args.workers, timeout=args.timeout)
+    print(f"Warm-up finished in {summary['seconds']:.1f}s: {summary['stored']} stored, "
+          f"{summary['unanswered']} unanswered, {summary['failed']} failed")
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeCompletionServer:
+    """
+    Local OpenAI/Azure-compatible chat completions endpoint for tests and benchmarks.
+
+    Every request sleeps `latency` seconds and answers with the user message
+    upper-cased. `failures` is a list of status codes returned, in order, before
+    requests start succeeding (e.g. [429, 500]). The peak number of concurrent
+    requests and the number of connections are recorded.
+    """
+    def __init__(self, latency=0.0, failures=None, retry_after=None):
+        self.latency = latency
+        self.failures = list(failures or [])
+        self.retry_after = retry_after
+        self.requests = 0
+        self.active = 0
+        self.peak_active = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body, headers=None):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with fake._lock:
+                    fake.requests += 1
+                    fake.active += 1
+                    fake.peak_active = max(fake.peak_active, fake.active)
+                    status = fake.failures.pop(0) if fake.failures else 200
+                try:
+                    time.sleep(fake.latency)
+                    if status != 200:
+                        headers = {'retry-after': str(fake.retry_after)} if fake.retry_after is not None else {}
+                        self.reply(status, {'error': {'message': f'status {status}', 'type': 'fake'}}, headers)
+                        return
+                    content = request['messages'][-1]['content'].upper()
+                    self.reply(200, {
+                        'id': 'chatcmpl-fake',
+                        'object': 'chat.completion',
+                        'created': int(time.time()),
+                        'model': request.get('model', 'fake'),
+                        'choices': [{'index': 0, 'finish_reason': 'stop',
+                                     'message': {'role': 'assistant', 'content': content}}],
+                        'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2}
+                    })
+                finally:
+                    with fake._lock:
+                        fake.active -= 1
+
+        return Handler
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock
+from src.answer_cache import AnswerCache, FilingVersions, MemoryCacheBackend, SQLiteCacheBackend, make_key
+
+
+def fake_embed(query):
+    # Two-dimensional embedding: revenue-like questions point one way, everything else the other
+    return [1.0, 0.0] if 'revenue' in query.lower() else [0.0, 1.0]
+
+
+class TestAnswerCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.versions = FilingVersions(os.path.join(self.tmp_dir.name, 'filing_versions.json'))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def make_cache(self, backend=None, **kwargs):
+        return AnswerCache(backend or MemoryCacheBackend(), embed_fn=Mock(side_effect=fake_embed), versions=self.versions, **kwargs)
+
+    def test_exact_match_ignores_case_whitespace_and_company_order(self):
+        cache = self.make_cache()
+        cache.set('What is the debt?', ['A Inc', 'B Inc'], 'Investor', 'Answer', ['http://a.com'], 'Grounded Search')
+
+        hit = cache.get('  what is the   DEBT? ', ['B Inc', 'A Inc'], 'Investor')
+
+        self.assertEqual(hit, ('Answer', ['http://a.com'], 'Grounded Search'))
+
+    def test_exact_match_does_not_embed(self):
+        cache = self.make_cache()
+        cache.set('What is the debt?', ['A Inc'], 'Investor', 'Answer', [], 'Grounded Search')
+        cache.embed_fn.reset_mock()
+
+        cache.get('What is the debt?', ['A Inc'], 'Investor')
+
+        cache.embed_fn.assert_not_called()
+
+    def test_similarity_match_is_scoped_to_companies_and_persona(self):
+        cache = self.make_cache()
+        cache.set('Revenue trend?', ['A Inc'], 'Investor', 'Answer', [], 'Grounded Search')
+
+        self.assertEqual(cache.get('How has revenue changed?', ['A Inc'], 'Investor')[0], 'Answer')
+        self.assertIsNone(cache.get('How has revenue changed?', ['B Inc'], 'Investor'))
+        self.assertIsNone(cache.get('How has revenue changed?', ['A Inc'], 'Financial Analyst'))
+        self.assertIsNone(cache.get('What are the key risks?', ['A Inc'], 'Investor'))
+
+    def test_ttl_expiry(self):
+        cache = self.make_cache(ttl=0.05)
+        cache.set('Revenue trend?', ['A Inc'], 'Investor', 'Answer', [], 'Grounded Search')
+        time.sleep(0.1)
+
+        self.assertIsNone(cache.get('Revenue trend?', ['A Inc'], 'Investor'))
+
+    def test_lru_eviction(self):
+        cache = self.make_cache(MemoryCacheBackend(max_entries=2))
+        cache.set('q1', ['A Inc'], 'Investor', 'a1', [], '')
+        cache.set('q2', ['A Inc'], 'Investor', 'a2', [], '')
+        cache.get('q1', ['A Inc'], 'Investor')
+        cache.set('q3', ['A Inc'], 'Investor', 'a3', [], '')
+
+        self.assertIsNotNone(cache.get('q1', ['A Inc'], 'Investor'))
+        self.assertIsNone(cache.backend.get(make_key('q2', ['A Inc'], 'Investor')))
+
+    def test_reimport_invalidates_company_entries(self):
+        cache = self.make_cache()
+        cache.set('Revenue trend?', ['A Inc', 'B Inc'], 'Investor', 'Answer AB', [], '')
+        cache.set('Revenue trend?', ['C Inc'], 'Investor', 'Answer C', [], '')
+
+        time.sleep(0.01)
+        self.versions.record('A Inc')
+
+        self.assertIsNone(cache.get('Revenue trend?', ['A Inc', 'B Inc'], 'Investor'))
+        self.assertEqual(cache.get('Revenue trend?', ['C Inc'], 'Investor')[0], 'Answer C')
+
+    def test_sqlite_backend_persists_and_evicts(self):
+        path = os.path.join(self.tmp_dir.name, 'answers.sqlite')
+        cache = self.make_cache(SQLiteCacheBackend(path, max_entries=2))
+        cache.set('q1', ['A Inc'], 'Investor', 'a1', ['http://a.com'], 'Grounded Search')
+        time.sleep(0.01)
+        cache.set('q2', ['A Inc'], 'Investor', 'a2', [], '')
+        time.sleep(0.01)
+        cache.set('q3', ['A Inc'], 'Investor', 'a3', [], '')
+
+        reopened = self.make_cache(SQLiteCacheBackend(path, max_entries=2))
+        self.assertIsNone(reopened.backend.get(make_key('q1', ['A Inc'], 'Investor')))
+        self.assertEqual(reopened.get('q3', ['A Inc'], 'Investor')[0], 'a3')
+
+        # Re-importing the company invalidates the persisted answers too
+        time.sleep(0.01)
+        self.versions.record('A Inc')
+        self.assertIsNone(reopened.get('q3', ['A Inc'], 'Investor'))
+
+
+if __name__ == '__main__':
+    unittest.main()
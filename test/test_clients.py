@@ -0,0 +1,74 @@
+import threading
+import unittest
+from unittest.mock import patch, Mock
+from src.clients import ClientRegistry
+
+SECRETS = {"api_key_cohere": "fake_api_key_cohere", "api_key_weaviate": "fake_api_key_weaviate", "url_weaviate": "fake_url_weaviate"}
+
+
+class TestClientRegistry(unittest.TestCase):
+
+    @patch('cohere.Client')
+    def test_clients_are_created_on_first_use_and_shared(self, mock_client):
+        clients = ClientRegistry(SECRETS)
+        mock_client.assert_not_called()
+
+        first = clients.cohere
+        second = clients.get('cohere')
+
+        mock_client.assert_called_once_with('fake_api_key_cohere')
+        self.assertIs(first, second)
+
+    @patch('cohere.Client')
+    def test_concurrent_first_use_creates_one_client(self, mock_client):
+        clients = ClientRegistry(SECRETS)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(clients.cohere)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        mock_client.assert_called_once()
+        self.assertEqual(len({id(result) for result in results}), 1)
+
+    def test_inject_replaces_a_client_without_secrets(self):
+        clients = ClientRegistry({})
+        fake_backend = Mock()
+
+        clients.inject(retrieval_backend=fake_backend)
+
+        self.assertIs(clients.retrieval_backend, fake_backend)
+
+    def test_override_restores_the_previous_client(self):
+        clients = ClientRegistry({})
+        original, replacement = Mock(), Mock()
+        clients.inject(cohere=original)
+
+        with clients.override(cohere=replacement, chat_model=replacement):
+            self.assertIs(clients.cohere, replacement)
+            self.assertIs(clients.chat_model, replacement)
+
+        self.assertIs(clients.cohere, original)
+        self.assertNotIn('chat_model', clients.instances)
+
+    def test_answer_cache_does_not_build_the_embedding_client(self):
+        clients = ClientRegistry({})
+        embedding_cache = Mock()
+        clients.inject(query_embedding_cache=embedding_cache)
+
+        cache = clients.answer_cache
+
+        self.assertNotIn('embeddings', clients.instances)
+        embedding_cache.embed_query.assert_not_called()
+        self.assertIsNotNone(cache)
+
+    def test_unknown_secrets_fail_on_use_not_creation(self):
+        clients = ClientRegistry({})
+
+        with self.assertRaises(KeyError):
+            clients.cohere
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+from src.text_processing.completion_cache import CompletionCache
+
+
+class TestCompletionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'completions.sqlite')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_identical_pages_are_completed_once_across_runs(self):
+        complete_fn = Mock(side_effect=lambda prompt, text: f'summary of {text}')
+        cache = CompletionCache(self.path)
+        self.assertEqual(cache.complete('model', 'Summarize:', 'page', complete_fn), 'summary of page')
+        self.assertEqual(cache.complete('model', 'Summarize:', 'page', complete_fn), 'summary of page')
+
+        rerun = CompletionCache(self.path)
+        self.assertEqual(rerun.complete('model', 'Summarize:', 'page', complete_fn), 'summary of page')
+        complete_fn.assert_called_once()
+        self.assertEqual(rerun.stats(), {'hits': 1, 'misses': 0, 'evictions': 0, 'entries': 1, 'bytes': 15})
+
+    def test_key_includes_model_and_prompt(self):
+        complete_fn = Mock(return_value='completion')
+        cache = CompletionCache(self.path)
+        cache.complete('model', 'Summarize:', 'page', complete_fn)
+        cache.complete('other-model', 'Summarize:', 'page', complete_fn)
+        cache.complete('model', 'Extract key points:', 'page', complete_fn)
+        self.assertEqual(complete_fn.call_count, 3)
+
+    def test_failed_completions_are_not_cached(self):
+        complete_fn = Mock(side_effect=[None, 'completion'])
+        cache = CompletionCache(self.path)
+        self.assertIsNone(cache.complete('model', 'prompt', 'page', complete_fn))
+        self.assertEqual(cache.complete('model', 'prompt', 'page', complete_fn), 'completion')
+
+    def test_least_recently_used_entries_are_evicted_above_max_bytes(self):
+        cache = CompletionCache(self.path, max_bytes=25)
+        cache.set('model', 'prompt', 'a', 'x' * 10)
+        cache.set('model', 'prompt', 'b', 'x' * 10)
+        cache.get('model', 'prompt', 'a')
+        cache.set('model', 'prompt', 'c', 'x' * 10)
+
+        self.assertIsNotNone(cache.get('model', 'prompt', 'a'))
+        self.assertIsNone(cache.get('model', 'prompt', 'b'))
+        self.assertIsNotNone(cache.get('model', 'prompt', 'c'))
+        stats = cache.stats()
+        self.assertEqual((stats['evictions'], stats['entries'], stats['bytes']), (1, 2, 20))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from langchain_core.documents import Document
+from src.context_packing import SEPARATOR_TOKENS, allocate_budget, estimate_tokens, hit_snippet, pack_documents, truncate_to_tokens
+
+
+def make_document(company, words, **scores):
+    # 'w' * 7 + ' ' is 2 tokens per word
+    return Document(page_content=' '.join(['wwwwwww'] * words), metadata={'source': 'http://example.com', 'company_name': company, **scores})
+
+
+class TestContextPacking(unittest.TestCase):
+
+    def test_documents_are_ranked_by_relevance(self):
+        documents = [make_document('A Inc', 10, relevance_score=0.2), make_document('A Inc', 11, relevance_score=0.9)]
+
+        packed, tokens = pack_documents(documents, budget=1000)
+
+        self.assertEqual([estimate_tokens(d.page_content) for d in packed], [22, 20])
+        self.assertEqual(tokens, 42 + 2 * SEPARATOR_TOKENS)
+
+    def test_distances_rank_closest_first(self):
+        documents = [make_document('A Inc', 10, distance=0.5), make_document('A Inc', 11, distance=0.1)]
+
+        packed, _ = pack_documents(documents, budget=1000)
+
+        self.assertEqual(packed[0].metadata['distance'], 0.1)
+
+    def test_budget_truncates_then_drops(self):
+        documents = [make_document('A Inc', 100, score=3.0), make_document('A Inc', 100, score=2.0), make_document('A Inc', 100, score=1.0)]
+
+        packed, tokens = pack_documents(documents, budget=300, min_document_tokens=50)
+
+        self.assertEqual(len(packed), 2)
+        self.assertTrue(packed[1].metadata['truncated'])
+        self.assertNotIn('truncated', packed[0].metadata)
+        self.assertLessEqual(tokens, 300)
+
+    def test_compare_mode_keeps_every_company_share(self):
+        documents = [make_document('A Inc', 100, relevance_score=0.9 - i / 100) for i in range(5)]
+        documents += [make_document('B Inc', 100, relevance_score=0.5 - i / 100) for i in range(5)]
+
+        packed, tokens = pack_documents(documents, budget=808, min_document_tokens=50)
+
+        self.assertEqual([d.metadata['company_name'] for d in packed], ['A Inc', 'B Inc', 'A Inc', 'B Inc'])
+        self.assertLessEqual(tokens, 808)
+
+    def test_allocate_budget_gives_unused_share_to_others(self):
+        self.assertEqual(allocate_budget({'A Inc': 100, 'B Inc': 1000, 'C Inc': 1000}, 900), {'A Inc': 100, 'B Inc': 400, 'C Inc': 400})
+
+    def test_truncate_cuts_at_a_word_boundary(self):
+        text = truncate_to_tokens('alpha beta gamma delta epsilon', 4)
+
+        self.assertEqual(text, 'alpha beta')
+        self.assertLessEqual(estimate_tokens(text), 4)
+
+    def test_hit_snippet_keeps_sentences_around_the_hit(self):
+        page = 'One is here. Two is here. Three is the hit. Four is here. Five is here.'
+        offset = page.find('Three')
+
+        self.assertEqual(hit_snippet(page, 'Three is the hit.', offset, 0), 'Three is the hit.')
+        self.assertEqual(hit_snippet(page, 'Three is the hit.', offset, 1), 'Two is here. Three is the hit. Four is here.')
+        self.assertEqual(hit_snippet(page, 'Three is the hit.', offset, 5), page)
+        self.assertEqual(hit_snippet(page, 'One is here.', 0, 1), 'One is here. Two is here.')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+from src.embedding_cache import EmbeddingCache, SQLiteEmbeddingStore
+
+
+def fake_embed(text):
+    return [float(len(text)), 1.0]
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def test_repeated_queries_are_embedded_once(self):
+        embed_fn = Mock(side_effect=fake_embed)
+        cache = EmbeddingCache(embed_fn)
+
+        first = cache.embed_query('What is the revenue?')
+        second = cache.embed_query('What is the revenue?')
+
+        self.assertEqual(first, second)
+        embed_fn.assert_called_once()
+        self.assertEqual(cache.stats(), {'hits': 1, 'store_hits': 0, 'misses': 1, 'size': 1})
+
+    def test_lru_eviction(self):
+        embed_fn = Mock(side_effect=fake_embed)
+        cache = EmbeddingCache(embed_fn, max_entries=2)
+        cache.embed_query('a')
+        cache.embed_query('bb')
+        cache.embed_query('a')
+        cache.embed_query('ccc')
+
+        cache.embed_query('a')
+        self.assertEqual(embed_fn.call_count, 3)
+        cache.embed_query('bb')
+        self.assertEqual(embed_fn.call_count, 4)
+
+    def test_batch_embeds_only_misses_in_one_call(self):
+        batch_embed_fn = Mock(side_effect=lambda texts: [fake_embed(t) for t in texts])
+        cache = EmbeddingCache(Mock(side_effect=fake_embed), batch_embed_fn=batch_embed_fn)
+        cache.embed_query('a')
+
+        vectors = cache.embed_queries(['a', 'bb', 'ccc', 'bb'])
+
+        batch_embed_fn.assert_called_once_with(['bb', 'ccc'])
+        self.assertEqual(vectors, [fake_embed(t) for t in ['a', 'bb', 'ccc', 'bb']])
+
+    def test_persistent_store_survives_restart(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'embeddings.sqlite')
+            EmbeddingCache(fake_embed, model='embed-english-v3.0', store=SQLiteEmbeddingStore(path)).embed_query('revenue')
+
+            embed_fn = Mock(side_effect=fake_embed)
+            cache = EmbeddingCache(embed_fn, model='embed-english-v3.0', store=SQLiteEmbeddingStore(path))
+            self.assertEqual(cache.embed_query('revenue'), fake_embed('revenue'))
+            embed_fn.assert_not_called()
+            self.assertEqual(cache.stats()['store_hits'], 1)
+
+            # A different model never reuses the stored vector
+            other = EmbeddingCache(embed_fn, model='other-model', store=SQLiteEmbeddingStore(path))
+            other.embed_query('revenue')
+            embed_fn.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
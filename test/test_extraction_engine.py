@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from src.sec_filing_handling.extraction_engine import CheckpointManifest, HostRateLimiter, extract_filings
+
+
+SECTION_INFO = [('1', 'Business'), ('1A', 'Risk Factors'), ('7', 'MD&A')]
+
+
+class FakeExtractor:
+    """
+    Local stand-in for sec_api.ExtractorApi with injected latency and failures.
+    """
+    def __init__(self, latency=0.0, failures=None):
+        self.api_endpoint = 'https://api.example.com/extractor?token=x'
+        self.latency = latency
+        # (filing_url, section) -> number of calls that fail before one succeeds
+        self.failures = dict(failures or {})
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get_section(self, filing_url, section, return_type):
+        time.sleep(self.latency)
+        with self.lock:
+            self.calls.append((filing_url, section))
+            if self.failures.get((filing_url, section), 0) > 0:
+                self.failures[(filing_url, section)] -= 1
+                raise RuntimeError('429 Too Many Requests')
+        return f'Text of {section}\n for {filing_url}&#160;'
+
+
+def make_entries(count):
+    return [{'companyName': f'Company {i}', 'ticker': f'C{i}', 'linkToFilingDetails': f'http://sec.gov/{i}',
+             'formType': '10-K', 'filedAt': '2023-01-30'} for i in range(count)]
+
+
+class TestExtractionEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def load(self, index):
+        with open(os.path.join(self.output_dir, f'C{index}_2023-01-30_10-K.json')) as f:
+            return json.load(f)[0]
+
+    def test_writes_filings_in_extract_script_format(self):
+        summary = extract_filings(make_entries(2), SECTION_INFO, FakeExtractor(), self.output_dir, requests_per_second=0)
+
+        self.assertEqual(summary['written'], 2)
+        filing = self.load(1)
+        self.assertEqual(filing['companyName'], 'Company 1')
+        self.assertEqual(filing['Filing'], '10-K')
+        self.assertEqual([s['SectionType'] for s in filing['sections']], ['1', '1A', '7'])
+        self.assertEqual(filing['sections'][1]['raw'], 'Text of 1A for http://sec.gov/1')
+        self.assertEqual(filing['sections'][1]['SectionHeading'], 'Risk Factors')
+
+    def test_sections_run_concurrently(self):
+        start = time.perf_counter()
+        extract_filings(make_entries(4), SECTION_INFO, FakeExtractor(latency=0.1), self.output_dir, max_workers=12, requests_per_second=0)
+
+        # 12 sections of 0.1s each would take 1.2s serially
+        self.assertLess(time.perf_counter() - start, 0.6)
+
+    def test_transient_failures_are_retried(self):
+        extractor = FakeExtractor(failures={('http://sec.gov/0', '1A'): 2})
+        summary = extract_filings(make_entries(1), SECTION_INFO, extractor, self.output_dir, requests_per_second=0, backoff=0.01)
+
+        self.assertEqual(summary['written'], 1)
+        self.assertEqual(extractor.calls.count(('http://sec.gov/0', '1A')), 3)
+
+    def test_interrupted_run_resumes_at_next_section(self):
+        failing = FakeExtractor(failures={('http://sec.gov/0', '7'): 100})
+        summary = extract_filings(make_entries(2), SECTION_INFO, failing, self.output_dir, requests_per_second=0, retries=1, backoff=0.01)
+        self.assertEqual((summary['written'], summary['failed']), (1, 1))
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, 'C0_2023-01-30_10-K.json')))
+
+        healthy = FakeExtractor()
+        summary = extract_filings(make_entries(2), SECTION_INFO, healthy, self.output_dir, requests_per_second=0)
+
+        self.assertEqual(healthy.calls, [('http://sec.gov/0', '7')])
+        self.assertEqual(summary['skipped'], 1)
+        self.assertEqual(summary['sections_resumed'], 2)
+        self.assertEqual(self.load(0)['sections'][2]['raw'], 'Text of 7 for http://sec.gov/0')
+
+    def test_manifest_ignores_truncated_last_line(self):
+        path = os.path.join(self.output_dir, 'manifest.jsonl')
+        manifest = CheckpointManifest(path)
+        manifest.record_section('http://sec.gov/0', '1', 'Text')
+        manifest.close()
+        with open(path, 'a') as f:
+            f.write('{"type": "section", "filingUr')
+
+        self.assertEqual(CheckpointManifest(path).get_section('http://sec.gov/0', '1'), 'Text')
+
+    def test_rate_limiter_spaces_requests_per_host(self):
+        limiter = HostRateLimiter(requests_per_second=50)
+        start = time.perf_counter()
+        for _ in range(5):
+            limiter.acquire('api.example.com')
+        limiter.acquire('other.example.com')
+
+        self.assertGreaterEqual(time.perf_counter() - start, 0.075)
+        self.assertLess(time.perf_counter() - start, 0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
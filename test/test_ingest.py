@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import unittest
+from src.ingest import discover_filings, run_ingest
+
+
+def count_worker(path):
+    with open(path) as f:
+        return {'sections': len(json.load(f)[0]['sections'])}
+
+
+def flaky_worker(path):
+    # Fails the first attempt of every file, across worker processes
+    marker = path + '.attempted'
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        raise RuntimeError('transient failure')
+    return count_worker(path)
+
+
+def failing_worker(path):
+    raise RuntimeError('permanent failure')
+
+
+class TestIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, 'data')
+        os.makedirs(os.path.join(self.data_dir, '10Q'))
+        self.files = []
+        for name, sections in [('A_2023_10-K.json', 2), (os.path.join('10Q', 'B_2023_10-Q.json'), 3)]:
+            path = os.path.join(self.data_dir, name)
+            with open(path, 'w') as f:
+                json.dump([{'companyName': name, 'sections': [{}] * sections}], f)
+            self.files.append(path)
+        # Not a filing
+        open(os.path.join(self.data_dir, 'filing_urls.json'), 'w').close()
+        self.manifest = os.path.join(self.tmp_dir.name, 'manifest.jsonl')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_discover_filings_recursively(self):
+        self.assertEqual(discover_filings(self.data_dir), sorted(self.files))
+
+    def test_rerun_skips_unchanged_files(self):
+        summary = run_ingest('chunk', self.files, count_worker, self.manifest, max_workers=2)
+        self.assertEqual((summary['done'], summary['skipped'], summary['sections'], summary['objects']), (2, 0, 5, 0))
+
+        with open(self.files[0], 'w') as f:
+            json.dump([{'companyName': 'A', 'sections': [{}] * 4}], f)
+        summary = run_ingest('chunk', self.files, count_worker, self.manifest, max_workers=2)
+        self.assertEqual((summary['done'], summary['skipped'], summary['sections']), (1, 1, 4))
+
+        # Another stage has its own status
+        summary = run_ingest('import:SECSavvyNOW', self.files, count_worker, self.manifest, max_workers=2)
+        self.assertEqual(summary['done'], 2)
+
+    def test_failures_are_retried(self):
+        summary = run_ingest('chunk', self.files, flaky_worker, self.manifest, max_workers=2, backoff=0.01)
+
+        self.assertEqual((summary['done'], summary['failed']), (2, 0))
+        with open(self.manifest) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record['attempts'] for record in records], [2, 2])
+
+    def test_permanent_failure_is_recorded_and_not_skipped(self):
+        summary = run_ingest('chunk', self.files, failing_worker, self.manifest, max_workers=2, retries=1, backoff=0.01)
+        self.assertEqual(summary['failed'], 2)
+
+        summary = run_ingest('chunk', self.files, count_worker, self.manifest, max_workers=2)
+        self.assertEqual((summary['done'], summary['skipped']), (2, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
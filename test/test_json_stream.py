@@ -0,0 +1,52 @@
+import io
+import json
+import unittest
+from src.database.json_stream import JSONStreamReader, iter_filing_sections
+
+
+FILINGS = [
+    {
+        'companyName': 'ServiceNow, Inc.',
+        'filingUrl': 'http://now.com',
+        'Quarter': '2023-01-30',
+        'Filing': '10-K',
+        'sections': [
+            {'SectionType': '1', 'raw': 'Revenue grew by 24% — a record year €.', 'chunks': ['a', 'b'], 'chunkPages': [0, 12345]},
+            {'SectionType': '1A', 'raw': '', 'chunks': [], 'score': 1.5e-3, 'flags': [True, False, None]},
+        ]
+    },
+    {'companyName': 'Other', 'sections': []},
+]
+
+
+class TestJSONStream(unittest.TestCase):
+
+    def stream(self, data, read_size):
+        return list(iter_filing_sections(io.BytesIO(json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')), read_size))
+
+    def test_sections_match_json_load_for_any_read_size(self):
+        expected = [({k: v for k, v in filing.items() if k != 'sections'}, section)
+                    for filing in FILINGS for section in filing['sections']]
+        # Tiny reads split numbers, keys and multi-byte characters across buffer boundaries
+        for read_size in [1, 2, 3, 7, 64, 1 << 16]:
+            self.assertEqual(self.stream(FILINGS, read_size), expected)
+
+    def test_single_filing_object(self):
+        sections = self.stream(FILINGS[0], 5)
+        self.assertEqual([section['SectionType'] for _, section in sections], ['1', '1A'])
+        self.assertEqual(sections[0][0]['companyName'], 'ServiceNow, Inc.')
+
+    def test_truncated_file_raises(self):
+        text = json.dumps(FILINGS)[:-40]
+        with self.assertRaises(ValueError):
+            list(iter_filing_sections(io.StringIO(text), 8))
+
+    def test_buffer_only_holds_the_current_value(self):
+        reader = JSONStreamReader(io.StringIO('[' + ','.join(['"' + 'x' * 100 + '"'] * 1000) + ']'), 64)
+        for _ in reader.items():
+            self.assertEqual(len(reader.value()), 100)
+            self.assertLess(len(reader.buffer), 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import threading
+import unittest
+from openai import AzureOpenAI, BadRequestError
+from src.text_processing.llm_pool import CompletionClient, RateLimiter, map_ordered
+from fake_completion_server import FakeCompletionServer
+
+
+def azure_factory(server, created):
+    def factory():
+        created.append(1)
+        return AzureOpenAI(api_key='fake', api_version='2023-03-15-preview', azure_endpoint=server.url, max_retries=0)
+    return factory
+
+
+def summarize(client, text):
+    response = client.create(model='deployment', messages=[
+        {'role': 'system', 'content': 'Summarize:'},
+        {'role': 'user', 'content': text}
+    ])
+    return response.choices[0].message.content
+
+
+class TestLLMPool(unittest.TestCase):
+
+    def test_concurrent_calls_share_one_client_and_keep_order(self):
+        created = []
+        with FakeCompletionServer(latency=0.05) as server:
+            client = CompletionClient(azure_factory(server, created), limiter=RateLimiter(max_concurrency=4))
+            pages = [f'page {i}' for i in range(20)]
+
+            summaries = map_ordered(lambda page: summarize(client, page), pages, max_workers=10)
+
+        self.assertEqual(summaries, [page.upper() for page in pages])
+        self.assertEqual(len(created), 1)
+        self.assertEqual(server.requests, 20)
+        self.assertLessEqual(server.peak_active, 4)
+        self.assertGreater(server.peak_active, 1)
+        # Connections are pooled by the shared client rather than opened per request
+        self.assertLessEqual(server.connections, 10)
+
+    def test_rate_limits_and_server_errors_are_retried(self):
+        sleeps = []
+        with FakeCompletionServer(failures=[429, 500, 503], retry_after=0) as server:
+            client = CompletionClient(azure_factory(server, []), retries=3, sleep=sleeps.append)
+            self.assertEqual(summarize(client, 'revenue'), 'REVENUE')
+
+        self.assertEqual(server.requests, 4)
+        self.assertEqual(client.retried, 3)
+        self.assertEqual(len(sleeps), 3)
+
+    def test_client_errors_are_not_retried(self):
+        with FakeCompletionServer(failures=[400]) as server:
+            client = CompletionClient(azure_factory(server, []), sleep=lambda delay: None)
+            with self.assertRaises(BadRequestError):
+                summarize(client, 'revenue')
+        self.assertEqual(server.requests, 1)
+
+    def test_retries_are_bounded(self):
+        with FakeCompletionServer(failures=[429] * 5) as server:
+            client = CompletionClient(azure_factory(server, []), retries=2, sleep=lambda delay: None)
+            with self.assertRaises(Exception):
+                summarize(client, 'revenue')
+        self.assertEqual(server.requests, 3)
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_token_rate_waits_for_the_bucket_to_refill(self):
+        now = [0.0]
+        sleeps = []
+
+        def sleep(delay):
+            sleeps.append(delay)
+            now[0] += delay
+
+        limiter = RateLimiter(max_concurrency=2, tokens_per_minute=600, clock=lambda: now[0], sleep=sleep)
+        with limiter(500):
+            pass
+        self.assertEqual(sleeps, [])
+        with limiter(300):
+            pass
+        # 200 tokens missing at 10 tokens/second
+        self.assertAlmostEqual(sum(sleeps), 20.0)
+
+    def test_concurrency_is_bounded(self):
+        limiter = RateLimiter(max_concurrency=2)
+        active = [0, 0]
+        lock = threading.Lock()
+        barrier = threading.Event()
+
+        def work(_):
+            with limiter():
+                with lock:
+                    active[0] += 1
+                    active[1] = max(active[1], active[0])
+                barrier.wait(0.05)
+                with lock:
+                    active[0] -= 1
+
+        map_ordered(work, range(8), max_workers=8)
+        self.assertEqual(active[1], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,36 @@
+import time
 import unittest
 from unittest.mock import patch, Mock
+from streamlit.testing.v1 import AppTest
 from src.main import (
+    Document,
     retrieve_top_documents, 
     generate_comparison_new_queries, 
     generate_comparison_template_queries, 
-    match_company_to_generated_query
+    match_company_to_generated_query,
+    filter_relevant_documents,
+    retrieve_top_documents_per_company,
+    rag_with_webSearch,
+    rag_with_webSearch_stream,
+    rerank_relevant_documents,
+    generate_rag_prompt_template,
+    pack_context,
+    parse_retrieved_documents,
+    document_snippet,
+    is_document_relevant_extractive_summary,
+    rewrite_and_retrieve,
+    clients,
+    cached_search,
+    cached_search_many
 )
 
 class TestMainFunctions(unittest.TestCase):
 
     def setUp(self):
+        # Retrieval results are memoised across calls
+        cached_search.clear()
+        cached_search_many.clear()
+
         # Mocking the API keys and secrets for the services
         self.mock_api_key_cohere = 'mock_api_key_cohere'
         self.mock_api_key_weaviate = 'mock_api_key_weaviate'
@@ -83,6 +104,218 @@ class TestMainFunctions(unittest.TestCase):
         self.assertTrue(any(d['company_name'] == 'Mock Company A' for d in matched))
         self.assertTrue(any(d['company_name'] == 'Mock Company B' for d in matched))
 
+    def test_filter_relevant_documents_keeps_retrieval_order(self):
+        # Later documents answer faster, so completion order differs from retrieval order
+        def fake_model(messages):
+            content = messages[0].content
+            index = int(content.split('Page ')[1].split('.')[0])
+            time.sleep(0.01 * (5 - index))
+            return Mock(content='irrelevant' if index == 2 else f'Summary {index}')
+
+        docs = [Document(page_content=f'Page {i}', metadata={'source': f'http://example.com/{i}'}) for i in range(5)]
+        relevant = filter_relevant_documents(docs, 'revenue', cohere_model=fake_model, max_workers=5)
+
+        self.assertEqual([d.page_content for d in relevant], ['Summary 0', 'Summary 1', 'Summary 3', 'Summary 4'])
+        self.assertEqual(relevant[0].metadata['source'], 'http://example.com/0')
+
+    def test_filter_relevant_documents_drops_timed_out_calls(self):
+        def fake_model(messages):
+            if 'Page 1' in messages[0].content:
+                time.sleep(0.5)
+            return Mock(content='Summary')
+
+        docs = [Document(page_content=f'Page {i}', metadata={'source': 'http://example.com'}) for i in range(3)]
+        relevant = filter_relevant_documents(docs, 'revenue', cohere_model=fake_model, timeout=0.1)
+
+        self.assertEqual(len(relevant), 2)
+
+    def test_retrieve_top_documents_per_company_single_request(self):
+        mock_backend = Mock()
+        mock_backend.search_many.return_value = [
+            [{'sectionPage': 'Page A', 'filingUrl': 'http://a.com'}, {'sectionPage': 'Page A', 'filingUrl': 'http://a.com'}],
+            [{'sectionPage': 'Page B', 'filingUrl': 'http://b.com'}]
+        ]
+        pairs = [{'company_name': 'A Inc', 'query': 'A revenue'}, {'company_name': 'B Inc', 'query': 'B revenue'}]
+
+        with clients.override(retrieval_backend=mock_backend):
+            documents = retrieve_top_documents_per_company(pairs)
+
+        mock_backend.search_many.assert_called_once()
+        self.assertEqual(mock_backend.search_many.call_args[0][0], [('A revenue', ['A Inc']), ('B revenue', ['B Inc'])])
+        self.assertEqual([d.page_content for d in documents], ['Page A', 'Page B'])
+        self.assertEqual(documents[1].metadata['source'], 'http://b.com')
+
+    def test_hybrid_retrieval_mode_is_passed_to_the_backend(self):
+        mock_backend = Mock()
+        mock_backend.search_many.return_value = [[{'sectionPage': 'Page A', 'filingUrl': 'http://a.com'}]]
+        pairs = [{'company_name': 'A Inc', 'query': 'A 4.25% notes'}]
+
+        with clients.override(retrieval_backend=mock_backend):
+            retrieve_top_documents_per_company(pairs, search_mode='hybrid', alpha=0.3)
+            retrieve_top_documents_per_company(pairs, search_mode='vector')
+
+        hybrid_call, vector_call = mock_backend.search_many.call_args_list
+        self.assertEqual(hybrid_call[0][4:6], (0.3, 'ranked'))
+        self.assertIsNone(vector_call[0][4])
+        with self.assertRaises(ValueError):
+            retrieve_top_documents_per_company(pairs, search_mode='keyword')
+
+    def test_page_grouping_is_passed_to_the_backend(self):
+        mock_backend = Mock()
+        mock_backend.search.return_value = [{'sectionPage': 'Page A', 'filingUrl': 'http://a.com', '_additional': {'distance': 0.2, 'count': 3}}]
+
+        with clients.override(retrieval_backend=mock_backend):
+            documents = retrieve_top_documents('revenue', ['A Inc'], search_mode='vector', group_by_page=True)
+            retrieve_top_documents('revenue', ['A Inc'], search_mode='vector', group_by_page=False)
+
+        grouped_call, chunk_call = mock_backend.search.call_args_list
+        self.assertTrue(grouped_call[0][7])
+        self.assertFalse(chunk_call[0][7])
+        self.assertEqual(documents[0].metadata, {'source': 'http://a.com', 'distance': 0.2})
+
+    def test_retrieval_results_are_reused_across_reruns(self):
+        # st.cache_data only memoises inside a Streamlit runtime, so the retrieval runs in an app script
+        import main
+        mock_backend = Mock()
+        mock_backend.search_many.return_value = [[{'sectionPage': 'Page A', 'filingUrl': 'http://a.com'}]]
+        app = AppTest.from_string(
+            "import main\n"
+            "documents = main.retrieve_top_documents_per_company([{'company_name': 'A Inc', 'query': 'A revenue'}])\n"
+            "main.st.write(documents[0].page_content)\n"
+        )
+
+        with main.clients.override(retrieval_backend=mock_backend):
+            app.run()
+            app.run()
+
+        self.assertFalse(app.exception)
+        self.assertEqual(app.markdown[0].value, 'Page A')
+        mock_backend.search_many.assert_called_once()
+
+    @patch('src.main.create_stuff_documents_chain')
+    @patch('src.main.filter_relevant_documents')
+    @patch('src.main.retrieve_input_documents')
+    def test_rag_with_webSearch_stream_events(self, mock_retrieve, mock_filter, mock_chain):
+        docs = [Document(page_content='Page', metadata={'source': 'http://example.com'})] * 3
+        mock_retrieve.return_value = docs
+        mock_filter.return_value = docs[:2]
+        mock_chain.return_value.stream.return_value = iter(['Revenue ', 'grew.'])
+
+        events = list(rag_with_webSearch_stream('revenue', company_names=['Mock Company'], use_cache=False))
+
+        self.assertEqual([e['type'] for e in events], ['status', 'status', 'token', 'token', 'done'])
+        self.assertEqual(events[0]['message'], 'Retrieved 3 documents')
+        self.assertEqual(events[1]['message'], 'Kept 2 relevant documents')
+        self.assertEqual(events[-1]['answer'], 'Revenue grew.')
+        self.assertEqual(events[-1]['sources'], ['http://example.com'])
+
+        mock_chain.return_value.stream.return_value = iter(['Revenue ', 'grew.'])
+        answer, sources, search_type = rag_with_webSearch('revenue', company_names=['Mock Company'], use_cache=False)
+        self.assertEqual((answer, search_type), ('Revenue grew.', 'Grounded Search'))
+
+    def test_rerank_relevant_documents_applies_threshold_and_top_k(self):
+        mock_client = Mock()
+        mock_client.rerank.return_value = [Mock(index=2, relevance_score=0.9), Mock(index=0, relevance_score=0.5), Mock(index=1, relevance_score=0.1)]
+        docs = [Document(page_content=f'Page {i}', metadata={'source': f'http://example.com/{i}'}) for i in range(3)]
+
+        with clients.override(cohere=mock_client):
+            relevant = rerank_relevant_documents(docs, 'revenue', top_k=3, score_threshold=0.2)
+
+        mock_client.rerank.assert_called_once()
+        self.assertEqual(mock_client.rerank.call_args.kwargs['top_n'], 3)
+        self.assertEqual([d.page_content for d in relevant], ['Page 2', 'Page 0'])
+        self.assertEqual(relevant[0].metadata['relevance_score'], 0.9)
+
+    def test_pack_context_fits_the_prompt_budget(self):
+        rag_prompt = generate_rag_prompt_template('Investor', 'revenue', ['Mock Company'])
+        docs = [Document(page_content='Revenue grew. ' * 200, metadata={'source': f'http://example.com/{i}', 'relevance_score': i / 10}) for i in range(5)]
+
+        packed = pack_context(docs, rag_prompt, budget=1500)
+
+        self.assertEqual(packed[0].metadata['source'], 'http://example.com/4')
+        self.assertLess(len(packed), 5)
+        self.assertLessEqual(len(rag_prompt.format(context='\n\n'.join(d.page_content for d in packed))) / 4, 1500)
+
+    def test_relevance_filter_gets_the_sentences_around_the_hit(self):
+        sentence = 'Sentence {} has a dozen words of filler text in it.'
+        page = ' '.join(sentence.format(i) for i in range(100))
+        items = [{'sectionPage': page, 'filingUrl': 'http://a.com', 'chunk': sentence.format(50)},
+                 {'sectionPage': 'Other page.', 'filingUrl': 'http://a.com', 'chunk': 'A page summary.'}]
+        hit, summary = parse_retrieved_documents(items)
+        model = Mock(return_value=Mock(content='Sentence 50.'))
+
+        result = is_document_relevant_extractive_summary(hit, 'revenue', model)
+
+        self.assertEqual(hit.metadata['chunk_offset'], page.find('Sentence 50 '))
+        self.assertNotIn('chunk_offset', summary.metadata)
+        prompt = model.call_args[0][0][0].content
+        self.assertIn('Sentence 47 ', prompt)
+        self.assertNotIn('Sentence 46 ', prompt)
+        self.assertNotIn('Sentence 54 ', prompt)
+        self.assertEqual(result.metadata['source'], 'http://a.com')
+        # Snippets that are too short, and documents without a hit, fall back to the page
+        self.assertEqual(document_snippet(hit, sentences=0), page)
+        self.assertEqual(document_snippet(hit, sentences=1, min_words=10), ' '.join(sentence.format(i) for i in (49, 50, 51)))
+        self.assertEqual(document_snippet(summary, sentences=1), 'Other page.')
+
+    def speculative_rewrite(self, rewritten_query, latency=0.2):
+        from src.embedding_cache import EmbeddingCache
+        retrieved = []
+
+        def retrieve(query, company_names, cancelled=None):
+            time.sleep(latency)
+            retrieved.append(query)
+            return [Document(page_content=query, metadata={'source': 'http://example.com'})]
+
+        def rewrite(history):
+            time.sleep(latency)
+            return rewritten_query
+
+        # Queries embed to their word counts of 'revenue' and 'debt'
+        cache = EmbeddingCache(lambda text: [text.count('revenue'), text.count('debt'), 1.0])
+        with patch('src.main.retrieve_input_documents', side_effect=retrieve), patch('src.main.generate_user_query', side_effect=rewrite), \
+                clients.override(query_embedding_cache=cache):
+            start = time.perf_counter()
+            query, documents = rewrite_and_retrieve('and revenue?', 'User: debt?', ['Mock Company'], speculative=True, similarity_threshold=0.9)
+            return query, documents, retrieved, time.perf_counter() - start
+
+    def test_speculative_retrieval_is_kept_for_a_close_rewrite(self):
+        query, documents, retrieved, elapsed = self.speculative_rewrite('What is the revenue?')
+
+        self.assertEqual(query, 'What is the revenue?')
+        self.assertEqual(retrieved, ['and revenue?'])
+        self.assertEqual(documents[0].page_content, 'and revenue?')
+        # Retrieval overlapped the rewrite
+        self.assertLess(elapsed, 0.35)
+
+    def test_speculative_retrieval_is_discarded_for_a_different_rewrite(self):
+        query, documents, retrieved, _ = self.speculative_rewrite('What is the debt?')
+
+        self.assertEqual(documents[0].page_content, 'What is the debt?')
+        self.assertIn('What is the debt?', retrieved)
+
+    def test_discarded_comparison_retrieval_skips_its_search(self):
+        from src.embedding_cache import EmbeddingCache
+        searched = []
+
+        def generate_queries(query):
+            # The speculative comparison queries are generated after the rewrite
+            time.sleep(0.3)
+            return [f'{query} A', f'{query} B']
+
+        def rewrite(history):
+            time.sleep(0.1)
+            return 'What is the debt?'
+
+        cache = EmbeddingCache(lambda text: [text.count('revenue'), text.count('debt'), 1.0])
+        with patch('src.main.generate_comparison_new_queries', side_effect=generate_queries), \
+                patch('src.main.match_company_to_generated_query', side_effect=lambda queries, company_names: list(zip(queries, company_names))), \
+                patch('src.main.retrieve_top_documents_per_company', side_effect=lambda pairs, top_n: searched.append(pairs) or []), \
+                patch('src.main.generate_user_query', side_effect=rewrite), clients.override(query_embedding_cache=cache):
+            rewrite_and_retrieve('and revenue?', 'User: debt?', ['A Inc', 'B Inc'], speculative=True, similarity_threshold=0.9)
+
+        self.assertEqual(searched, [[('What is the debt? A', 'A Inc'), ('What is the debt? B', 'B Inc')]])
+
     # You can add more test cases for other functions
 
 if __name__ == '__main__':
@@ -0,0 +1,136 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from streamlit.testing.v1 import AppTest
+from src.pipeline_runs import PipelineRuns, request_key
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'app.py')
+SECRETS = {"api_key_cohere": "fake_api_key_cohere", "api_key_weaviate": "fake_api_key_weaviate", "url_weaviate": "fake_url_weaviate"}
+
+
+def fake_events(answer='Revenue grew.', release=None, calls=None):
+    # Stand-in for rag_with_webSearch_stream, optionally blocking until `release` is set
+    def events_fn(**kwargs):
+        if calls is not None:
+            calls.append(kwargs)
+        yield {"type": "status", "message": "Retrieved 3 documents"}
+        if release is not None:
+            release.wait(5)
+        for token in answer.split(' '):
+            yield {"type": "token", "text": token}
+        yield {"type": "done", "answer": answer, "sources": ['http://example.com'], "search_type": 'Grounded Search'}
+    return events_fn
+
+
+class TestPipelineRuns(unittest.TestCase):
+
+    def test_request_key_ignores_company_order(self):
+        self.assertEqual(request_key('revenue', 'Investor', ['A', 'B']), request_key('revenue ', 'Investor', ['B', 'A']))
+        self.assertNotEqual(request_key('revenue', 'Investor', ['A']), request_key('revenue', 'Financial Analyst', ['A']))
+
+    def test_same_key_attaches_to_the_run_in_flight(self):
+        runs = PipelineRuns()
+        release = threading.Event()
+        calls = []
+        events_fn = fake_events(release=release, calls=calls)
+
+        first = runs.start('key', lambda: events_fn())
+        second = runs.start('key', lambda: events_fn())
+        release.set()
+
+        self.assertIs(first, second)
+        self.assertEqual([e['type'] for e in second.follow(timeout=5)], ['status', 'token', 'token', 'done'])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(runs.started, 1)
+
+    def test_follow_replays_from_the_first_event(self):
+        runs = PipelineRuns()
+        run = runs.start('key', fake_events())
+        list(run.follow(timeout=5))
+
+        events = list(run.follow(timeout=5))
+
+        self.assertEqual(events[0]['message'], 'Retrieved 3 documents')
+        self.assertEqual(run.result['answer'], 'Revenue grew.')
+        self.assertNotIn('key', runs.in_flight)
+
+    def test_follow_reraises_pipeline_errors(self):
+        def failing():
+            yield {"type": "status", "message": "Retrieved 0 documents"}
+            raise ValueError('backend down')
+
+        run = PipelineRuns().start('key', failing)
+
+        with self.assertRaises(ValueError):
+            list(run.follow(timeout=5))
+        self.assertIsNone(run.result)
+
+
+class TestAppPipelineState(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.patcher = patch('main.rag_with_webSearch_stream', fake_events(calls=self.calls))
+        self.patcher.start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.app = AppTest.from_file(APP_PATH, default_timeout=30)
+        self.app.secrets.update(SECRETS)
+        self.app.secrets["prefilled_answers_path"] = os.path.join(self.tmp_dir.name, 'prefilled_answers.sqlite')
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmp_dir.cleanup()
+
+    def submit(self, prompt):
+        self.app.chat_input[0].set_value(prompt).run()
+        self.assertFalse(self.app.exception)
+
+    def test_reruns_do_not_call_the_pipeline_again(self):
+        self.app.run()
+        self.submit('What is the revenue?')
+        self.app.run()
+        self.app.run()
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual([m['role'] for m in self.app.session_state.messages], ['user', 'assistant'])
+        self.assertIsNone(self.app.session_state.pending_run)
+
+    def test_repeated_question_is_served_from_the_session(self):
+        self.app.run()
+        self.submit('What is the revenue?')
+        self.submit('What is the revenue?')
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.app.session_state.messages[-1]['content'], 'Revenue grew.')
+
+    def test_pipeline_thread_has_the_script_run_context(self):
+        contexts = []
+
+        def events_fn(**kwargs):
+            from streamlit.runtime.scriptrunner import get_script_run_ctx
+            contexts.append(get_script_run_ctx())
+            yield from fake_events()(**kwargs)
+
+        with patch('main.rag_with_webSearch_stream', events_fn):
+            self.app.run()
+            self.submit('What is the revenue?')
+
+        self.assertEqual(len(contexts), 1)
+        self.assertIsNotNone(contexts[0])
+
+    def test_rerun_resumes_an_interrupted_run(self):
+        self.app.run()
+        # A run left pending by a rerun that interrupted its rendering
+        run = PipelineRuns().start('key', fake_events(calls=self.calls))
+        self.app.session_state.pending_run = run
+        self.app.run()
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.app.session_state.messages[-1]['content'], 'Revenue grew.')
+        self.assertIn('key', self.app.session_state.pipeline_results)
+
+
+if __name__ == '__main__':
+    unittest.main()
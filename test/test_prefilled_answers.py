@@ -0,0 +1,142 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from streamlit.testing.v1 import AppTest
+from src import constants
+from src.answer_cache import FilingVersions
+from src.prefilled_answers import PrefilledAnswerStore, canned_requests, is_canned, prefill_text
+from src.warm_up import pending_requests, warm_up
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'app.py')
+SECRETS = {"api_key_cohere": "fake_api_key_cohere", "api_key_weaviate": "fake_api_key_weaviate", "url_weaviate": "fake_url_weaviate"}
+
+
+def fake_events(calls, answer='Revenue grew.', search_type='Grounded Search'):
+    # Stand-in for rag_with_webSearch_stream
+    def events_fn(**kwargs):
+        calls.append(kwargs)
+        yield {"type": "token", "text": answer}
+        yield {"type": "done", "answer": answer, "sources": ['http://example.com'], "search_type": search_type}
+    return events_fn
+
+
+class TestPrefilledAnswerStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.versions = FilingVersions(os.path.join(self.tmp.name, 'versions.json'))
+        self.store = PrefilledAnswerStore(os.path.join(self.tmp.name, 'prefilled.sqlite'), self.versions)
+        self.prompt = prefill_text('Questions', constants.investor_questions[0], 'Apple Inc.')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_canned_requests_cover_persona_questions_and_sections(self):
+        requests = list(canned_requests(['Apple Inc.'], ['Investor']))
+
+        self.assertEqual(len(requests), len(constants.investor_questions) + len(constants.summary_sections))
+        self.assertTrue(is_canned(self.prompt, 'Investor', 'Apple Inc.'))
+        self.assertFalse(is_canned(self.prompt + ' In 2023?', 'Investor', 'Apple Inc.'))
+        self.assertFalse(is_canned(self.prompt, 'Sales Representative', 'Apple Inc.'))
+
+    def test_answers_are_stale_after_a_filing_import(self):
+        self.versions.record('Apple Inc.', timestamp=100.0)
+        self.store.set(self.prompt, 'Investor', 'Apple Inc.', 'Revenue grew.', ['http://example.com'], 'Grounded Search')
+
+        self.assertEqual(self.store.get(self.prompt, 'Investor', 'Apple Inc.'), ('Revenue grew.', ['http://example.com'], 'Grounded Search'))
+        self.assertIsNone(self.store.get(self.prompt, 'Financial Analyst', 'Apple Inc.'))
+
+        self.versions.record('Apple Inc.', timestamp=200.0)
+        self.assertIsNone(self.store.get(self.prompt, 'Investor', 'Apple Inc.'))
+
+    def test_answers_are_stale_after_a_pipeline_version_bump(self):
+        self.store.set(self.prompt, 'Investor', 'Apple Inc.', 'Revenue grew.', [], 'Grounded Search')
+        bumped = PrefilledAnswerStore(self.store.path, self.versions, pipeline_version=self.store.pipeline_version + 1)
+
+        self.assertIsNone(bumped.get(self.prompt, 'Investor', 'Apple Inc.'))
+
+    def test_recording_uses_the_filing_version_at_the_start(self):
+        self.versions.record('Apple Inc.', timestamp=100.0)
+
+        def events():
+            # Filings re-imported while the pipeline runs
+            self.versions.record('Apple Inc.', timestamp=200.0)
+            yield {"type": "done", "answer": 'Revenue grew.', "sources": [], "search_type": 'Grounded Search'}
+
+        list(self.store.recording(events(), self.prompt, 'Investor', 'Apple Inc.'))
+
+        self.assertIsNone(self.store.get(self.prompt, 'Investor', 'Apple Inc.'))
+
+    def test_warm_up_answers_only_missing_and_stale_prompts(self):
+        calls = []
+        requests = pending_requests(self.store, ['Apple Inc.', 'BOEING CO'], ['Investor'])
+        summary = warm_up(self.store, requests, answer_events=fake_events(calls), max_workers=4)
+
+        self.assertEqual(summary['stored'], len(requests))
+        self.assertEqual(len(calls), len(requests))
+        self.assertTrue(all(call['use_cache'] is False for call in calls))
+        self.assertEqual(pending_requests(self.store, ['Apple Inc.', 'BOEING CO'], ['Investor']), [])
+
+        self.versions.record('BOEING CO')
+        stale = pending_requests(self.store, ['Apple Inc.', 'BOEING CO'], ['Investor'])
+        self.assertEqual({request['company'] for request in stale}, {'BOEING CO'})
+        self.assertEqual(len(stale), len(requests) // 2)
+
+    def test_warm_up_does_not_store_unanswered_prompts(self):
+        requests = list(canned_requests(['Apple Inc.'], ['Investor']))[:2]
+        summary = warm_up(self.store, requests, answer_events=fake_events([], search_type=''))
+
+        self.assertEqual((summary['stored'], summary['unanswered']), (0, 2))
+        self.assertEqual(len(pending_requests(self.store, ['Apple Inc.'], ['Investor'])), len(constants.investor_questions) + len(constants.summary_sections))
+
+
+class TestAppPrefilledAnswers(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, 'prefilled.sqlite')
+        self.store = PrefilledAnswerStore(path)
+        self.calls = []
+        self.patcher = patch('main.rag_with_webSearch_stream', fake_events(self.calls, answer='Live answer.'))
+        self.patcher.start()
+        self.app = AppTest.from_file(APP_PATH, default_timeout=30)
+        self.app.secrets.update(SECRETS, prefilled_answers_path=path)
+        self.app.run()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.tmp.cleanup()
+
+    def submit(self, prompt):
+        self.app.chat_input[0].set_value(prompt).run()
+        self.assertFalse(self.app.exception)
+
+    def test_unchanged_prefilled_prompt_is_served_from_the_store(self):
+        prompt = prefill_text('Questions', constants.investor_questions[0], 'ServiceNow, Inc.')
+        self.store.set(prompt, 'Investor', 'ServiceNow, Inc.', 'Precomputed answer.', ['http://example.com'], 'Grounded Search')
+
+        self.submit(prompt)
+
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.app.session_state.messages[-1]['content'], 'Precomputed answer.')
+
+    def test_missing_prefilled_prompt_is_answered_and_stored(self):
+        prompt = prefill_text('Questions', constants.investor_questions[1], 'ServiceNow, Inc.')
+
+        self.submit(prompt)
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.store.get(prompt, 'Investor', 'ServiceNow, Inc.')[0], 'Live answer.')
+
+    def test_edited_prompt_is_not_stored(self):
+        prompt = prefill_text('Questions', constants.investor_questions[1], 'ServiceNow, Inc.') + ' Only 2023.'
+
+        self.submit(prompt)
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.store.current_keys(), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
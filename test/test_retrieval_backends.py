@@ -0,0 +1,339 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+import numpy as np
+from weaviate.gql.get import HybridFusion
+from src.embedding_cache import EmbeddingCache
+from src.retrieval_backends import (
+    FUSION_RANKED, FUSION_RELATIVE_SCORE, PAGE_HIT_PROPERTIES, LocalVectorIndex, RetrievalBackend, WeaviateBackend, build_local_index, fuse_rankings,
+    group_hits, tenant_name
+)
+
+
+# Tiny vocabulary embedding: one dimension per keyword
+KEYWORDS = ['revenue', 'risk', 'debt', 'legal']
+
+
+def fake_embed(text):
+    return [float(text.lower().count(word)) for word in KEYWORDS] + [0.1]
+
+
+def fake_embed_documents(texts):
+    return [fake_embed(text) for text in texts]
+
+
+def make_record(company, chunk, page='Page'):
+    return {
+        'companyName': company,
+        'filingUrl': f'http://{company}.com',
+        'sectionSummary': 'Summary',
+        'sectionPage': f'{company} {page}',
+        'chunk': chunk,
+        'quarter': 'Q1'
+    }
+
+
+class TestLocalVectorIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        records = [
+            make_record('A Inc', 'Revenue grew by ten percent this year', 'revenue page'),
+            make_record('B Inc', 'Revenue revenue revenue grew strongly', 'revenue page'),
+            make_record('A Inc', 'Key risk factors include competition', 'risk page'),
+            make_record('A Inc', 'The company issued new debt notes', 'debt page'),
+            make_record('B Inc', 'Legal proceedings are ongoing here', 'legal page'),
+            make_record('A Inc', 'short'),
+        ]
+        self.rows = build_local_index(records, fake_embed_documents, self.tmp_dir.name, batch_size=2)
+        self.index = LocalVectorIndex(self.tmp_dir.name, EmbeddingCache(fake_embed))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_build_groups_companies_and_skips_short_chunks(self):
+        self.assertEqual(self.rows, 5)
+        self.assertEqual(self.index.company_ranges, {'A Inc': [0, 3], 'B Inc': [3, 5]})
+
+    def test_build_streams_records_into_normalised_embeddings(self):
+        with tempfile.TemporaryDirectory() as index_dir:
+            # A generator can only be read once
+            records = (make_record(company, f'Revenue and debt of {company} item {i}') for i in range(5) for company in ['A Inc', 'B Inc'])
+            self.assertEqual(build_local_index(records, fake_embed_documents, index_dir, batch_size=2), 10)
+            index = LocalVectorIndex(index_dir, EmbeddingCache(fake_embed))
+
+            self.assertEqual(index.embeddings.dtype, np.float32)
+            np.testing.assert_allclose(np.linalg.norm(index.embeddings, axis=1), np.ones(10), rtol=1e-6)
+            self.assertEqual(index.record(5)['chunk'], 'Revenue and debt of B Inc item 0')
+            # The BM25 files are built from the spooled rows too
+            self.assertEqual({hit['companyName'] for hit in index.search('item', ['B Inc'], top_n=10, alpha=0)}, {'B Inc'})
+            self.assertEqual(len(index.search('item', ['B Inc'], top_n=10, alpha=0)), 5)
+
+    def test_search_is_filtered_by_company(self):
+        hits = self.index.search('What is the revenue?', ['A Inc'], top_n=2)
+
+        self.assertEqual(len(hits), 2)
+        self.assertTrue(all(hit['companyName'] == 'A Inc' for hit in hits))
+        self.assertEqual(hits[0]['sectionPage'], 'A Inc revenue page')
+        self.assertLess(hits[0]['_additional']['distance'], hits[1]['_additional']['distance'])
+
+    def test_search_over_several_companies_and_max_distance(self):
+        hits = self.index.search('revenue', ['A Inc', 'B Inc', 'Unknown Inc'], top_n=5, max_distance=0.2)
+
+        self.assertEqual({hit['companyName'] for hit in hits}, {'A Inc', 'B Inc'})
+        self.assertTrue(all(hit['_additional']['distance'] <= 0.2 for hit in hits))
+
+    def test_unknown_company_returns_nothing(self):
+        self.assertEqual(self.index.search('revenue', ['Unknown Inc']), [])
+
+    def test_search_many(self):
+        results = self.index.search_many([('risk', ['A Inc']), ('legal', ['B Inc'])], top_n=1)
+
+        self.assertEqual([hits[0]['sectionPage'] for hits in results], ['A Inc risk page', 'B Inc legal page'])
+
+    def test_pages_are_stored_once_and_attached_to_hits(self):
+        with open(os.path.join(self.tmp_dir.name, 'records.jsonl')) as f:
+            self.assertNotIn('sectionPage', f.read())
+        with open(os.path.join(self.tmp_dir.name, 'pages.jsonl')) as f:
+            self.assertEqual(len(f.readlines()), 5)
+
+        hits = self.index.search('revenue', ['A Inc', 'B Inc'], top_n=2)
+
+        self.assertEqual([hit['sectionPage'] for hit in hits], ['A Inc revenue page', 'B Inc revenue page'])
+        self.assertEqual(hits[0]['sectionSummary'], 'Summary')
+
+    def test_chunks_of_one_page_share_its_page_row(self):
+        with tempfile.TemporaryDirectory() as index_dir:
+            records = [make_record('A Inc', 'Revenue grew by ten percent', 'p1'), make_record('A Inc', 'Debt notes were issued', 'p1')]
+            build_local_index(records, fake_embed_documents, index_dir)
+            index = LocalVectorIndex(index_dir, EmbeddingCache(fake_embed))
+
+            self.assertEqual(len(index.page_offsets), 1)
+            self.assertEqual([hit['sectionPage'] for hit in index.search('revenue debt', ['A Inc'])], ['A Inc p1', 'A Inc p1'])
+
+    def test_search_grouped_by_page_returns_distinct_pages(self):
+        with tempfile.TemporaryDirectory() as index_dir:
+            records = [make_record('A Inc', 'Revenue grew by ten percent', 'p1'), make_record('A Inc', 'Revenue revenue fell in Q2', 'p1'),
+                       make_record('A Inc', 'Revenue and debt notes', 'p2'), make_record('A Inc', 'Legal proceedings are ongoing', 'p3')]
+            build_local_index(records, fake_embed_documents, index_dir)
+            index = LocalVectorIndex(index_dir, EmbeddingCache(fake_embed))
+
+            for alpha in [None, 0.5]:
+                hits = index.search('revenue', ['A Inc'], top_n=2, alpha=alpha, group_by_page=True)
+
+                self.assertEqual([hit['sectionPage'] for hit in hits], ['A Inc p1', 'A Inc p2'])
+                self.assertEqual(set(hits[0]), set(PAGE_HIT_PROPERTIES) | {'_additional'})
+                self.assertEqual(hits[0]['_additional']['count'], 2)
+
+            # Indexes built before row_pages.npy group an oversampled ranking
+            os.remove(os.path.join(index_dir, 'row_pages.npy'))
+            index = LocalVectorIndex(index_dir, EmbeddingCache(fake_embed))
+            hits = index.search('revenue', ['A Inc'], top_n=2, group_by_page=True)
+            self.assertEqual([hit['sectionPage'] for hit in hits], ['A Inc p1', 'A Inc p2'])
+
+    def test_hybrid_search_finds_exact_terms_the_embedding_misses(self):
+        # 'competition' is outside the embedding vocabulary, so vector search ranks it nowhere in particular
+        hits = self.index.search('competition', ['A Inc'], top_n=3, alpha=0.5)
+
+        self.assertEqual(hits[0]['sectionPage'], 'A Inc risk page')
+        self.assertEqual(len(hits), 3)
+        self.assertGreater(hits[0]['_additional']['score'], hits[1]['_additional']['score'])
+
+    def test_keyword_only_search_skips_the_embedding(self):
+        cache = EmbeddingCache(MagicMock(side_effect=AssertionError('embedded')))
+        index = LocalVectorIndex(self.tmp_dir.name, cache)
+
+        results = index.search_many([('debt notes', ['A Inc']), ('debt notes', ['B Inc'])], top_n=5, alpha=0)
+
+        self.assertEqual([hit['sectionPage'] for hit in results[0]], ['A Inc debt page'])
+        self.assertEqual(results[1], [])
+
+    def test_bm25_scores_are_filtered_by_company(self):
+        rows, scores = self.index.rank_keywords('revenue grew', ['B Inc'])
+
+        self.assertEqual(rows.tolist(), [3])
+        rows, scores = self.index.rank_keywords('revenue grew', ['A Inc', 'B Inc'])
+        # Repeated terms score higher
+        self.assertEqual(rows.tolist(), [3, 0])
+
+    def test_index_without_bm25_files_falls_back_to_vector_search(self):
+        for name in ['bm25_terms.json', 'bm25_postings.npy', 'bm25_frequencies.npy', 'bm25_lengths.npy']:
+            os.remove(os.path.join(self.tmp_dir.name, name))
+        index = LocalVectorIndex(self.tmp_dir.name, EmbeddingCache(fake_embed))
+
+        hits = index.search('What is the revenue?', ['A Inc'], top_n=2, alpha=0.5)
+
+        self.assertEqual(hits[0]['sectionPage'], 'A Inc revenue page')
+        self.assertIn('distance', hits[0]['_additional'])
+
+
+class TestRetrievalBackend(unittest.TestCase):
+
+    def test_backends_must_implement_search(self):
+        class NoSearch(RetrievalBackend):
+            pass
+
+        with self.assertRaises(TypeError):
+            NoSearch()
+
+
+class TestFuseRankings(unittest.TestCase):
+
+    VECTOR = [('a', 0.9), ('b', 0.89), ('c', 0.1)]
+    KEYWORD = [('b', 10.0), ('c', 1.0)]
+
+    def test_ranked_fusion_only_uses_ranks(self):
+        fused = fuse_rankings(self.VECTOR, self.KEYWORD, alpha=0.5, fusion=FUSION_RANKED)
+
+        self.assertEqual([key for key, _ in fused], ['b', 'c', 'a'])
+        self.assertAlmostEqual(dict(fused)['a'], 0.5 / 60)
+
+    def test_relative_score_fusion_uses_score_gaps(self):
+        fused = fuse_rankings(self.VECTOR, self.KEYWORD, alpha=0.5, fusion=FUSION_RELATIVE_SCORE)
+
+        self.assertEqual([key for key, _ in fused], ['b', 'a', 'c'])
+        self.assertAlmostEqual(dict(fused)['c'], 0.0)
+
+    def test_alpha_selects_one_ranking(self):
+        self.assertEqual([key for key, _ in fuse_rankings([('a', 0.9)], [('b', 1.0)], alpha=1)], ['a'])
+        self.assertEqual([key for key, _ in fuse_rankings([('a', 0.9)], [('b', 1.0)], alpha=0)], ['b'])
+        with self.assertRaises(ValueError):
+            fuse_rankings([], [], fusion='max')
+
+
+class TestGroupHits(unittest.TestCase):
+
+    def test_keeps_the_best_hit_of_the_first_pages(self):
+        hits = [{'pageId': 1, 'chunk': 'a'}, {'pageId': 2, 'chunk': 'b'}, {'pageId': 1, 'chunk': 'c'}, {'pageId': 3, 'chunk': 'd'}]
+
+        grouped = group_hits(hits, 2)
+
+        self.assertEqual([(hit['chunk'], hit['_additional']['count']) for hit in grouped], [('a', 2), ('b', 1)])
+        self.assertNotIn('_additional', hits[0])
+
+
+class TestWeaviateBackend(unittest.TestCase):
+
+    def test_search_many_sends_one_aliased_request(self):
+        client = MagicMock()
+        client.query.multi_get.return_value.do.return_value = {
+            'data': {'Get': {'query0': [{'sectionPage': 'Page A'}], 'query1': None}}
+        }
+
+        results = WeaviateBackend(client).search_many([('A revenue', ['A Inc']), ('B revenue', ['B Inc'])])
+
+        client.query.multi_get.assert_called_once()
+        self.assertEqual(len(client.query.multi_get.call_args[0][0]), 2)
+        self.assertEqual(results, [[{'sectionPage': 'Page A'}], []])
+
+    def test_search_uses_near_vector_with_embedding_cache(self):
+        client = MagicMock()
+        cache = EmbeddingCache(fake_embed)
+
+        WeaviateBackend(client, cache).search('revenue', ['A Inc'])
+        WeaviateBackend(client, cache).search('revenue', ['A Inc'])
+
+        builder = client.query.get.return_value
+        builder.with_near_vector.assert_called_with({'vector': fake_embed('revenue'), 'distance': 999.0})
+        builder.with_near_text.assert_not_called()
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_hybrid_search_uses_with_hybrid(self):
+        client = MagicMock()
+
+        WeaviateBackend(client, EmbeddingCache(fake_embed)).search('debt notes', ['A Inc'], alpha=0.25, fusion=FUSION_RELATIVE_SCORE)
+
+        builder = client.query.get.return_value
+        builder.with_hybrid.assert_called_once_with('debt notes', alpha=0.25, vector=fake_embed('debt notes'),
+                                                    properties=['chunk'], fusion_type=HybridFusion.RELATIVE_SCORE)
+        builder.with_hybrid.return_value.with_additional.assert_called_once_with(['score'])
+        builder.with_near_vector.assert_not_called()
+
+    def test_tenant_layout_searches_each_company_in_its_tenant(self):
+        client = MagicMock()
+        client.query.multi_get.return_value.do.return_value = {
+            'data': {'Get': {
+                'query0': [{'sectionPage': 'A far', '_additional': {'distance': 0.4}}, {'sectionPage': 'A near', '_additional': {'distance': 0.1}}],
+                'query1': [{'sectionPage': 'B mid', '_additional': {'distance': 0.2}}],
+                'query2': [{'sectionPage': 'C', '_additional': {'distance': 0.3}}]
+            }}
+        }
+        backend = WeaviateBackend(client, EmbeddingCache(fake_embed), tenants=True)
+
+        results = backend.search_many([('revenue', ['A Inc', 'B Inc']), ('risk', ['C Inc'])], top_n=2)
+
+        builder = client.query.get.return_value.with_near_vector.return_value.with_additional.return_value
+        self.assertEqual([c[0][0] for c in builder.with_tenant.call_args_list],
+                         [tenant_name('A Inc'), tenant_name('B Inc'), tenant_name('C Inc')])
+        self.assertEqual(len(client.query.multi_get.call_args[0][0]), 3)
+        builder.with_where.assert_not_called()
+        self.assertEqual([[hit['sectionPage'] for hit in hits] for hits in results], [['A near', 'B mid'], ['C']])
+
+    def test_page_class_pages_are_fetched_once_per_search(self):
+        client = MagicMock()
+        client.query.multi_get.return_value.do.return_value = {
+            'data': {'Get': {
+                'query0': [{'chunk': 'a', 'pageId': 'p1'}, {'chunk': 'b', 'pageId': 'p2'}],
+                'query1': [{'chunk': 'c', 'pageId': 'p1'}]
+            }}
+        }
+        page_query = client.query.get.return_value.with_additional.return_value.with_where.return_value.with_limit.return_value
+        page_query.do.return_value = {'data': {'Get': {'SECSavvyNOWPages': [
+            {'sectionPage': 'Page 1', 'sectionSummary': 'S', '_additional': {'id': 'p1'}},
+            {'sectionPage': 'Page 2', 'sectionSummary': 'S', '_additional': {'id': 'p2'}}
+        ]}}}
+        backend = WeaviateBackend(client, EmbeddingCache(fake_embed), page_class='SECSavvyNOWPages')
+
+        results = backend.search_many([('revenue', ['A Inc']), ('debt', ['A Inc'])])
+
+        page_query.do.assert_called_once()
+        where = client.query.get.return_value.with_additional.return_value.with_where.call_args[0][0]
+        self.assertEqual(where['valueText'], ['p1', 'p2'])
+        self.assertEqual(client.query.get.call_args_list[0][0][1], ['companyName', 'filingUrl', 'chunk', 'pageId'])
+        self.assertEqual([[hit['sectionPage'] for hit in hits] for hits in results], [['Page 1', 'Page 2'], ['Page 1']])
+
+    def test_search_grouped_by_page_uses_group_by(self):
+        client = MagicMock()
+        client.query.multi_get.return_value.do.return_value = {'data': {'Get': {'query0': [
+            {'_additional': {'group': {'count': 1, 'minDistance': 0.3, 'hits': [{'companyName': 'A Inc', 'sectionPage': 'Page 2', '_additional': {'distance': 0.3}}]}}},
+            {'_additional': {'group': {'count': 4, 'minDistance': 0.1, 'hits': [{'companyName': 'A Inc', 'sectionPage': 'Page 1', '_additional': {'distance': 0.1}}]}}}
+        ]}}}
+
+        hits = WeaviateBackend(client, EmbeddingCache(fake_embed)).search('revenue', ['A Inc'], top_n=2, group_by_page=True)
+
+        client.query.get.assert_called_once_with('SECSavvyNOW')
+        client.query.get.return_value.with_group_by.assert_called_once_with(['sectionPage'], groups=2, objects_per_group=1)
+        self.assertEqual([(hit['sectionPage'], hit['_additional']) for hit in hits],
+                         [('Page 1', {'distance': 0.1, 'count': 4}), ('Page 2', {'distance': 0.3, 'count': 1})])
+        self.assertNotIn('sectionSummary', hits[0])
+
+    def test_hybrid_search_grouped_by_page_is_grouped_on_the_client(self):
+        client = MagicMock()
+        client.query.multi_get.return_value.do.return_value = {'data': {'Get': {'query0': [
+            {'sectionPage': 'Page 1', 'chunk': 'a', '_additional': {'score': 0.9}},
+            {'sectionPage': 'Page 1', 'chunk': 'b', '_additional': {'score': 0.8}},
+            {'sectionPage': 'Page 2', 'chunk': 'c', '_additional': {'score': 0.7}}
+        ]}}}
+
+        results = WeaviateBackend(client, EmbeddingCache(fake_embed)).search_many([('revenue', ['A Inc'])], top_n=2, alpha=0.5,
+                                                                                 group_by_page=True)
+
+        client.query.get.return_value.with_group_by.assert_not_called()
+        client.query.get.return_value.with_hybrid.return_value.with_additional.return_value.with_where.return_value.with_limit.assert_called_once_with(8)
+        self.assertEqual([(hit['sectionPage'], hit['_additional']['count']) for hit in results[0]], [('Page 1', 2), ('Page 2', 1)])
+
+    def test_tenant_layout_single_company_search_is_one_query(self):
+        client = MagicMock()
+
+        WeaviateBackend(client, EmbeddingCache(fake_embed), tenants=True).search('revenue', ['A Inc'])
+
+        builder = client.query.get.return_value.with_near_vector.return_value.with_additional.return_value
+        builder.with_tenant.assert_called_once_with(tenant_name('A Inc'))
+        builder.with_tenant.return_value.with_limit.return_value.do.assert_called_once()
+        client.query.multi_get.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
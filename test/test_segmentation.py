@@ -0,0 +1,33 @@
+import unittest
+from src.text_processing.segmentation import RegexSegmenter, get_segmenter, pack_pages, segment_sections
+
+
+class TestSegmentation(unittest.TestCase):
+
+    def test_pack_pages_by_word_count(self):
+        sentences = ['one two three.', 'four five.', ' six  seven eight nine.', 'ten.']
+        self.assertEqual(pack_pages(sentences, max_words=5), [['one two three.', 'four five.'], [' six  seven eight nine.', 'ten.']])
+        # A sentence longer than a page is a page of its own
+        self.assertEqual(pack_pages(['a b c d e f g.', 'h.'], max_words=3), [['a b c d e f g.'], ['h.']])
+
+    def test_regex_splitter_keeps_abbreviations(self):
+        text = 'ServiceNow, Inc. grew revenue by 24%. The U.S. market was strong! Did costs rise? No. 2 was flat.'
+        self.assertEqual(RegexSegmenter().split(text), [
+            'ServiceNow, Inc. grew revenue by 24%.',
+            'The U.S. market was strong!',
+            'Did costs rise?',
+            'No. 2 was flat.'
+        ])
+
+    def test_sentencizer_segments_many_sections(self):
+        segmenter = get_segmenter('sentencizer')
+        pages = segment_sections(['Revenue grew. Costs fell.', 'Risks remain.'], segmenter, max_words=2)
+        self.assertEqual(pages, [[['Revenue grew.'], ['Costs fell.']], [['Risks remain.']]])
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_segmenter('parser')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,289 @@
+import json
+import os
+import re
+import tempfile
+import unittest
+from src.database.weaviate_utils import fetch_stored_hashes, import_data_to_WEAVIATE, map_chunks_to_pages, object_uuid
+from src.retrieval_backends import tenant_name
+
+
+class FakeQuery:
+    """
+    Get query builder over FakeWeaviate's objects, supporting the Equal filter, tenants and offset paging.
+    Like Weaviate, properties missing from the class schema make do() return GraphQL errors.
+    """
+    def __init__(self, store, class_name, properties):
+        self.store = store
+        self.class_name = class_name
+        self.properties = properties or []
+        self.filters = {}
+        self.tenant = None
+        self.limit = None
+        self.offset = 0
+
+    def with_tenant(self, tenant):
+        self.tenant = tenant
+        return self
+
+    def with_additional(self, fields):
+        return self
+
+    def with_where(self, where):
+        self.filters[where['path'][0]] = where['valueText']
+        return self
+
+    def with_limit(self, limit):
+        self.limit = limit
+        return self
+
+    def with_offset(self, offset):
+        self.offset = offset
+        return self
+
+    def do(self):
+        schema = {prop['name'] for prop in self.store.class_properties.get(self.class_name, [])}
+        unknown = [name for name in self.properties if name not in schema]
+        if unknown:
+            return {'data': {'Get': {self.class_name: None}},
+                    'errors': [{'message': f'Cannot query field "{name}" on type "{self.class_name}".'} for name in unknown]}
+        objects = [
+            {**{name: props.get(name) for name in self.properties}, '_additional': {'id': object_id}}
+            for object_id, props in sorted(self.store.objects.items())
+            if all(props.get(path) == value for path, value in self.filters.items())
+            and self.store.object_tenants[object_id] == self.tenant
+            and self.store.object_classes[object_id] == self.class_name
+        ]
+        return {'data': {'Get': {self.class_name: objects[self.offset:self.offset + self.limit]}}}
+
+
+class FakeSchema:
+    """
+    Schema API of FakeWeaviate.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.property = self
+
+    def get(self, class_name):
+        return {'properties': self.store.class_properties.get(class_name, [])}
+
+    def create(self, class_name, prop):
+        self.store.class_properties.setdefault(class_name, []).append(prop)
+
+    def __getattr__(self, name):
+        # exists, create_class and the tenant methods
+        return getattr(self.store, name)
+
+
+class FakeWeaviate:
+    """
+    In-memory stand-in for the Weaviate client: batch upserts, deletes by id, Get queries and tenants.
+    Classes hold the properties they were created with and the ones added since.
+    """
+    def __init__(self):
+        self.objects = {}
+        self.object_tenants = {}
+        self.object_classes = {}
+        self.tenants = []
+        self.classes = []
+        self.writes = 0
+        self.batch = self
+        self.query = self
+        self.schema = FakeSchema(self)
+        self.class_properties = {}
+
+    def configure(self, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def flush(self):
+        pass
+
+    def add_data_object(self, data_object, class_name, uuid, tenant=None):
+        self.objects[uuid] = data_object
+        self.object_tenants[uuid] = tenant
+        self.object_classes[uuid] = class_name
+        self.writes += 1
+
+    def delete_objects(self, class_name, where, tenant=None):
+        for object_id in where['valueText']:
+            if self.object_tenants.get(object_id) == tenant and self.object_classes.get(object_id) == class_name:
+                self.objects.pop(object_id, None)
+
+    def exists(self, class_name):
+        return any(c['class'] == class_name for c in self.classes)
+
+    def create_class(self, class_obj):
+        self.classes.append(class_obj)
+        self.class_properties[class_obj['class']] = list(class_obj.get('properties', []))
+
+    def get_class_tenants(self, class_name):
+        return list(self.tenants)
+
+    def add_class_tenants(self, class_name, tenants):
+        self.tenants += tenants
+
+    def get(self, class_name, properties=None):
+        return FakeQuery(self, class_name, properties)
+
+
+def make_filing(key_points):
+    pages = ['Revenue grew by ten percent. Costs were flat this year.', 'We issued new senior notes in March.']
+    return [{
+        'companyName': 'ServiceNow, Inc.',
+        'filingUrl': 'http://now.com/10-Q',
+        'Quarter': 'Q1',
+        'Filing': '10-Q',
+        'sections': [{
+            'SectionType': '2',
+            'SectionHeading': 'MD&A',
+            'sectionSummary': 'Summary',
+            'pages': pages,
+            'chunks': ['Revenue grew by ten percent.', 'Costs were flat this year.', 'We issued new senior notes in March.'],
+            'chunkPages': [0, 0, 1],
+            'pageSummaries': ['Revenue grew and costs were flat.', 'New senior notes were issued.'],
+            'keyPoints': key_points
+        }]
+    }]
+
+
+class TestWeaviateUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.client = FakeWeaviate()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def import_filing(self, filing, multi_tenant=False, page_class=None):
+        with open(os.path.join(self.tmp_dir.name, 'NOW_10-Q.json'), 'w') as f:
+            json.dump(filing, f)
+        return import_data_to_WEAVIATE(self.client, self.tmp_dir.name, ['NOW_10-Q.json'], 'SECSavvyNOW', record_versions=False,
+                                       multi_tenant=multi_tenant, page_class=page_class)
+
+    def objects_of(self, class_name):
+        return [self.client.objects[object_id] for object_id, name in self.client.object_classes.items()
+                if name == class_name and object_id in self.client.objects]
+
+    def test_map_chunks_to_pages_without_indexes(self):
+        pages = ['a b. c d.', 'c d. e f.']
+        self.assertEqual(map_chunks_to_pages(['a b.', 'c d.', 'c d.', 'e f.', 'x'], pages), [0, 0, 1, 1, None])
+        self.assertEqual(map_chunks_to_pages(['a b.', 'c d.'], pages, [0, 1]), [0, 1])
+
+    def test_map_chunks_to_pages_recovers_from_a_repeated_sentence(self):
+        # 'Total.' ends both pages; its first chunk matching past 'b c.' must not drop the chunks after it
+        pages = ['a b. b c. Total.', 'd e. Total.']
+        self.assertEqual(map_chunks_to_pages(['a b.', 'Total.', 'b c.', 'Total.', 'd e.'], pages), [0, 0, 0, 0, 1])
+
+    def test_object_uuid_is_deterministic(self):
+        record = {'filingUrl': 'u', 'sectionType': '1', 'chunkKind': 'chunk', 'chunk': 'text'}
+        self.assertEqual(object_uuid(record), object_uuid(dict(record)))
+        self.assertNotEqual(object_uuid(record), object_uuid({**record, 'chunkKind': 'keyPoint'}))
+
+    def test_reimport_only_touches_changed_objects(self):
+        first = self.import_filing(make_filing([['Revenue grew ten percent.'], ['Senior notes were issued in March.']]))
+        self.assertEqual((first['inserted'], first['updated'], first['deleted']), (7, 0, 0))
+        self.assertEqual(len(self.client.objects), 7)
+        self.assertEqual([prop['name'] for prop in self.client.class_properties['SECSavvyNOW']], ['contentHash'])
+
+        unchanged = self.import_filing(make_filing([['Revenue grew ten percent.'], ['Senior notes were issued in March.']]))
+        self.assertEqual((unchanged['inserted'], unchanged['updated'], unchanged['unchanged'], unchanged['deleted']), (0, 0, 7, 0))
+        self.assertEqual(unchanged['companies'], [])
+        self.assertEqual(self.client.writes, 7)
+
+        # One key point replaced by another, and a changed section summary
+        filing = make_filing([['Revenue grew ten percent.'], ['Senior notes mature in 2030.']])
+        filing[0]['sections'][0]['sectionSummary'] = 'New summary'
+        changed = self.import_filing(filing)
+        self.assertEqual((changed['inserted'], changed['updated'], changed['deleted']), (1, 6, 1))
+        self.assertEqual(len(self.client.objects), 7)
+        self.assertEqual(changed['companies'], ['ServiceNow, Inc.'])
+
+
+    def test_multi_tenant_import_writes_to_the_company_tenant(self):
+        key_points = [['Revenue grew ten percent.'], ['Senior notes were issued in March.']]
+        first = self.import_filing(make_filing(key_points), multi_tenant=True)
+        tenant = tenant_name('ServiceNow, Inc.')
+
+        self.assertEqual(first['inserted'], 7)
+        self.assertEqual([t.name for t in self.client.tenants], [tenant])
+        self.assertEqual(set(self.client.object_tenants.values()), {tenant})
+
+        # Stored hashes are read from the tenant, so a re-import changes nothing
+        unchanged = self.import_filing(make_filing(key_points), multi_tenant=True)
+        self.assertEqual((unchanged['unchanged'], unchanged['deleted']), (7, 0))
+        self.assertEqual(len(self.client.tenants), 1)
+
+    def test_tenant_names_are_valid_and_distinct(self):
+        names = [tenant_name(company) for company in ['ServiceNow, Inc.', 'ServiceNow Inc', 'AT&T INC.']]
+
+        self.assertEqual(len(set(names)), 3)
+        self.assertTrue(all(re.fullmatch(r'[A-Za-z0-9_-]{1,64}', name) for name in names))
+        self.assertTrue(names[0].startswith('ServiceNow-Inc-'))
+
+    def test_page_store_import_stores_every_page_once(self):
+        key_points = [['Revenue grew ten percent.'], ['Senior notes were issued in March.']]
+        first = self.import_filing(make_filing(key_points), page_class='SECSavvyNOWPages')
+
+        pages = self.objects_of('SECSavvyNOWPages')
+        chunks = self.objects_of('SECSavvyNOW')
+        self.assertEqual((first['inserted'], first['pages']), (7, 2))
+        self.assertEqual(sorted(page['sectionPage'] for page in pages), sorted(make_filing([])[0]['sections'][0]['pages']))
+        self.assertTrue(all('sectionPage' not in chunk and 'sectionSummary' not in chunk for chunk in chunks))
+        self.assertEqual(len({chunk['pageId'] for chunk in chunks}), 2)
+        self.assertEqual([prop['name'] for prop in self.client.class_properties['SECSavvyNOW']], ['contentHash', 'pageId'])
+
+        unchanged = self.import_filing(make_filing(key_points), page_class='SECSavvyNOWPages')
+        self.assertEqual((unchanged['unchanged'], unchanged['pages']), (7, 0))
+
+        # A new section summary is a new version of both pages; the old ones are deleted
+        filing = make_filing(key_points)
+        filing[0]['sections'][0]['sectionSummary'] = 'New summary'
+        changed = self.import_filing(filing, page_class='SECSavvyNOWPages')
+        self.assertEqual((changed['updated'], changed['pages']), (7, 2))
+        self.assertEqual({page['sectionSummary'] for page in self.objects_of('SECSavvyNOWPages')}, {'New summary'})
+
+    def test_page_store_reimport_skips_unchanged_pages_and_deletes_orphans(self):
+        key_points = [['Revenue grew ten percent.'], ['Senior notes were issued in March.']]
+        self.import_filing(make_filing(key_points), page_class='SECSavvyNOWPages')
+        writes = self.client.writes
+
+        unchanged = self.import_filing(make_filing(key_points), page_class='SECSavvyNOWPages')
+        self.assertEqual(unchanged['pages'], 0)
+        self.assertEqual(self.client.writes, writes)
+
+        # The second page is rewritten: only it is sent, and its old version is deleted
+        filing = make_filing(key_points)
+        section = filing[0]['sections'][0]
+        section['pages'][1] = 'We issued new senior notes in April.'
+        section['chunks'][2] = 'We issued new senior notes in April.'
+        changed = self.import_filing(filing, page_class='SECSavvyNOWPages')
+        self.assertEqual(changed['pages'], 1)
+        self.assertEqual(sorted(page['sectionPage'] for page in self.objects_of('SECSavvyNOWPages')), sorted(section['pages']))
+
+    def test_failed_stored_object_queries_are_raised(self):
+        self.import_filing(make_filing([]), page_class='SECSavvyNOWPages')
+
+        # The page class has no contentHash: pages are looked up by id only
+        self.assertEqual(len(fetch_stored_hashes(self.client, 'SECSavvyNOWPages', 'http://now.com/10-Q', hash_property=None)), 2)
+        with self.assertRaises(RuntimeError):
+            fetch_stored_hashes(self.client, 'SECSavvyNOWPages', 'http://now.com/10-Q')
+
+    def test_filings_past_the_query_maximum_are_raised(self):
+        self.import_filing(make_filing([]), page_class='SECSavvyNOWPages')
+
+        pages = fetch_stored_hashes(self.client, 'SECSavvyNOWPages', 'http://now.com/10-Q', page_size=1, hash_property=None, max_results=3)
+        self.assertEqual(len(pages), 2)
+        # Offset paging cannot read the second page: an incomplete map would keep orphans
+        with self.assertRaises(RuntimeError):
+            fetch_stored_hashes(self.client, 'SECSavvyNOWPages', 'http://now.com/10-Q', page_size=1, hash_property=None, max_results=1)
+
+
+if __name__ == '__main__':
+    unittest.main()